@@ -4,9 +4,13 @@ from fastapi import APIRouter
 from app.users.route import router as users_router
 from app.paraphrase.route import router as paraphrase_router
 from app.payments.p_route import router as payments_router
+from app.payments.webhooks import router as webhooks_router
+from app.history.route import router as history_router
 
 api_router = APIRouter()
 
 api_router.include_router(users_router)
 api_router.include_router(paraphrase_router)
-api_router.include_router(payments_router)
\ No newline at end of file
+api_router.include_router(payments_router)
+api_router.include_router(webhooks_router)
+api_router.include_router(history_router)
\ No newline at end of file
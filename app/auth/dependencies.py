@@ -1,18 +1,17 @@
 from fastapi import Depends, HTTPException, status
+from fastapi.requests import HTTPConnection
 from fastapi.security import OAuth2PasswordBearer
-import asyncpg
 
 from app.auth.jwt import decode_access_token
+from app.auth.principal_cache import principal_cache
 from app.users.dao import UserDAO
 from app.db.connection import get_pool
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/users/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/users/login", auto_error=False)
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db_pool: asyncpg.pool.Pool = Depends(get_pool),
-):
+def _user_id_from_token(token: str) -> str:
     payload = decode_access_token(token)
 
     if not payload:
@@ -21,16 +20,46 @@ async def get_current_user(
             detail="Invalid or expired token",
         )
 
-    user_id = payload.get("user_id")
+    # create_access_token stores the id in "sub"
+    user_id = payload.get("sub") or payload.get("user_id")
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token payload",
         )
+    return user_id
+
+
+async def _load_user(primary, replica, user_id: str):
+    # principal_cache shares one load between concurrent callers, so it takes
+    # connections from the pools rather than using any one request's
+    replica = replica or primary
+
+    # Right after a plan change the replica may still have the old row
+    reader = primary if principal_cache.recently_invalidated(user_id) else replica
+
+    async with reader.acquire() as conn:
+        user = await UserDAO(conn).get_by_id(user_id)
+
+    # A just-registered user may not have reached the replica yet
+    if user is None and reader is not primary:
+        async with primary.acquire() as conn:
+            user = await UserDAO(conn).get_by_id(user_id)
+    return user
 
-    async with db_pool.acquire() as conn:
-        dao = UserDAO(conn)
-        user = await dao.get_by_id(user_id)
+
+async def load_principal(pool, replica_pool, user_id: str):
+    return await principal_cache.get(user_id, lambda: _load_user(pool, replica_pool, user_id))
+
+
+async def get_current_user(
+    request: HTTPConnection,
+    token: str = Depends(oauth2_scheme),
+    pool=Depends(get_pool),
+):
+    user_id = _user_id_from_token(token)
+    replica_pool = getattr(request.app.state, "db_replica_pool", None)
+    user = await load_principal(pool, replica_pool, user_id)
 
     if not user:
         raise HTTPException(
@@ -39,3 +68,14 @@ async def get_current_user(
         )
 
     return user
+
+
+async def get_optional_user(
+    request: HTTPConnection,
+    token: str | None = Depends(optional_oauth2_scheme),
+    pool=Depends(get_pool),
+):
+    # Anonymous requests are allowed; a token that is sent must still be valid
+    if not token:
+        return None
+    return await get_current_user(request, token=token, pool=pool)
@@ -2,18 +2,20 @@ from fastapi import Depends, HTTPException, status
 from app.auth.dependencies import get_current_user
 
 
-async def verified_user(user=Depends(get_current_user)):
-    if not user.is_verified:
+async def paid_user(user=Depends(get_current_user)):
+    # Set together by the Stripe webhook consumer on upgrade and downgrade
+    if user.plan == "free" or user.subscription_status != "active":
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Account not verified",
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail="Payment required",
         )
     return user
 
-async def paid_user(user=Depends(verified_user)):
-    if not user.has_active_subscription:
+
+async def admin_user(user=Depends(get_current_user)):
+    if user.role != "admin":
         raise HTTPException(
-            status_code=status.HTTP_402_PAYMENT_REQUIRED,
-            detail="Payment required",
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized",
         )
     return user
@@ -1,10 +1,18 @@
+from functools import lru_cache
 from passlib.context import CryptContext
 import re
 
-# Password hashing configuration
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+from app.core.config import settings
 
-DUMMY_PASSWORD_HASH = pwd_context.hash("dummy-password-for-timing")
+# Password hashing configuration
+# Hashes made with other parameters are flagged by needs_rehash()
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
+)
 
 # Validation constants
 MIN_PASSWORD_LENGTH = 12
@@ -41,3 +49,24 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     # Verifies a plaintext password against a stored hash.
     return pwd_context.verify(plain_password, hashed_password)
+
+
+def rehash_password(password: str) -> str:
+    # Hashes an already accepted password with the current parameters.
+    # No strength validation, so older passwords can be upgraded on login.
+    return pwd_context.hash(password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    # Cheap: only parses the hash, no argon2 work
+    try:
+        return pwd_context.needs_update(hashed_password)
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=1)
+def get_dummy_password_hash() -> str:
+    # Used to normalize login timing for unknown users. Computed on first use
+    # instead of at import time, with the same parameters as real hashes.
+    return pwd_context.hash("dummy-password-for-timing")
@@ -0,0 +1,53 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from app.auth import password_handler
+from app.core.config import settings
+
+
+class PasswordService:
+    # Runs argon2 hashing off the event loop on a small dedicated pool.
+    # argon2-cffi releases the GIL, so hashes run in parallel up to the pool
+    # size; anything beyond that queues instead of stalling other requests.
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(password_handler.hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(password_handler.verify_password, plain_password, hashed_password)
+
+    async def rehash(self, password: str) -> str:
+        return await self._run(password_handler.rehash_password, password)
+
+    async def dummy_hash(self) -> str:
+        return await self._run(password_handler.get_dummy_password_hash)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_service = PasswordService(workers=settings.PASSWORD_HASH_WORKERS)
+
+
+async def hash_password(password: str) -> str:
+    # Validates and hashes a password for storage.
+    return await password_service.hash(password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_service.verify(plain_password, hashed_password)
+
+
+async def rehash_password(password: str) -> str:
+    return await password_service.rehash(password)
+
+
+async def get_dummy_password_hash() -> str:
+    return await password_service.dummy_hash()
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from app.core.config import settings
+
+
+class PrincipalCache:
+    # Bounded TTL cache of authenticated users keyed by user id.
+    # Concurrent misses for the same id share one load (singleflight).
+
+    def __init__(self, ttl: float, max_size: int):
+        self._ttl = ttl
+        self._max_size = max_size
+        # user_id -> (expires_at, user)
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        # user_id -> when it was last invalidated, oldest first
+        self._invalidated_at: OrderedDict[str, float] = OrderedDict()
+
+    async def get(self, user_id, loader: Callable[[], Awaitable[object]]):
+        key = str(user_id)
+
+        entry = self._entries.get(key)
+        if entry:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return user
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+
+        # Shielded so a caller that goes away doesn't cancel the load for the others
+        return await asyncio.shield(task)
+
+    def invalidate(self, user_id, read_your_writes: bool = True):
+        key = str(user_id)
+        self._entries.pop(key, None)
+        # A load that started before the change must not repopulate the cache
+        self._inflight.pop(key, None)
+
+        if not read_your_writes:
+            return
+        self._invalidated_at[key] = time.monotonic()
+        self._invalidated_at.move_to_end(key)
+        while len(self._invalidated_at) > self._max_size:
+            self._invalidated_at.popitem(last=False)
+
+    def recently_invalidated(self, user_id, within: float | None = None) -> bool:
+        # Defaults to one TTL, the staleness other workers already tolerate
+        invalidated_at = self._invalidated_at.get(str(user_id))
+        if invalidated_at is None:
+            return False
+        return time.monotonic() - invalidated_at < (within if within is not None else self._ttl)
+
+    def invalidate_many(self, user_ids, read_your_writes: bool = True):
+        for user_id in user_ids:
+            self.invalidate(user_id, read_your_writes)
+
+    def clear(self):
+        self._entries.clear()
+        self._inflight.clear()
+        self._invalidated_at.clear()
+
+    async def _load(self, key: str, loader):
+        task = asyncio.current_task()
+        try:
+            user = await loader()
+            if user is not None and self._inflight.get(key) is task:
+                self._entries[key] = (time.monotonic() + self._ttl, user)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_size:
+                    self._entries.popitem(last=False)
+            return user
+        finally:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+
+principal_cache = PrincipalCache(
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+)
@@ -1,17 +1,113 @@
-import os
-import requests
+import time
+from collections import OrderedDict
+
+import httpx
 from fastapi import HTTPException
 from starlette import status
 
-def guard_captcha(token: str, expected_action: str, min_score: float = 0.5):
-    env = os.getenv("ENV", "development")
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import settings
+
+
+class RecaptchaVerifier:
+    # Async siteverify client. Uses one pooled keep-alive connection, keeps
+    # each verdict for one retry of the same request (the provider would
+    # reject the token as a duplicate), and stops calling the provider while
+    # it is failing.
+
+    def __init__(
+        self,
+        verify_url: str,
+        timeout: float,
+        cache_ttl: float,
+        cache_size: int,
+        breaker: CircuitBreaker,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self._verify_url = verify_url
+        self._timeout = timeout
+        self._cache_ttl = cache_ttl
+        self._cache_size = cache_size
+        self._breaker = breaker
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        # (token, remote ip, action) -> (expires_at, siteverify result)
+        self._verdicts: OrderedDict[tuple, tuple[float, dict]] = OrderedDict()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def verify(self, secret: str, token: str, remote_ip: str | None = None, action: str | None = None) -> dict:
+        # Tokens are single use: a kept verdict serves one retry from the same
+        # client for the same action, then it is gone, so a solved token can't
+        # be replayed across attempts
+        key = (token, remote_ip, action)
+        cached = self._verdicts.pop(key, None)
+        if cached:
+            expires_at, result = cached
+            if expires_at > time.monotonic():
+                return result
+
+        if not self._breaker.allow():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="reCAPTCHA verification services are currently unavailable",
+            )
+
+        try:
+            response = await self._get_client().post(
+                self._verify_url,
+                data={
+                    "secret": secret,
+                    "response": token,
+                    **({"remoteip": remote_ip} if remote_ip else {}),
+                },
+            )
+            response.raise_for_status()
+            result = response.json()
+        except (httpx.HTTPError, ValueError):
+            self._breaker.record_failure()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="reCAPTCHA verification services are currently unavailable",
+            )
+
+        self._breaker.record_success()
 
-    if env == "development":
+        self._verdicts[key] = (time.monotonic() + self._cache_ttl, result)
+        while len(self._verdicts) > self._cache_size:
+            self._verdicts.popitem(last=False)
+
+        return result
+
+
+recaptcha_verifier = RecaptchaVerifier(
+    verify_url=settings.RECAPTCHA_VERIFY_URL,
+    timeout=settings.RECAPTCHA_TIMEOUT_SECONDS,
+    cache_ttl=settings.RECAPTCHA_VERDICT_TTL_SECONDS,
+    cache_size=10_000,
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0),
+)
+
+
+async def guard_captcha(token: str, expected_action: str, min_score: float = 0.5, remote_ip: str | None = None):
+    if settings.ENV == "development":
         return {
             "score": 1.0,
             "action": expected_action,
         }
-    secret = os.getenv("RECAPTCHA_SECRET")
+    secret = settings.RECAPTCHA_SECRET
 
     if not secret:
         raise HTTPException(
@@ -19,22 +115,7 @@ def guard_captcha(token: str, expected_action: str, min_score: float = 0.5):
             detail="Captcha service not configured",
         )
 
-    try:
-        response = requests.post(
-            "https://www.google.com/recaptcha/api/siteverify",
-            data={
-                "secret": secret,
-                "response": token,
-            },
-            timeout=5,
-        )
-    except requests.RequestException:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="reCAPTCHA verification services are currently unavailable",
-        )
-
-    result = response.json()
+    result = await recaptcha_verifier.verify(secret, token, remote_ip, expected_action)
 
     if not result.get("success"):
         raise HTTPException(
@@ -60,4 +141,4 @@ def guard_captcha(token: str, expected_action: str, min_score: float = 0.5):
     return {
         "score": score,
         "action": action,
-    }
\ No newline at end of file
+    }
@@ -1,21 +1,30 @@
+from contextlib import contextmanager
+
 from fastapi import Depends, HTTPException, status
 from app.billing.plans import PLAN_LIMITS
+from app.billing.usage_ledger import usage_ledger
 from app.auth.guard import paid_user
 
 
+def _plan_config(user) -> dict:
+    plan = user.plan
+    config = PLAN_LIMITS.get(plan)
+
+    if not config:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Plan: {plan} not available"
+        )
+    return config
+
+
 def usage_guard(characters_needed: int):
     async def _guard(user=Depends(paid_user)):
-        plan = user.plan
-        config = PLAN_LIMITS.get(plan)
-
-        if not config:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Plan: {plan} not available"
-            )
+        config = _plan_config(user)
 
-        # A monthly limit
-        if user.monthly_characters_used + characters_needed > config["max_characters"]:
+        # A monthly limit, including usage not yet flushed to the database
+        used = user.monthly_characters_used + usage_ledger.outstanding(user.id)
+        if used + characters_needed > config["max_characters"]:
             raise HTTPException(
                 status_code=status.HTTP_402_PAYMENT_REQUIRED,
                 detail="Monthly usage limit exceeded"
@@ -28,4 +37,41 @@ def usage_guard(characters_needed: int):
                 detail="Request too large for your plan"
             )
         return user
-    return _guard
\ No newline at end of file
+    return _guard
+
+
+@contextmanager
+def metered_usage(user, characters_needed: int, request_characters: int | None = None):
+    # Reserves characters before inference, charges them if the block succeeds
+    # and gives them back if it raises. For a batch, `request_characters` is
+    # the largest item, which is what the per-request limit applies to.
+    config = _plan_config(user)
+    if request_characters is None:
+        request_characters = characters_needed
+
+    reservation = usage_ledger.reserve(
+        user.id,
+        characters_needed,
+        used=user.monthly_characters_used,
+        limit=config["max_characters"],
+    )
+    if reservation is None:
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail="Monthly usage limit exceeded"
+        )
+
+    if request_characters > config["max_chars_per_request"]:
+        usage_ledger.release(reservation)
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail="Request too large for your plan"
+        )
+
+    try:
+        yield reservation
+    except BaseException:
+        usage_ledger.release(reservation)
+        raise
+
+    usage_ledger.commit(reservation)
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import os
+import uuid
+from pathlib import Path
+
+from app.auth.principal_cache import principal_cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RECORD_FLUSH_BATCH = """
+INSERT INTO usage_flush_batches (batch_id)
+VALUES ($1)
+ON CONFLICT (batch_id) DO NOTHING
+RETURNING batch_id
+"""
+
+APPLY_USAGE_DELTA = """
+UPDATE users
+SET monthly_characters_used = monthly_characters_used + $2
+WHERE id = $1
+"""
+
+
+class UsageReservation:
+    __slots__ = ("user_id", "characters", "settled")
+
+    def __init__(self, user_id: str, characters: int):
+        self.user_id = user_id
+        self.characters = characters
+        self.settled = False
+
+
+class UsageLedger:
+    # Write-behind accounting of monthly character usage.
+    #
+    # Characters are reserved in memory before inference and committed (or
+    # released) afterwards. Committed usage is appended to a per-worker journal
+    # and written to Postgres in aggregated batches. Each batch is recorded in
+    # usage_flush_batches inside the same transaction, so replaying a journal
+    # segment after a crash never double-charges a user.
+
+    def __init__(self, journal_dir: str, flush_interval: float, flush_batch_size: int):
+        self._journal_dir = Path(journal_dir)
+        self._flush_interval = flush_interval
+        self._flush_batch_size = flush_batch_size
+
+        # user_id -> characters
+        self._reserved: dict[str, int] = {}
+        self._pending: dict[str, int] = {}
+        # batch_id -> (deltas, journal segment) rotated out but not yet in the DB
+        self._unflushed: dict[str, tuple[dict[str, int], Path]] = {}
+        self._commits_since_flush = 0
+
+        self._pool = None
+        self._journal = None
+        self._journal_path: Path | None = None
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+
+    async def start(self, pool):
+        self._pool = pool
+        self._journal_dir.mkdir(parents=True, exist_ok=True)
+        await self.recover()
+        self._open_journal()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
+        try:
+            await self.flush()
+        except Exception:
+            # Whatever is left stays in the journal and is recovered on next start
+            logger.exception("Final usage flush failed")
+
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+    def outstanding(self, user_id) -> int:
+        # Characters charged to the user that are not yet reflected in the DB row
+        user_id = str(user_id)
+        total = self._reserved.get(user_id, 0) + self._pending.get(user_id, 0)
+        for deltas, _ in self._unflushed.values():
+            total += deltas.get(user_id, 0)
+        return total
+
+    def reserve(self, user_id, characters: int, used: int, limit: int) -> UsageReservation | None:
+        # Check and increment happen without an await in between, which makes
+        # the reservation atomic with respect to other requests on this loop.
+        user_id = str(user_id)
+        if used + self.outstanding(user_id) + characters > limit:
+            return None
+
+        self._reserved[user_id] = self._reserved.get(user_id, 0) + characters
+        return UsageReservation(user_id, characters)
+
+    def commit(self, reservation: UsageReservation, characters: int | None = None):
+        # `characters` charges only part of the reservation (e.g. a batch where
+        # some items failed); the rest is given back
+        if reservation.settled:
+            return
+        reservation.settled = True
+        self._drop_reservation(reservation)
+
+        if characters is None:
+            characters = reservation.characters
+        characters = min(characters, reservation.characters)
+        if characters <= 0:
+            return
+
+        user_id = reservation.user_id
+        self._pending[user_id] = self._pending.get(user_id, 0) + characters
+
+        if self._journal:
+            self._journal.write(f"{user_id} {characters}\n")
+
+        self._commits_since_flush += 1
+        if self._commits_since_flush >= self._flush_batch_size:
+            self._wakeup.set()
+
+    def release(self, reservation: UsageReservation):
+        if reservation.settled:
+            return
+        reservation.settled = True
+        self._drop_reservation(reservation)
+
+    def _drop_reservation(self, reservation: UsageReservation):
+        remaining = self._reserved.get(reservation.user_id, 0) - reservation.characters
+        if remaining > 0:
+            self._reserved[reservation.user_id] = remaining
+        else:
+            self._reserved.pop(reservation.user_id, None)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if self._pending:
+                self._rotate_journal()
+
+            for batch_id in list(self._unflushed):
+                deltas, segment = self._unflushed[batch_id]
+                await self._apply_batch(batch_id, deltas)
+                del self._unflushed[batch_id]
+                segment.unlink(missing_ok=True)
+
+    async def recover(self):
+        # Pick up journals left behind by workers that are no longer running,
+        # including a previous incarnation of this one.
+        pid = os.getpid()
+
+        for path in sorted(self._journal_dir.iterdir()):
+            owner, _, rest = path.name.partition(".")
+            if not owner.isdigit():
+                continue
+            if int(owner) != pid and _process_alive(int(owner)):
+                continue
+
+            if path.suffix == ".log":
+                batch_id = str(uuid.uuid4())
+                segment = path.with_name(f"{pid}.{batch_id}.seg")
+                try:
+                    os.replace(path, segment)
+                except FileNotFoundError:
+                    # Another worker recovered it first
+                    continue
+            elif path.suffix == ".seg":
+                batch_id = rest[: -len(".seg")]
+                segment = path
+            else:
+                continue
+
+            deltas = _read_segment(segment)
+            if deltas:
+                self._unflushed[batch_id] = (deltas, segment)
+            else:
+                segment.unlink(missing_ok=True)
+
+        if self._unflushed:
+            logger.info("Recovering %d unflushed usage batches", len(self._unflushed))
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Usage recovery flush failed; will retry in background")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Usage flush failed; will retry")
+
+    async def _apply_batch(self, batch_id: str, deltas: dict[str, int]):
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                recorded = await conn.fetchval(RECORD_FLUSH_BATCH, batch_id)
+                if recorded is None:
+                    # Applied before a crash prevented the segment from being removed
+                    return
+                await conn.executemany(APPLY_USAGE_DELTA, list(deltas.items()))
+
+        # Cached users still carry the old monthly_characters_used, and the
+        # batch is about to stop counting as outstanding. A lagging replica
+        # would have the old counter too, so reloads go to the primary.
+        principal_cache.invalidate_many(deltas)
+
+    def _open_journal(self):
+        self._journal_path = self._journal_dir / f"{os.getpid()}.log"
+        # Line buffered: every commit reaches the OS, so it survives a worker crash
+        self._journal = open(self._journal_path, "a", buffering=1)
+
+    def _rotate_journal(self):
+        batch_id = str(uuid.uuid4())
+        segment = self._journal_dir / f"{os.getpid()}.{batch_id}.seg"
+
+        if self._journal:
+            self._journal.close()
+            os.replace(self._journal_path, segment)
+            self._open_journal()
+
+        self._unflushed[batch_id] = (self._pending, segment)
+        self._pending = {}
+        self._commits_since_flush = 0
+
+
+def _read_segment(path: Path) -> dict[str, int]:
+    deltas: dict[str, int] = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            # A torn last line from a crash is skipped
+            if len(parts) != 2 or not parts[1].isdigit():
+                continue
+            deltas[parts[0]] = deltas.get(parts[0], 0) + int(parts[1])
+    return deltas
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+usage_ledger = UsageLedger(
+    journal_dir=settings.USAGE_JOURNAL_DIR,
+    flush_interval=settings.USAGE_FLUSH_INTERVAL_SECONDS,
+    flush_batch_size=settings.USAGE_FLUSH_BATCH_SIZE,
+)
@@ -2,6 +2,9 @@ import os
 
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "sk_test_placeholder")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_placeholder")
+# Point at a local fake Stripe server (e.g. stripe-mock) in tests
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "2"))
 
 # Only validate in production
 if os.getenv("ENV") == "production":
@@ -0,0 +1,37 @@
+import time
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive failures. While open, calls
+    # are refused until `reset_timeout` passes; then one trial call is let
+    # through per timeout window, and a success closes the circuit again.
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+
+        now = time.monotonic()
+        if now - self._opened_at >= self._reset_timeout:
+            # Half-open: the next trial has to wait for another window
+            self._opened_at = now
+            return True
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
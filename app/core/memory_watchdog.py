@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+import resource
+import signal
+import sys
+from contextlib import contextmanager
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        # No procfs (macOS): the peak is the best we have
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryLimitExceeded(Exception):
+    pass
+
+
+def _terminate_self():
+    # uvicorn finishes open requests on SIGTERM; the supervisor starts a new worker
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+class MemoryWatchdog:
+    # Samples this process's RSS every `interval`. Past the soft limit the
+    # worker stops taking new work, lets what's in flight finish (up to
+    # `drain_timeout`), then calls `on_recycle` so it's replaced by a fresh
+    # process. Work that would take RSS past the hard limit is refused up
+    # front. A limit of 0 turns that check off.
+
+    def __init__(self, soft_limit_bytes: int, hard_limit_bytes: int, interval: float, drain_timeout: float, sample=current_rss_bytes):
+        self._soft_limit = soft_limit_bytes
+        self._hard_limit = hard_limit_bytes
+        self._interval = interval
+        self._drain_timeout = drain_timeout
+        self._sample = sample
+        self._on_recycle = _terminate_self
+        self._task: asyncio.Task | None = None
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.rss = 0
+        self.recycling = False
+
+    def start(self, on_recycle=None):
+        if on_recycle is not None:
+            self._on_recycle = on_recycle
+        self.sample()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def sample(self) -> int:
+        self.rss = self._sample()
+        metrics.gauge("memory.rss_bytes").set(self.rss)
+        return self.rss
+
+    def admit(self, estimated_bytes: int = 0):
+        if self.recycling:
+            metrics.counter("memory.rejected.recycling").inc()
+            raise MemoryLimitExceeded("Worker is restarting")
+        if self._hard_limit and self.rss + estimated_bytes > self._hard_limit:
+            metrics.counter("memory.rejected.hard_limit").inc()
+            raise MemoryLimitExceeded("Not enough memory for this request")
+
+    @contextmanager
+    def track(self):
+        # Work the worker waits for before recycling
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            rss = self.sample()
+            if not self._soft_limit or rss < self._soft_limit:
+                continue
+
+            logger.warning("RSS %d MB is over the soft limit, recycling the worker", rss // (1024 * 1024))
+            metrics.counter("memory.recycles").inc()
+            self.recycling = True
+            try:
+                await asyncio.wait_for(self._idle.wait(), self._drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Recycling with %d requests still in flight", self._in_flight)
+            self._on_recycle()
+            return
+
+
+memory_watchdog = MemoryWatchdog(
+    soft_limit_bytes=settings.MEMORY_SOFT_LIMIT_MB * 1024 * 1024,
+    hard_limit_bytes=settings.MEMORY_HARD_LIMIT_MB * 1024 * 1024,
+    interval=settings.MEMORY_SAMPLE_INTERVAL_SECONDS,
+    drain_timeout=settings.MEMORY_DRAIN_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,95 @@
+import threading
+from collections import deque
+
+
+class Counter:
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+class Gauge:
+    def __init__(self):
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Summary:
+    # count/sum/max over the process lifetime, percentiles over a recent window
+
+    def __init__(self, window: int = 1024):
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._recent: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+            self._recent.append(value)
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(q * len(recent)))]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self._count,
+            "sum": round(self._sum, 6),
+            "max": round(self._max, 6),
+            "p50": round(self.percentile(0.50), 6),
+            "p99": round(self.percentile(0.99), 6),
+        }
+
+
+class MetricsRegistry:
+    # In-process metrics, served as JSON on /metrics
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | Summary] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, kind):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = kind()
+            return metric
+
+    def counter(self, name: str) -> Counter:
+        return self._get(name, Counter)
+
+    def gauge(self, name: str) -> Gauge:
+        return self._get(name, Gauge)
+
+    def summary(self, name: str) -> Summary:
+        return self._get(name, Summary)
+
+    def snapshot(self) -> dict:
+        result = {}
+        for name, metric in sorted(self._metrics.items()):
+            result[name] = metric.snapshot() if isinstance(metric, Summary) else metric.value
+        return result
+
+
+metrics = MetricsRegistry()
@@ -1,42 +1,163 @@
 # db/connection.py
+import asyncio
+import json
+import re
+import time
+
 import asyncpg
+from fastapi import Depends
+from fastapi.requests import HTTPConnection
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.migrations import migrate
+from app.db.queries import RegistryConnection, prepare_queries
 
 db_pool = None
 
 
-async def init_db_pool(app):
+def _safe_url(dsn: str) -> str:
+    return re.sub(r'://([^:]+):([^@]+)@', r'://\1:****@', dsn)
+
+
+async def init_connection(conn):
+    # Runs once per new pooled connection, before it is handed out
+    for pg_type in ("json", "jsonb"):
+        await conn.set_type_codec(
+            pg_type,
+            encoder=json.dumps,
+            decoder=json.loads,
+            schema="pg_catalog",
+        )
+    await prepare_queries(conn)
+
 
-    db_url = settings.DATABASE_URL
+async def _create_pool(dsn: str):
+    # create_pool opens min_size connections (TLS, init hook and all) before
+    # returning, so the first request burst doesn't pay for cold connections
+    return await asyncpg.create_pool(
+        dsn=dsn,
+        ssl=settings.DB_SSL,
+        min_size=settings.DB_POOL_MIN_SIZE,
+        max_size=settings.DB_POOL_MAX_SIZE,
+        timeout=settings.DB_CONNECT_TIMEOUT,
+        command_timeout=settings.DB_COMMAND_TIMEOUT,
+        max_inactive_connection_lifetime=settings.DB_POOL_MAX_INACTIVE_LIFETIME,
+        connection_class=RegistryConnection,
+        init=init_connection,
+    )
 
-    import re
-    safe_url = re.sub(r'://([^:]+):([^@]+)@', r'://\1:****@', db_url)
-    print(f"Attempting to connect to {safe_url}")
 
+async def _migrate(dsn: str):
+    # On a connection of its own, before the pool exists: every pooled
+    # connection prepares the registered queries, which need the new schema
+    conn = await asyncpg.connect(dsn=dsn, ssl=settings.DB_SSL, timeout=settings.DB_CONNECT_TIMEOUT)
     try:
-        app.state.db_pool = await asyncpg.create_pool(
-            dsn=settings.DATABASE_URL,
-            ssl='prefer',  # Changed from "require" string
-            min_size=1,
-            max_size=10,
-            timeout=30,
-            command_timeout=10
-        )
-        print("DATABASE_URL seen by app:", settings.DATABASE_URL)
-        print("Database pool initialized successfully")
+        applied = await migrate(conn)
+        if applied:
+            print(f"Applied migrations {applied}")
+    finally:
+        await conn.close()
+
+
+async def init_db_pool(app):
+    print(f"Attempting to connect to {_safe_url(settings.DATABASE_URL)}")
+
+    try:
+        await _migrate(settings.DATABASE_URL)
+        app.state.db_pool = await _create_pool(settings.DATABASE_URL)
+        print(f"Database pool initialized with {app.state.db_pool.get_size()} warm connections")
     except Exception as e:
         print(f"Failed to initialize database pool: {e}")
         raise
 
+    app.state.db_replica_pool = None
+    if settings.DATABASE_REPLICA_URL:
+        print(f"Attempting to connect to replica {_safe_url(settings.DATABASE_REPLICA_URL)}")
+        try:
+            app.state.db_replica_pool = await _create_pool(settings.DATABASE_REPLICA_URL)
+        except Exception as e:
+            # Reads fall back to the primary
+            print(f"Failed to initialize replica pool, reading from primary: {e}")
 
-async def get_pool(app):
-    pool = getattr(app.state, "db_pool", None)
+
+async def get_pool(request: HTTPConnection):
+    # HTTPConnection, so HTTP routes and websockets can both depend on it
+    pool = getattr(request.app.state, "db_pool", None)
     if pool is None:
         raise RuntimeError("Database pool not initialized")
     return pool
 
 
 async def close_db_pool(app):
-    pool = getattr(app.state, "db_pool", None)
-    if pool:
-        await pool.close()
+    for name in ("db_replica_pool", "db_pool"):
+        pool = getattr(app.state, name, None)
+        if pool:
+            await pool.close()
+
+
+class _SharedAcquire:
+    def __init__(self, db: "RequestConnection"):
+        self._db = db
+
+    async def __aenter__(self):
+        return await self._db.connection()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # The connection stays with the request until it ends
+        pass
+
+
+class RequestConnection:
+    # At most one pool connection per request, acquired on first use and
+    # shared by every dependency and the handler. acquire() mirrors the pool
+    # API, so code written against the pool works unchanged.
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._acquire_ctx = None
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    def acquire(self):
+        return _SharedAcquire(self)
+
+    async def connection(self):
+        async with self._lock:
+            if self._conn is None:
+                started = time.perf_counter()
+                self._acquire_ctx = self._pool.acquire()
+                self._conn = await self._acquire_ctx.__aenter__()
+                metrics.summary("db.acquire_wait_seconds").observe(time.perf_counter() - started)
+                metrics.counter("db.acquires").inc()
+        return self._conn
+
+    async def release(self):
+        # Also called by handlers before slow work (inference, external APIs);
+        # a later acquire() takes a new connection
+        async with self._lock:
+            if self._conn is not None:
+                ctx, self._acquire_ctx, self._conn = self._acquire_ctx, None, None
+                await ctx.__aexit__(None, None, None)
+
+
+async def get_request_db(pool=Depends(get_pool)):
+    db = RequestConnection(pool)
+    try:
+        yield db
+    finally:
+        await db.release()
+
+
+async def get_request_replica_db(request: HTTPConnection, db: RequestConnection = Depends(get_request_db)):
+    # Connection for read-only queries. Without a replica this is the
+    # request's primary connection, so nothing extra is acquired.
+    replica_pool = getattr(request.app.state, "db_replica_pool", None)
+    if replica_pool is None:
+        yield db
+        return
+
+    replica = RequestConnection(replica_pool)
+    try:
+        yield replica
+    finally:
+        await replica.release()
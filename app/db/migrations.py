@@ -0,0 +1,222 @@
+import logging
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Append-only: never edit a migration that has shipped, add a new one.
+# (version, name, sql)
+MIGRATIONS = [
+    (
+        1,
+        "users",
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id UUID PRIMARY KEY,
+            username TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            phone_number TEXT,
+            role TEXT NOT NULL DEFAULT 'user',
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+
+        -- Databases created from the first schema stored the hash as password_hash
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'users' AND column_name = 'password_hash'
+            ) AND NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'users' AND column_name = 'password'
+            ) THEN
+                ALTER TABLE users RENAME COLUMN password_hash TO password;
+            END IF;
+        END $$;
+
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS username TEXT;
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+        ALTER TABLE users ALTER COLUMN phone_number DROP NOT NULL;
+        ALTER TABLE users ALTER COLUMN role SET DEFAULT 'user';
+        """,
+    ),
+    (
+        2,
+        "users_billing_columns",
+        """
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS plan TEXT NOT NULL DEFAULT 'free';
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS subscription_status TEXT;
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS stripe_customer_id TEXT;
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS monthly_characters_used BIGINT NOT NULL DEFAULT 0;
+        """,
+    ),
+    (
+        3,
+        "usage_flush_batches",
+        """
+        CREATE TABLE IF NOT EXISTS usage_flush_batches (
+            batch_id UUID PRIMARY KEY,
+            flushed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        """,
+    ),
+    (
+        4,
+        "stripe_events",
+        """
+        CREATE TABLE IF NOT EXISTS stripe_events (
+            event_id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            payload JSONB NOT NULL,
+            received_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            processed_at TIMESTAMPTZ,
+            outcome TEXT,
+            attempts INT NOT NULL DEFAULT 0,
+            last_error TEXT
+        );
+
+        CREATE INDEX IF NOT EXISTS stripe_events_pending_idx
+        ON stripe_events (received_at)
+        WHERE processed_at IS NULL;
+        """,
+    ),
+    (
+        5,
+        "users_lookup_indexes",
+        """
+        -- username arm of get_by_email_and_username (email is covered by its UNIQUE)
+        CREATE UNIQUE INDEX IF NOT EXISTS users_username_key
+        ON users (username);
+
+        -- webhook fallback lookup by Stripe customer
+        CREATE UNIQUE INDEX IF NOT EXISTS users_stripe_customer_id_key
+        ON users (stripe_customer_id)
+        WHERE stripe_customer_id IS NOT NULL;
+        """,
+    ),
+    (
+        6,
+        "paraphrase_history",
+        """
+        CREATE TABLE IF NOT EXISTS paraphrase_history (
+            id UUID PRIMARY KEY,
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            mode TEXT NOT NULL,
+            input_text TEXT NOT NULL,
+            output_text TEXT NOT NULL,
+            input_length INT NOT NULL,
+            output_length INT NOT NULL,
+            inference_ms INT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL
+        );
+
+        -- keyset pagination: newest first per user
+        CREATE INDEX IF NOT EXISTS paraphrase_history_user_created_idx
+        ON paraphrase_history (user_id, created_at, id);
+
+        -- Large texts are compressed by TOAST; lz4 is much cheaper than the
+        -- default pglz. Needs PG 14+ built with lz4, otherwise pglz is kept.
+        DO $$
+        BEGIN
+            IF current_setting('server_version_num')::int >= 140000 THEN
+                ALTER TABLE paraphrase_history
+                    ALTER COLUMN input_text SET COMPRESSION lz4,
+                    ALTER COLUMN output_text SET COMPRESSION lz4;
+            END IF;
+        EXCEPTION WHEN feature_not_supported THEN
+            NULL;
+        END
+        $$;
+        """,
+    ),
+    (
+        7,
+        "paraphrase_history_search",
+        """
+        -- Maintained by Postgres on every insert, including COPY. Only the
+        -- first 100k characters of each side are indexed so a huge document
+        -- can't exceed the 1MB tsvector limit and fail its whole batch.
+        ALTER TABLE paraphrase_history
+        ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('english', left(input_text, 100000) || ' ' || left(output_text, 100000))
+        ) STORED;
+
+        -- btree_gin lets one GIN index answer "this user's rows matching the
+        -- query"; without it, fall back to a GIN over the vector alone.
+        DO $$
+        BEGIN
+            CREATE EXTENSION IF NOT EXISTS btree_gin;
+            CREATE INDEX IF NOT EXISTS paraphrase_history_search_idx
+            ON paraphrase_history USING GIN (user_id, search_vector);
+        EXCEPTION WHEN insufficient_privilege OR undefined_file THEN
+            CREATE INDEX IF NOT EXISTS paraphrase_history_search_idx
+            ON paraphrase_history USING GIN (search_vector);
+        END
+        $$;
+        """,
+    ),
+    (
+        8,
+        "paraphrase_history_segments",
+        """
+        -- Per-sentence outputs of incremental paraphrases, aligned with
+        -- split_sentences(input_text). Nullable, so no table rewrite.
+        ALTER TABLE paraphrase_history
+        ADD COLUMN IF NOT EXISTS segment_outputs TEXT[];
+        """,
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Arbitrary constant shared by all workers, so only one of them migrates
+MIGRATION_LOCK_ID = 7_301_942
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+
+async def _applied_versions(conn) -> set[int]:
+    try:
+        rows = await conn.fetch("SELECT version FROM schema_migrations")
+    except asyncpg.exceptions.UndefinedTableError:
+        return set()
+    return {row["version"] for row in rows}
+
+
+async def migrate(conn) -> list[int]:
+    # Usual startup: a single read, no lock and no DDL
+    if LATEST_VERSION in await _applied_versions(conn):
+        return []
+
+    await conn.execute(CREATE_MIGRATIONS_TABLE)
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+    try:
+        # Another worker may have migrated while we waited for the lock
+        applied = await _applied_versions(conn)
+        newly_applied = []
+
+        for version, name, sql in MIGRATIONS:
+            if version in applied:
+                continue
+
+            logger.info("Applying migration %d (%s)", version, name)
+            async with conn.transaction():
+                await conn.execute(sql)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                    version,
+                    name,
+                )
+            newly_applied.append(version)
+
+        return newly_applied
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
@@ -0,0 +1,88 @@
+import logging
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# name -> sql, for every hot query. Each pooled connection prepares all of
+# them once when it is created (see prepare_queries), so requests skip the
+# parse/plan round trip.
+QUERIES: dict[str, str] = {}
+
+
+def register_query(name: str, sql: str) -> str:
+    if name in QUERIES and QUERIES[name] != sql:
+        raise ValueError(f"Query '{name}' is already registered")
+    QUERIES[name] = sql
+    return name
+
+
+class RegistryConnection(asyncpg.Connection):
+    __slots__ = ("prepared_statements",)
+
+
+async def prepare_queries(conn: RegistryConnection):
+    # asyncpg pool init hook
+    prepared = {}
+    for name, sql in QUERIES.items():
+        try:
+            prepared[name] = await conn.prepare(sql)
+        except asyncpg.PostgresError as e:
+            # The schema isn't there yet (e.g. a migration adds a column it
+            # uses); the query is sent unprepared
+            logger.info("Query %s not prepared: %s", name, e)
+    conn.prepared_statements = prepared
+
+
+def prepared_statement(conn, name: str):
+    # Works through a pool proxy; any other connection falls back to plain SQL
+    prepared = getattr(conn, "prepared_statements", None)
+    if isinstance(prepared, dict):
+        return prepared.get(name)
+    return None
+
+
+@asynccontextmanager
+async def _connection(conn):
+    # A pool lends a connection for just this query, so callers hold none
+    # between queries (e.g. while hashing a password)
+    if isinstance(conn, asyncpg.Pool):
+        async with conn.acquire() as pooled:
+            yield pooled
+    else:
+        yield conn
+
+
+async def fetchrow(conn, name: str, *args):
+    async with _connection(conn) as conn:
+        statement = prepared_statement(conn, name)
+        if statement is not None:
+            return await statement.fetchrow(*args)
+        return await conn.fetchrow(QUERIES[name], *args)
+
+
+async def fetch(conn, name: str, *args):
+    async with _connection(conn) as conn:
+        statement = prepared_statement(conn, name)
+        if statement is not None:
+            return await statement.fetch(*args)
+        return await conn.fetch(QUERIES[name], *args)
+
+
+async def fetchval(conn, name: str, *args):
+    async with _connection(conn) as conn:
+        statement = prepared_statement(conn, name)
+        if statement is not None:
+            return await statement.fetchval(*args)
+        return await conn.fetchval(QUERIES[name], *args)
+
+
+async def execute(conn, name: str, *args):
+    async with _connection(conn) as conn:
+        statement = prepared_statement(conn, name)
+        if statement is not None:
+            # PreparedStatement has no execute(); fetch() runs it the same way
+            await statement.fetch(*args)
+            return
+        await conn.execute(QUERIES[name], *args)
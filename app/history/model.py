@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+import uuid
+
+
+class HistoryEntry(BaseModel):
+    id: uuid.UUID
+    mode: str
+    input_text: str
+    output_text: str
+    input_length: int
+    output_length: int
+    inference_ms: int
+    created_at: datetime
+
+
+class HistorySearchHit(HistoryEntry):
+    rank: float
+
+
+class HistoryPage(BaseModel):
+    items: List[HistoryEntry]
+    # Pass back as `cursor` for the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
+
+
+class HistorySearchPage(BaseModel):
+    items: List[HistorySearchHit]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,63 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.auth.dependencies import get_current_user
+from app.db.connection import RequestConnection, get_request_replica_db
+from app.history.model import HistoryEntry, HistoryPage, HistorySearchHit, HistorySearchPage
+from app.history.service import fetch_history_page, search_history
+
+router = APIRouter(prefix="/v1/history", tags=["History"])
+
+
+@router.get("", response_model=HistoryPage)
+async def list_history(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user=Depends(get_current_user),
+    replica_db: RequestConnection = Depends(get_request_replica_db),
+):
+    # Newest first. Entries are written behind, so one made in the last
+    # second or so may not be listed yet.
+    try:
+        async with replica_db.acquire() as conn:
+            rows, next_cursor = await fetch_history_page(conn, user.id, limit, cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+    return HistoryPage(
+        items=[HistoryEntry.model_construct(**row) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/search", response_model=HistorySearchPage)
+async def search_user_history(
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user=Depends(get_current_user),
+    replica_db: RequestConnection = Depends(get_request_replica_db),
+):
+    # Web-search syntax: "quoted phrases", -excluded, OR
+    if not q.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search query cannot be empty",
+        )
+
+    try:
+        async with replica_db.acquire() as conn:
+            rows, next_cursor = await search_history(conn, user.id, q, limit, cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+    return HistorySearchPage(
+        items=[HistorySearchHit.model_construct(**row) for row in rows],
+        next_cursor=next_cursor,
+    )
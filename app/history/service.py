@@ -0,0 +1,316 @@
+import asyncio
+import base64
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db import queries
+from app.db.queries import register_query
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TABLE = "paraphrase_history"
+HISTORY_COLUMNS = (
+    "id",
+    "user_id",
+    "mode",
+    "input_text",
+    "output_text",
+    "input_length",
+    "output_length",
+    "inference_ms",
+    "created_at",
+    "segment_outputs",
+)
+
+HISTORY_FIRST_PAGE = register_query(
+    "history_first_page",
+    """
+    SELECT id, mode, input_text, output_text, input_length, output_length,
+           inference_ms, created_at
+    FROM paraphrase_history
+    WHERE user_id = $1
+    ORDER BY created_at DESC, id DESC
+    LIMIT $2
+    """,
+)
+
+# Keyset: continue strictly below the last row of the previous page
+HISTORY_NEXT_PAGE = register_query(
+    "history_next_page",
+    """
+    SELECT id, mode, input_text, output_text, input_length, output_length,
+           inference_ms, created_at
+    FROM paraphrase_history
+    WHERE user_id = $1
+      AND (created_at, id) < ($2, $3)
+    ORDER BY created_at DESC, id DESC
+    LIMIT $4
+    """,
+)
+
+HISTORY_SEGMENTS = register_query(
+    "history_segments",
+    """
+    SELECT mode, input_text, segment_outputs
+    FROM paraphrase_history
+    WHERE id = $1
+      AND user_id = $2
+    """,
+)
+
+# Ranked matches, keyset-paginated on (rank, created_at, id). The rank is
+# recomputed identically on every page, so it is a stable sort key.
+HISTORY_SEARCH = register_query(
+    "history_search",
+    """
+    SELECT id, mode, input_text, output_text, input_length, output_length,
+           inference_ms, created_at, rank
+    FROM (
+        SELECT h.*, ts_rank_cd(h.search_vector, q.query) AS rank
+        FROM paraphrase_history h,
+             websearch_to_tsquery('english', $2) AS q(query)
+        WHERE h.user_id = $1
+          AND h.search_vector @@ q.query
+    ) hits
+    WHERE $3::real IS NULL
+       OR (rank, created_at, id) < ($3::real, $4::timestamptz, $5::uuid)
+    ORDER BY rank DESC, created_at DESC, id DESC
+    LIMIT $6
+    """,
+)
+
+
+class HistoryRecorder:
+    # Write-behind recording of paraphrase history.
+    #
+    # record() only appends to an in-memory buffer, so the paraphrase response
+    # never waits on the DB. A background task bulk-inserts the buffer with
+    # COPY. History is not billing data: entries buffered when a worker dies
+    # are lost, and when the DB is unreachable for long the buffer is capped
+    # and new entries are dropped rather than growing without bound. Rows
+    # the DB rejects (e.g. the user was deleted) are dropped, never retried.
+
+    def __init__(self, flush_interval: float, flush_batch_size: int, max_buffered: int):
+        self._flush_interval = flush_interval
+        self._flush_batch_size = flush_batch_size
+        self._max_buffered = max_buffered
+        self._buffer: list[tuple] = []
+
+        self._pool = None
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+
+        self._buffered = metrics.gauge("history.buffered")
+        self._dropped = metrics.counter("history.dropped")
+        self._rejected = metrics.counter("history.rejected")
+        self._flushed = metrics.counter("history.flushed")
+        self._flush_seconds = metrics.summary("history.flush_seconds")
+
+    async def start(self, pool):
+        self._pool = pool
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final history flush failed; %d entries lost", len(self._buffer))
+
+    def record(
+        self,
+        user_id,
+        mode: str,
+        input_text: str,
+        output_text: str,
+        inference_ms: int,
+        segment_outputs: list[str] | None = None,
+    ) -> uuid.UUID | None:
+        # Returns the id the entry will be stored under, or None if it was dropped
+        if len(self._buffer) >= self._max_buffered:
+            self._dropped.inc()
+            return None
+
+        # Postgres text can't hold NUL; one would fail the whole COPY batch
+        input_text = _strip_nul(input_text)
+        output_text = _strip_nul(output_text)
+        if segment_outputs is not None:
+            segment_outputs = [_strip_nul(segment) for segment in segment_outputs]
+
+        entry_id = uuid.uuid4()
+        self._buffer.append((
+            entry_id,
+            user_id,
+            _strip_nul(mode),
+            input_text,
+            output_text,
+            len(input_text),
+            len(output_text),
+            inference_ms,
+            datetime.now(timezone.utc),
+            segment_outputs,
+        ))
+        self._buffered.set(len(self._buffer))
+
+        if len(self._buffer) >= self._flush_batch_size:
+            self._wakeup.set()
+        return entry_id
+
+    def find_buffered(self, entry_id: uuid.UUID, user_id) -> dict | None:
+        # An entry recorded by this worker that hasn't been flushed yet.
+        # Newest entries are at the end, and those are the ones asked for.
+        for record in reversed(self._buffer):
+            if record[0] == entry_id and str(record[1]) == str(user_id):
+                return dict(zip(HISTORY_COLUMNS, record))
+        return None
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[: self._flush_batch_size]
+                del self._buffer[: len(batch)]
+
+                started = time.perf_counter()
+                try:
+                    async with self._pool.acquire() as conn:
+                        flushed = await self._copy(conn, batch)
+                except Exception:
+                    # Unreachable DB or another transient error: put the batch
+                    # back in front (COPY is all or nothing) and retry on the next tick
+                    self._buffer[:0] = batch
+                    raise
+                finally:
+                    self._buffered.set(len(self._buffer))
+
+                self._flush_seconds.observe(time.perf_counter() - started)
+                self._flushed.inc(flushed)
+
+    async def _copy(self, conn, batch: list[tuple]) -> int:
+        # Returns how many rows were written. A batch the DB rejects for its
+        # content is split in half until the bad rows are isolated and dropped.
+        try:
+            await conn.copy_records_to_table(HISTORY_TABLE, records=batch, columns=HISTORY_COLUMNS)
+            return len(batch)
+        except (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError) as e:
+            if len(batch) == 1:
+                logger.warning("Dropping history entry %s: %s", batch[0][0], e)
+                self._rejected.inc()
+                return 0
+
+        middle = len(batch) // 2
+        return await self._copy(conn, batch[:middle]) + await self._copy(conn, batch[middle:])
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("History flush failed; will retry")
+
+
+def _strip_nul(text: str) -> str:
+    return text.replace("\x00", "") if "\x00" in text else text
+
+
+def _pack_cursor(*parts) -> str:
+    raw = "|".join(str(part) for part in parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _unpack_cursor(cursor: str, size: int) -> list[str]:
+    # Raises ValueError on anything we didn't issue
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        parts = base64.urlsafe_b64decode(padded).decode().split("|")
+    except Exception as e:
+        raise ValueError("Malformed cursor") from e
+    if len(parts) != size:
+        raise ValueError("Malformed cursor")
+    return parts
+
+
+def encode_cursor(created_at: datetime, entry_id: uuid.UUID) -> str:
+    return _pack_cursor(created_at.isoformat(), entry_id)
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    created_at, entry_id = _unpack_cursor(cursor, 2)
+    return datetime.fromisoformat(created_at), uuid.UUID(entry_id)
+
+
+def encode_search_cursor(rank: float, created_at: datetime, entry_id: uuid.UUID) -> str:
+    # repr() round-trips the float exactly
+    return _pack_cursor(repr(rank), created_at.isoformat(), entry_id)
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, datetime, uuid.UUID]:
+    rank, created_at, entry_id = _unpack_cursor(cursor, 3)
+    return float(rank), datetime.fromisoformat(created_at), uuid.UUID(entry_id)
+
+
+async def fetch_history_page(conn, user_id, limit: int, cursor: str | None = None):
+    # Returns (rows, next_cursor)
+    if cursor is None:
+        rows = await queries.fetch(conn, HISTORY_FIRST_PAGE, user_id, limit + 1)
+    else:
+        created_at, entry_id = decode_cursor(cursor)
+        rows = await queries.fetch(conn, HISTORY_NEXT_PAGE, user_id, created_at, entry_id, limit + 1)
+
+    # One extra row tells us whether there is another page, without a COUNT
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last["created_at"], last["id"])
+
+
+async def search_history(conn, user_id, text: str, limit: int, cursor: str | None = None):
+    # Returns (rows, next_cursor), best match first
+    rank = created_at = entry_id = None
+    if cursor is not None:
+        rank, created_at, entry_id = decode_search_cursor(cursor)
+
+    rows = await queries.fetch(conn, HISTORY_SEARCH, user_id, text, rank, created_at, entry_id, limit + 1)
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_search_cursor(last["rank"], last["created_at"], last["id"])
+
+
+async def load_segments(conn, user_id, entry_id: uuid.UUID) -> tuple[str, str, list[str] | None] | None:
+    # (mode, input_text, segment_outputs) of one of the user's entries
+    row = history_recorder.find_buffered(entry_id, user_id)
+    if row is None:
+        row = await queries.fetchrow(conn, HISTORY_SEGMENTS, entry_id, user_id)
+    if row is None:
+        return None
+    return row["mode"], row["input_text"], row["segment_outputs"]
+
+
+history_recorder = HistoryRecorder(
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL_SECONDS,
+    flush_batch_size=settings.HISTORY_FLUSH_BATCH_SIZE,
+    max_buffered=settings.HISTORY_MAX_BUFFERED,
+)
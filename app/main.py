@@ -1,23 +1,43 @@
 # app/main.py
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.ex_router import api_router
+from app.auth.guard import admin_user
+from app.core.metrics import metrics
+from app.core.memory_watchdog import memory_watchdog
 from app.db.connection import init_db_pool, close_db_pool
-from app.db.schema import create_tables
-from app.paraphrase.ml_model import load_model
+from app.billing.usage_ledger import usage_ledger
+from app.history.service import history_recorder
+from app.auth.password_service import password_service
+from app.auth.recaptcha import recaptcha_verifier
+from app.payments.webhook_consumer import webhook_consumer
+from app.payments.stripe_client import payments_client
+from app.paraphrase.inference import inference
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    # Migrates before opening the pool
     await init_db_pool(app)
-    await create_tables(app)
-    load_model()
+    await usage_ledger.start(app.state.db_pool)
+    await history_recorder.start(app.state.db_pool)
+    webhook_consumer.start(app.state.db_pool)
+    await inference.start()
+    memory_watchdog.start()
     yield
     # Shutdown
+    await webhook_consumer.stop()
+    await memory_watchdog.stop()
+    await inference.stop()
+    await usage_ledger.stop()
+    await history_recorder.stop()
     await close_db_pool(app)
+    password_service.shutdown()
+    await recaptcha_verifier.close()
+    await payments_client.close()
 
 app = FastAPI(
     title="AI Paraphraser API",
@@ -41,4 +61,9 @@ app.add_middleware(
 def health():
     return {"status": "ok"}
 
+# Pool, memory and breaker internals: admins only
+@app.get("/metrics", dependencies=[Depends(admin_user)])
+def read_metrics():
+    return metrics.snapshot()
+
 app.include_router(api_router)
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.metrics import metrics
+
+# How often a running generation checks whether its client is still there
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+class CancellationToken:
+    # Set from the event loop, polled by the inference thread between chunks
+    # and after every decoding step (see CancelOnToken in ml_model)
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: str | None = None
+        self._callbacks = []
+
+    def cancel(self, reason: str):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+            for callback in self._callbacks:
+                callback(reason)
+
+    def on_cancel(self, callback):
+        # For work that can't poll, e.g. a call to the inference service
+        if self._event.is_set():
+            callback(self.reason)
+        else:
+            self._callbacks.append(callback)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise GenerationCancelled(self.reason)
+
+
+async def _watch_disconnect(request, token: CancellationToken):
+    while not token.cancelled:
+        if await request.is_disconnected():
+            token.cancel("disconnect")
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def _supervise(start_work, request):
+    token = CancellationToken()
+    work = asyncio.ensure_future(start_work(token))
+    watcher = asyncio.create_task(_watch_disconnect(request, token)) if request is not None else None
+
+    try:
+        return await asyncio.shield(work)
+    except GenerationCancelled:
+        metrics.counter(f"paraphrase.cancelled.{token.reason}").inc()
+        raise
+    except asyncio.CancelledError:
+        token.cancel("abandoned")
+        metrics.counter("paraphrase.cancelled.abandoned").inc()
+        # Don't hand the thread back to the caller before the model is free
+        try:
+            await work
+        except BaseException:
+            pass
+        raise
+    finally:
+        if watcher:
+            watcher.cancel()
+
+
+async def run_cancellable(fn, *args, request=None, **kwargs):
+    # Runs fn(*args, cancel_token=..., **kwargs) in the thread pool. The token
+    # is cancelled when the client behind `request` disconnects or when the
+    # awaiting task is cancelled (a superseded live revision, a closed
+    # socket); either way the model is freed within one decoding step.
+    return await _supervise(lambda token: run_in_threadpool(fn, *args, cancel_token=token, **kwargs), request)
+
+
+async def run_cancellable_async(fn, *args, request=None, **kwargs):
+    # The same for a coroutine function, which registers its own on_cancel
+    return await _supervise(lambda token: fn(*args, cancel_token=token, **kwargs), request)
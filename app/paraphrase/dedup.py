@@ -0,0 +1,39 @@
+from typing import Dict, List
+
+
+def normalize_segment(segment: str) -> str:
+    # Copies of the same boilerplate often differ only in whitespace after
+    # extraction (e.g. a footer wrapped differently on one page)
+    return " ".join(segment.split())
+
+
+class Deduplicator:
+    # Collects segments, keeping one copy of each; add() returns the index of
+    # the unique segment, so a result can be fanned back out to every copy
+
+    def __init__(self):
+        self.unique: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.total = 0
+
+    def add(self, segment: str) -> int:
+        self.total += 1
+        key = normalize_segment(segment)
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(self.unique)
+            self.unique.append(segment)
+        return index
+
+    @property
+    def duplicates(self) -> int:
+        return self.total - len(self.unique)
+
+
+class GenerationStats:
+    # Optionally filled in by the generate functions, for callers that report it
+    __slots__ = ("segments_total", "segments_deduplicated")
+
+    def __init__(self):
+        self.segments_total = 0
+        self.segments_deduplicated = 0
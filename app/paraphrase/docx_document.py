@@ -0,0 +1,95 @@
+from io import BytesIO
+from typing import List
+
+import docx
+from docx.text.run import Run
+
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _run_format(run: Run) -> tuple:
+    # Runs that look the same can be rewritten as one piece of text
+    font = run.font
+    return (
+        run.style.name if run.style is not None else None,
+        font.bold,
+        font.italic,
+        font.underline,
+        font.strike,
+        font.superscript,
+        font.subscript,
+        font.name,
+        font.size,
+        font.color.rgb if font.color is not None and font.color.type is not None else None,
+        font.highlight_color,
+    )
+
+
+def _run_groups(paragraph) -> List[List[Run]]:
+    # Consecutive runs with the same formatting. Hyperlinks (and anything
+    # else that isn't a plain run) end a group and are left untouched.
+    groups: List[List[Run]] = []
+    current: List[Run] = []
+    current_format = None
+
+    for item in paragraph.iter_inner_content():
+        if not isinstance(item, Run):
+            if current:
+                groups.append(current)
+            current, current_format = [], None
+            continue
+
+        run_format = _run_format(item)
+        if current and run_format != current_format:
+            groups.append(current)
+            current = []
+        current.append(item)
+        current_format = run_format
+
+    if current:
+        groups.append(current)
+    return [group for group in groups if "".join(run.text for run in group).strip()]
+
+
+def _iter_paragraphs(container, seen: set):
+    for paragraph in container.paragraphs:
+        # A merged table cell is returned once per grid column it spans
+        if paragraph._p in seen:
+            continue
+        seen.add(paragraph._p)
+        yield paragraph
+
+    for table in container.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                yield from _iter_paragraphs(cell, seen)
+
+
+class DocxDocument:
+    # A DOCX split into independently paraphrasable units: the uniformly
+    # formatted run groups of every body and table paragraph. Writing a unit
+    # back puts its text in the group's first run, so paragraph styles,
+    # character formatting, tables and everything else stay as they were.
+
+    def __init__(self, file_bytes: bytes):
+        self._document = docx.Document(BytesIO(file_bytes))
+        self._units: List[List[Run]] = [
+            group
+            for paragraph in _iter_paragraphs(self._document, set())
+            for group in _run_groups(paragraph)
+        ]
+
+    @property
+    def texts(self) -> List[str]:
+        return ["".join(run.text for run in unit) for unit in self._units]
+
+    def apply(self, outputs: List[str]):
+        for unit, output in zip(self._units, outputs):
+            unit[0].text = output
+            for run in unit[1:]:
+                run.text = ""
+
+    def to_bytes(self) -> bytes:
+        buffer = BytesIO()
+        self._document.save(buffer)
+        return buffer.getvalue()
@@ -0,0 +1,119 @@
+import importlib
+import logging
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.memory_watchdog import MemoryLimitExceeded, memory_watchdog
+from app.paraphrase.cancellation import run_cancellable, run_cancellable_async
+from app.paraphrase.inference_client import InferenceClient
+from app.paraphrase.inference_pool import InferencePool
+from app.paraphrase.inference_protocol import InferenceUnavailable, input_characters
+from app.paraphrase.quality import DECODING_TIERS, QualityController, decoding_tier
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceGateway:
+    # What the API calls to paraphrase. With a client, the calls go to the
+    # inference service(s) (python -m app.paraphrase.inference_server) and
+    # this process never imports torch; without one the model runs
+    # in-process, for development. Calls take `request=` to cancel on
+    # client disconnect, and are decoded at the tier `quality` picks.
+
+    def __init__(self, quality: QualityController, client: InferenceClient | InferencePool | None = None):
+        self.quality = quality
+        self._client = client
+        self._ml_model = None
+
+    async def start(self):
+        if self._client is None:
+            await run_in_threadpool(self._local_model().load_model)
+            return
+        try:
+            await self._client.connect()
+        except InferenceUnavailable as e:
+            # The service may still be loading its model; calls reconnect
+            logger.warning("%s", e)
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.close()
+
+    def _local_model(self):
+        if self._ml_model is None:
+            self._ml_model = importlib.import_module("app.paraphrase.ml_model")
+        return self._ml_model
+
+    async def _call(self, method: str, *args, request=None, **kwargs):
+        # Documents (max_chunks=None) are slow by design; they follow the
+        # tier but don't count against the latency SLO
+        interactive = kwargs.get("max_chunks", 0) is not None
+
+        with self.quality.track() as tier:
+            decoding_tier.set(DECODING_TIERS[tier]["name"])
+            started = time.perf_counter()
+            result = await self._run(method, *args, request=request, tier=tier, **kwargs)
+            if interactive:
+                self.quality.observe((time.perf_counter() - started) / _thousands_of_characters(method, args))
+        return result
+
+    async def _run(self, method: str, *args, request=None, **kwargs):
+        if self._client is None:
+            # The model lives in this worker, so its memory is this worker's
+            try:
+                memory_watchdog.admit(input_characters(method, args) * settings.MEMORY_BYTES_PER_INPUT_CHAR)
+            except MemoryLimitExceeded as e:
+                raise InferenceUnavailable(str(e)) from e
+            fn = getattr(self._local_model(), method)
+            with memory_watchdog.track():
+                return await run_cancellable(fn, *args, request=request, **kwargs)
+        return await run_cancellable_async(self._client.call, method, *args, request=request, **kwargs)
+
+    async def generate_paraphrase(self, *args, request=None, **kwargs) -> str:
+        return await self._call("generate_paraphrase", *args, request=request, **kwargs)
+
+    async def generate_paraphrase_batch(self, *args, request=None, **kwargs) -> list:
+        return await self._call("generate_paraphrase_batch", *args, request=request, **kwargs)
+
+    async def generate_paraphrase_variants(self, *args, request=None, **kwargs) -> list:
+        return await self._call("generate_paraphrase_variants", *args, request=request, **kwargs)
+
+
+def _thousands_of_characters(method: str, args) -> float:
+    # Latency is judged per 1000 input characters, so a long text isn't
+    # mistaken for overload; shorter calls count as a whole 1000, as their
+    # time is mostly fixed cost. Variants generate the text once per mode.
+    characters = input_characters(method, args)
+    if method == "generate_paraphrase_variants" and len(args) > 1:
+        characters *= len(args[1])
+    return max(1.0, characters / 1000)
+
+
+def _remote_client() -> InferenceClient | InferencePool | None:
+    if settings.INFERENCE_MODE == "local":
+        return None
+    if settings.INFERENCE_MODE != "remote":
+        raise ValueError(f"Unknown inference mode '{settings.INFERENCE_MODE}'")
+    if not settings.INFERENCE_NODES:
+        return InferenceClient(settings.INFERENCE_SOCKET_PATH, settings.INFERENCE_CONNECT_TIMEOUT_SECONDS)
+    return InferencePool(
+        settings.INFERENCE_NODES,
+        connect_timeout=settings.INFERENCE_CONNECT_TIMEOUT_SECONDS,
+        health_interval=settings.INFERENCE_HEALTH_INTERVAL_SECONDS,
+        health_timeout=settings.INFERENCE_HEALTH_TIMEOUT_SECONDS,
+        eject_after_failures=settings.INFERENCE_EJECT_AFTER_FAILURES,
+        max_attempts=settings.INFERENCE_MAX_ATTEMPTS,
+    )
+
+
+inference = InferenceGateway(
+    QualityController(
+        slo=settings.QUALITY_SLO_SECONDS_PER_1K_CHARS,
+        max_queue_depth=settings.QUALITY_MAX_QUEUE_DEPTH,
+        window=settings.QUALITY_WINDOW,
+        step_interval=settings.QUALITY_STEP_INTERVAL_SECONDS,
+    ),
+    _remote_client(),
+)
@@ -0,0 +1,136 @@
+import asyncio
+import itertools
+import logging
+
+from app.core.metrics import metrics
+from app.paraphrase.cancellation import CancellationToken
+from app.paraphrase.inference_protocol import (
+    CALL,
+    CANCEL,
+    ERROR,
+    PING,
+    RESULT,
+    InferenceUnavailable,
+    ProtocolError,
+    decode_error,
+    decode_result,
+    encode_frame,
+    open_connection,
+    read_frame,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceClient:
+    # One multiplexed connection to an inference service. Calls are matched
+    # to their replies by request id; the connection is (re)opened on demand,
+    # and a lost connection fails every call still waiting on it.
+
+    def __init__(self, address: str, connect_timeout: float = 5.0):
+        self.address = address
+        self._connect_timeout = connect_timeout
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._connect_lock = asyncio.Lock()
+        self._ids = itertools.count(1)
+        # request id -> (future, stats to fill in, connection it was sent on)
+        self._pending: dict[int, tuple[asyncio.Future, object, asyncio.StreamWriter]] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        async with self._connect_lock:
+            if self.connected:
+                return
+            try:
+                reader, self._writer = await asyncio.wait_for(
+                    open_connection(self.address), self._connect_timeout
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                metrics.counter("inference.client.connect_failures").inc()
+                raise InferenceUnavailable(f"Inference service unreachable at {self.address}: {e}") from e
+            self._reader_task = asyncio.create_task(self._read_replies(reader, self._writer))
+
+    async def close(self):
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        self._fail_pending(InferenceUnavailable("Inference client closed"))
+
+    async def call(self, method: str, *args, cancel_token: CancellationToken | None = None, stats=None, **kwargs):
+        # Stats can't cross the socket by reference; the service sends the
+        # counts back and they are copied onto `stats`
+        body = {"method": method, "args": args, "kwargs": kwargs, "stats": stats is not None}
+        return await self._request(CALL, body, cancel_token, stats)
+
+    async def ping(self, timeout: float) -> dict:
+        # {"accepting": bool, "running": int}
+        try:
+            return await asyncio.wait_for(self._request(PING, None), timeout)
+        except asyncio.TimeoutError as e:
+            raise InferenceUnavailable(f"Inference service at {self.address} did not answer") from e
+
+    async def _request(self, message_type: int, body: dict | None, cancel_token: CancellationToken | None = None, stats=None):
+        if not self.connected:
+            await self.connect()
+
+        request_id = next(self._ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        writer = self._writer
+        self._pending[request_id] = (future, stats, writer)
+
+        writer.write(encode_frame(message_type, request_id, body))
+
+        if cancel_token is not None:
+            cancel_token.on_cancel(lambda reason: self._send_cancel(writer, request_id, reason))
+
+        try:
+            await writer.drain()
+            return await future
+        except ConnectionError as e:
+            raise InferenceUnavailable(f"Lost the inference service: {e}") from e
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _send_cancel(self, writer: asyncio.StreamWriter, request_id: int, reason: str):
+        if request_id in self._pending and not writer.is_closing():
+            writer.write(encode_frame(CANCEL, request_id, {"reason": reason}))
+
+    async def _read_replies(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                message_type, request_id, body = await read_frame(reader)
+                future, stats, _ = self._pending.get(request_id, (None, None, None))
+                if future is None or future.done():
+                    continue
+
+                if message_type == RESULT:
+                    if stats is not None and body.get("stats"):
+                        stats.segments_total, stats.segments_deduplicated = body["stats"]
+                    future.set_result(decode_result(body["result"]))
+                elif message_type == ERROR:
+                    future.set_exception(decode_error(body))
+                else:
+                    raise ProtocolError(f"Unexpected message type {message_type}")
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError) as e:
+            logger.warning("Inference connection lost: %s", e)
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            self._fail_pending(InferenceUnavailable("Lost the inference service"), writer)
+
+    def _fail_pending(self, error: Exception, writer: asyncio.StreamWriter | None = None):
+        for future, _, sent_on in list(self._pending.values()):
+            if not future.done() and (writer is None or sent_on is writer):
+                future.set_exception(error)
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import random
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.metrics import metrics
+from app.paraphrase.cancellation import CancellationToken
+from app.paraphrase.inference_client import InferenceClient
+from app.paraphrase.inference_protocol import InferenceUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceNode:
+    def __init__(self, address: str, connect_timeout: float, eject_after_failures: int):
+        self.address = address
+        self.client = InferenceClient(address, connect_timeout)
+        # Opens (ejects the node) after consecutive failed calls or health
+        # checks; only a passing health check brings it back
+        self.breaker = CircuitBreaker(failure_threshold=eject_after_failures)
+        self.accepting = True
+        # Calls this gateway has in flight on the node
+        self.outstanding = 0
+
+    @property
+    def available(self) -> bool:
+        return self.accepting and not self.breaker.is_open
+
+
+class InferencePool:
+    # Spreads calls over several inference services, each to the available
+    # node with the fewest calls in flight from this gateway. A call whose
+    # node can't be reached or is draining never ran, so it is retried on
+    # another node, up to `max_attempts` nodes in all. Nodes are pinged
+    # every `health_interval`: failing nodes are ejected, and nodes that
+    # answer again (or stop draining, after a rollout) are brought back.
+    # Same interface as InferenceClient.
+
+    def __init__(
+        self,
+        addresses: list[str],
+        connect_timeout: float,
+        health_interval: float,
+        health_timeout: float,
+        eject_after_failures: int,
+        max_attempts: int,
+    ):
+        if not addresses:
+            raise ValueError("An inference pool needs at least one node")
+        self.nodes = [InferenceNode(address, connect_timeout, eject_after_failures) for address in addresses]
+        self._health_interval = health_interval
+        self._health_timeout = health_timeout
+        self._max_attempts = max_attempts
+        self._health_task: asyncio.Task | None = None
+
+    async def connect(self):
+        await self.check_health()
+        self._health_task = asyncio.create_task(self._run_health_checks())
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for node in self.nodes:
+            await node.client.close()
+
+    def _pick(self, tried: set) -> InferenceNode | None:
+        candidates = [node for node in self.nodes if node.available and node not in tried]
+        if not candidates:
+            return None
+        fewest = min(node.outstanding for node in candidates)
+        # Random among the least loaded, so idle nodes share the work
+        return random.choice([node for node in candidates if node.outstanding == fewest])
+
+    async def call(self, method: str, *args, cancel_token: CancellationToken | None = None, **kwargs):
+        tried = set()
+        error = InferenceUnavailable("No inference node is available")
+
+        for attempt in range(self._max_attempts):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
+            node = self._pick(tried)
+            if node is None:
+                break
+            tried.add(node)
+            if attempt:
+                metrics.counter("inference.pool.retries").inc()
+
+            node.outstanding += 1
+            try:
+                result = await node.client.call(method, *args, cancel_token=cancel_token, **kwargs)
+            except InferenceUnavailable as e:
+                error = e
+                self._record_failure(node)
+                continue
+            finally:
+                node.outstanding -= 1
+
+            node.breaker.record_success()
+            return result
+
+        raise error
+
+    def _record_failure(self, node: InferenceNode):
+        was_ejected = node.breaker.is_open
+        node.breaker.record_failure()
+        if node.breaker.is_open and not was_ejected:
+            logger.warning("Ejecting inference node %s", node.address)
+            metrics.counter("inference.pool.ejections").inc()
+
+    async def check_health(self):
+        await asyncio.gather(*(self._check_node(node) for node in self.nodes))
+        metrics.gauge("inference.pool.available_nodes").set(sum(node.available for node in self.nodes))
+
+    async def _check_node(self, node: InferenceNode):
+        try:
+            status = await node.client.ping(self._health_timeout)
+        except InferenceUnavailable:
+            self._record_failure(node)
+            return
+
+        if node.breaker.is_open:
+            logger.info("Inference node %s is back", node.address)
+        node.breaker.record_success()
+        node.accepting = status["accepting"]
+
+    async def _run_health_checks(self):
+        while True:
+            await asyncio.sleep(self._health_interval)
+            try:
+                await self.check_health()
+            except Exception:
+                logger.exception("Inference health check failed")
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+import struct
+
+from app.paraphrase.cancellation import GenerationCancelled
+
+# Every frame is a fixed binary header followed by a compact JSON body:
+# body length, message type, request id (many calls share one connection)
+HEADER = struct.Struct("!IBI")
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+CALL = 1  # gateway -> service: {"method", "args", "kwargs", "stats"}
+RESULT = 2  # service -> gateway: {"result", "stats"}
+ERROR = 3  # service -> gateway: an encoded exception
+CANCEL = 4  # gateway -> service: {"reason"}
+PING = 5  # gateway -> service, answered with RESULT {"result": {"accepting", "running"}}
+
+# The only functions the service runs on a gateway's behalf
+METHODS = ("generate_paraphrase", "generate_paraphrase_batch", "generate_paraphrase_variants")
+
+
+def input_characters(method: str, args) -> int:
+    # How much text a call generates from, to size it before it runs
+    if not args or method not in METHODS:
+        return 0
+    if method == "generate_paraphrase_batch":
+        return sum(len(item[0]) for item in args[0])
+    return len(args[0])
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class InferenceUnavailable(Exception):
+    # The service can't be reached or isn't taking work (e.g. draining);
+    # the call never ran, so it is safe to retry elsewhere
+    pass
+
+
+# Exceptions the gateway handles by type; anything else arrives as RuntimeError
+_ERRORS = {
+    "ValueError": ValueError,
+    "GenerationCancelled": GenerationCancelled,
+    "InferenceUnavailable": InferenceUnavailable,
+}
+
+
+def _is_unix_address(address: str) -> bool:
+    return "/" in address or ":" not in address
+
+
+async def open_connection(address: str):
+    # A socket path, or host:port for a service on another machine
+    if _is_unix_address(address):
+        return await asyncio.open_unix_connection(address)
+    host, _, port = address.rpartition(":")
+    return await asyncio.open_connection(host, int(port))
+
+
+async def start_server(handler, address: str) -> asyncio.AbstractServer:
+    if _is_unix_address(address):
+        # A socket file left behind by a previous run would make bind fail
+        if os.path.exists(address):
+            os.unlink(address)
+        return await asyncio.start_unix_server(handler, path=address)
+    host, _, port = address.rpartition(":")
+    return await asyncio.start_server(handler, host, int(port))
+
+
+def encode_frame(message_type: int, request_id: int, body: dict | None = None) -> bytes:
+    payload = json.dumps(body, separators=(",", ":")).encode() if body is not None else b""
+    return HEADER.pack(len(payload), message_type, request_id) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, int, dict | None]:
+    # Raises asyncio.IncompleteReadError when the other side hangs up
+    length, message_type, request_id = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_BODY_BYTES:
+        raise ProtocolError(f"Frame of {length} bytes is too large")
+    body = json.loads(await reader.readexactly(length)) if length else None
+    return message_type, request_id, body
+
+
+def encode_error(error: BaseException) -> dict:
+    return {"__error__": type(error).__name__, "message": str(error)}
+
+
+def decode_error(body: dict) -> Exception:
+    error_type = _ERRORS.get(body["__error__"])
+    if error_type is None:
+        return RuntimeError(f"{body['__error__']}: {body['message']}")
+    return error_type(body["message"])
+
+
+def encode_result(result):
+    # Batch results carry per-item exceptions alongside the texts
+    if isinstance(result, list):
+        return [encode_error(item) if isinstance(item, Exception) else item for item in result]
+    return result
+
+
+def decode_result(result):
+    if isinstance(result, list):
+        return [decode_error(item) if isinstance(item, dict) and "__error__" in item else item for item in result]
+    return result
@@ -0,0 +1,204 @@
+import asyncio
+import functools
+import logging
+import signal
+import time
+
+from app.core.config import settings
+from app.core.memory_watchdog import MemoryLimitExceeded, MemoryWatchdog, memory_watchdog
+from app.core.metrics import metrics
+from app.paraphrase.cancellation import CancellationToken, GenerationCancelled
+from app.paraphrase.dedup import GenerationStats
+from app.paraphrase.inference_protocol import (
+    CALL,
+    CANCEL,
+    ERROR,
+    METHODS,
+    PING,
+    RESULT,
+    InferenceUnavailable,
+    ProtocolError,
+    encode_error,
+    encode_frame,
+    encode_result,
+    input_characters,
+    read_frame,
+    start_server,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceServer:
+    # Owns the model and serves gateways' calls on `address` (a Unix socket
+    # path or host:port). `methods` maps a protocol method name to the
+    # function that runs it; calls run in the default thread pool, so
+    # several decode at once. With a `watchdog`, calls too big for the
+    # memory left are refused, as is everything once it starts recycling.
+
+    def __init__(self, address: str, methods: dict, watchdog: MemoryWatchdog | None = None):
+        self._address = address
+        self._methods = methods
+        self._watchdog = watchdog
+        self._server: asyncio.AbstractServer | None = None
+        self._running = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.draining = False
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def accepting(self) -> bool:
+        return not self.draining and not (self._watchdog and self._watchdog.recycling)
+
+    async def start(self):
+        self._server = await start_server(self._handle_connection, self._address)
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def drain(self):
+        # New calls are refused (gateways retry them on another node) while
+        # the ones already running finish
+        self.draining = True
+        await self._idle.wait()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # request id -> token of the call still running
+        running: dict[int, CancellationToken] = {}
+        calls: set[asyncio.Task] = set()
+
+        try:
+            while True:
+                message_type, request_id, body = await read_frame(reader)
+
+                if message_type == CALL:
+                    refused = self._refuse(body)
+                    if refused is not None:
+                        writer.write(encode_frame(ERROR, request_id, encode_error(refused)))
+                        continue
+                    token = CancellationToken()
+                    running[request_id] = token
+                    task = asyncio.create_task(self._call(writer, request_id, body, token, running))
+                    calls.add(task)
+                    task.add_done_callback(calls.discard)
+                elif message_type == CANCEL:
+                    token = running.get(request_id)
+                    if token is not None:
+                        token.cancel(body["reason"])
+                elif message_type == PING:
+                    writer.write(encode_frame(RESULT, request_id, {
+                        "result": {"accepting": self.accepting, "running": self._running},
+                    }))
+                else:
+                    raise ProtocolError(f"Unexpected message type {message_type}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ProtocolError:
+            logger.exception("Closing inference connection")
+        finally:
+            # Nobody is left to read the results; free the model
+            for token in running.values():
+                token.cancel("abandoned")
+            if calls:
+                await asyncio.wait(calls)
+            writer.close()
+
+    def _refuse(self, body: dict) -> InferenceUnavailable | None:
+        # Refused calls never run, so gateways can retry them on another node
+        if self.draining:
+            return InferenceUnavailable("Draining")
+        if self._watchdog is not None:
+            try:
+                self._watchdog.admit(input_characters(body["method"], body.get("args")) * settings.MEMORY_BYTES_PER_INPUT_CHAR)
+            except MemoryLimitExceeded as e:
+                return InferenceUnavailable(str(e))
+        return None
+
+    async def _call(self, writer, request_id: int, body: dict, token: CancellationToken, running: dict):
+        method = body["method"]
+        stats = GenerationStats() if body.get("stats") else None
+        kwargs = dict(body.get("kwargs") or {}, cancel_token=token)
+        if stats is not None:
+            kwargs["stats"] = stats
+
+        self._running += 1
+        self._idle.clear()
+        started = time.perf_counter()
+        try:
+            fn = self._methods.get(method)
+            if fn is None:
+                raise ValueError(f"Unknown method '{method}'")
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(fn, *body.get("args", ()), **kwargs)
+            )
+            frame = encode_frame(RESULT, request_id, {
+                "result": encode_result(result),
+                "stats": [stats.segments_total, stats.segments_deduplicated] if stats is not None else None,
+            })
+        except Exception as e:
+            if not isinstance(e, GenerationCancelled):
+                logger.exception("Inference call %s failed", method)
+            frame = encode_frame(ERROR, request_id, encode_error(e))
+        finally:
+            running.pop(request_id, None)
+            self._running -= 1
+            if self._running == 0:
+                self._idle.set()
+            metrics.summary("inference.server.call_seconds").observe(time.perf_counter() - started)
+
+        if writer.is_closing():
+            return
+        try:
+            writer.write(frame)
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def _serve(server: InferenceServer, watchdog: MemoryWatchdog):
+    await server.start()
+
+    # SIGTERM (e.g. a rolling deploy) and the memory watchdog drain instead
+    # of dropping calls
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+    watchdog.start(on_recycle=stopping.set)
+
+    await stopping.wait()
+    logger.info("Draining inference service")
+    await server.drain()
+    await server.stop()
+    await watchdog.stop()
+
+
+def main():
+    # Run with: python -m app.paraphrase.inference_server
+    from app.paraphrase import ml_model
+
+    logging.basicConfig(level=logging.INFO)
+    ml_model.load_model()
+
+    address = settings.INFERENCE_LISTEN_ADDRESS or settings.INFERENCE_SOCKET_PATH
+    server = InferenceServer(address, {name: getattr(ml_model, name) for name in METHODS}, watchdog=memory_watchdog)
+    logger.info("Inference service listening on %s", address)
+    asyncio.run(_serve(server, memory_watchdog))
+
+
+if __name__ == "__main__":
+    main()
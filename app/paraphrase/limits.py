@@ -1,2 +1,4 @@
 MAX_FILE_SIZE_BYTES = 5 * 1024 * 1024  # 5MB
 MAX_CHARACTERS = 5_000                # per request
+MAX_BATCH_ITEMS = 100                 # texts per /batch call
+MAX_VARIANTS = 5                      # candidates per mode, and modes per request
@@ -0,0 +1,88 @@
+import asyncio
+import itertools
+import logging
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSession:
+    # Paraphrase-as-you-type for one websocket connection.
+    #
+    # Revisions are debounced: generation starts only once the text has been
+    # quiet for `debounce` seconds, so a burst of keystrokes costs one
+    # generate. At most one generation runs per connection; a newer revision
+    # cancels it, and a result is never sent for a superseded revision.
+
+    def __init__(
+        self,
+        generate: Callable[[str, str], Awaitable[str]],
+        send: Callable[[dict], Awaitable[None]],
+        debounce: float,
+    ):
+        self._generate = generate
+        self._send = send
+        self._debounce = debounce
+        self._sequence = itertools.count(1)
+        # (sequence, client revision, text, mode) of the newest submission
+        self._latest: tuple | None = None
+        self._changed = asyncio.Event()
+        self._inflight: asyncio.Task | None = None
+
+    def submit(self, revision, text: str, mode: str):
+        self._latest = (next(self._sequence), revision, text, mode)
+        self._changed.set()
+        metrics.counter("paraphrase.live_revisions").inc()
+
+        # Stops the model within a decoding step (see run_cancellable)
+        if self._inflight is not None and not self._inflight.done():
+            self._inflight.cancel()
+
+    def is_current(self, sequence: int) -> bool:
+        return self._latest is not None and self._latest[0] == sequence
+
+    async def run(self):
+        while True:
+            await self._changed.wait()
+
+            # Debounce: restart the quiet period on every new revision
+            while True:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=self._debounce)
+                except asyncio.TimeoutError:
+                    break
+
+            sequence, revision, text, mode = self._latest
+            metrics.counter("paraphrase.live_generations").inc()
+
+            self._inflight = asyncio.create_task(self._generate(text, mode))
+            try:
+                await asyncio.wait({self._inflight})
+            except asyncio.CancelledError:
+                # The connection is closing
+                self._inflight.cancel()
+                raise
+
+            if self._inflight.cancelled():
+                metrics.counter("paraphrase.live_stale_dropped").inc()
+                continue
+
+            try:
+                result = self._inflight.result()
+                message = {"type": "result", "revision": revision, "paraphrased_text": result}
+            except HTTPException as e:
+                message = {"type": "error", "revision": revision, "detail": e.detail}
+            except Exception as e:
+                logger.exception(f"Live paraphrasing failed: {type(e).__name__}: {str(e)}")
+                message = {"type": "error", "revision": revision, "detail": "Paraphrasing failed"}
+
+            if not self.is_current(sequence):
+                metrics.counter("paraphrase.live_stale_dropped").inc()
+                continue
+
+            await self._send(message)
@@ -1,14 +1,14 @@
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, PreTrainedModel, PreTrainedTokenizer
-from typing import Optional, Tuple, List
-import threading
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, PreTrainedModel, PreTrainedTokenizer, StoppingCriteria, StoppingCriteriaList
+from typing import Dict, Optional, Tuple, List, Union
 import torch
 
-MODEL_NAME = "tuner007/pegasus_paraphrase"
-
-_tokenizer: Optional[PreTrainedTokenizer] = None
-_model: Optional[PreTrainedModel] = None
-_lock = threading.Lock()
-_device: Optional[torch.device] = None
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.paraphrase.cancellation import CancellationToken
+from app.paraphrase.model_registry import LoadedModel, ModelRegistry
+from app.paraphrase.spans import mask_inline, split_padding, split_spans, unmask_inline
+from app.paraphrase.dedup import Deduplicator, GenerationStats
+from app.paraphrase.quality import DECODING_TIERS
 
 # Limits not to trust hugging face
 MAX_MODEL_TOKENS = 60
@@ -18,6 +18,9 @@ DEFAULT_MAX_NEW_TOKENS = 128
 MAX_INPUT_CHARS = 3000
 MAX_CHUNKS = 6
 
+# Chunks decoded together in one generate call (padded to the longest)
+MAX_GENERATE_BATCH = 16
+
 # MODE CONFIGURATION (reduced beams to save memory)
 MODE_CONFIG = {
     "standard": {"prompt": "paraphrase:", "generate_args": {"num_beams": 2, "repetition_penalty": 1.2}},
@@ -36,24 +39,58 @@ MODE_CONFIG = {
 }
 
 
-def load_model() -> Tuple[PreTrainedTokenizer, PreTrainedModel, torch.device]:
-    global _tokenizer, _model, _device
+class CancelOnToken(StoppingCriteria):
+    # Checked by generate() after every decoding step
+    def __init__(self, token: CancellationToken):
+        self.token = token
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.token.cancelled, dtype=torch.bool, device=input_ids.device)
+
+
+def _load_pretrained(path: str) -> Tuple[PreTrainedTokenizer, PreTrainedModel, torch.device, int]:
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    model = AutoModelForSeq2SeqLM.from_pretrained(path)
+
+    model.to(device)
+    model.eval()
 
-    if _tokenizer is None or _model is None:
-        with _lock:
-            if _tokenizer is None or _model is None:
-                _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return tokenizer, model, device, model.get_memory_footprint()
 
-                _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-                _model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
 
-                _model.to(_device)
-                _model.eval()
+def _unload(loaded: LoadedModel):
+    # The registry dropped its references; hand cached blocks back to the GPU
+    if loaded.device.type == "cuda":
+        torch.cuda.empty_cache()
 
-    return _tokenizer, _model, _device
 
+registry = ModelRegistry(
+    models=settings.PARAPHRASE_MODELS,
+    routes=settings.MODEL_ROUTES,
+    memory_budget_bytes=settings.MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+    loader=_load_pretrained,
+    unloader=_unload,
+)
 
-def chunk_text_by_tokens(text: str, tokenizer) -> List[str]:
+
+def _route(plan: Optional[str], mode: str, tier: int = 0) -> str:
+    # The cheapest tier switches to the "degraded" route where one is configured
+    if DECODING_TIERS[tier].get("degraded_model"):
+        for key in (f"degraded:{mode}", "degraded"):
+            if key in settings.MODEL_ROUTES:
+                return settings.MODEL_ROUTES[key]
+    return registry.route(plan, mode)
+
+
+def load_model(name: Optional[str] = None) -> Tuple[PreTrainedTokenizer, PreTrainedModel, torch.device]:
+    # Preloads a model (the default route's unless named), e.g. at startup
+    with registry.use(name or registry.route(None, "standard")) as loaded:
+        return loaded.tokenizer, loaded.model, loaded.device
+
+
+def chunk_text_by_tokens(text: str, tokenizer, max_chunks: Optional[int] = MAX_CHUNKS) -> List[str]:
     inputs = tokenizer(text, return_tensors="pt", truncation=False)
     input_ids = inputs["input_ids"][0]
 
@@ -64,49 +101,303 @@ def chunk_text_by_tokens(text: str, tokenizer) -> List[str]:
         if chunk_text.strip():
             chunks.append(chunk_text)
 
-    return chunks[:MAX_CHUNKS]
+    return chunks if max_chunks is None else chunks[:max_chunks]
 
 
-def paraphrase_chunk(text: str, mode: str, tokenizer, model, device) -> str:
+class _Segmenter:
+    # Splits texts into pieces that are passed through as-is (code, tables,
+    # numbers, whitespace) and prose spans for the model, URLs masked. Each
+    # distinct span is kept once, so boilerplate repeated on every page of a
+    # document is generated a single time and fanned back out.
+
+    def __init__(self, tokenizer, stats: Optional[GenerationStats] = None, max_chunks: Optional[int] = MAX_CHUNKS):
+        self._tokenizer = tokenizer
+        self._stats = stats
+        # Per text; None means the whole text is generated
+        self._max_chunks = max_chunks
+        self._spans = Deduplicator()
+        # chunks of each unique span, and the inline spans its placeholders stand for
+        self._span_chunks: List[List[str]] = []
+        self._span_inline: List[List[str]] = []
+
+    def segment(self, text: str) -> List[Union[str, int]]:
+        # Returns strings and indexes of unique spans, in text order
+        pieces: List[Union[str, int]] = []
+        used = 0
+
+        for span, prose in split_spans(text):
+            if not prose:
+                pieces.append(span)
+                metrics.counter("paraphrase.passthrough_characters").inc(len(span))
+                continue
+            if self._max_chunks is not None and used >= self._max_chunks:
+                break
+
+            leading, body, trailing = split_padding(span)
+            before = len(self._spans.unique)
+            index = self._spans.add(body)
+            if index == before:
+                masked, inline = mask_inline(body)
+                self._span_chunks.append(chunk_text_by_tokens(masked, self._tokenizer, self._max_chunks))
+                self._span_inline.append(inline)
+            else:
+                metrics.counter("paraphrase.segments_deduplicated").inc()
+                if self._stats is not None:
+                    self._stats.segments_deduplicated += 1
+
+            metrics.counter("paraphrase.segments").inc()
+            if self._stats is not None:
+                self._stats.segments_total += 1
+
+            used += len(self._span_chunks[index])
+            pieces.extend([leading, index, trailing])
+
+        return pieces
+
+    def chunks(self) -> List[str]:
+        # Every chunk of every unique span, which is all the model gets to see
+        return [chunk for span_chunks in self._span_chunks for chunk in span_chunks]
+
+    def span_texts(self, chunk_outputs: List[str]) -> List[str]:
+        # Generated text of each unique span, from outputs aligned with chunks()
+        texts = []
+        position = 0
+        for span_chunks, inline in zip(self._span_chunks, self._span_inline):
+            generated = " ".join(chunk_outputs[position: position + len(span_chunks)])
+            texts.append(unmask_inline(generated, inline))
+            position += len(span_chunks)
+        return texts
+
+
+def _assemble(pieces: List[Union[str, int]], span_texts: List[str]) -> str:
+    # Puts generated spans back in place, keeping the layout
+    return "".join(piece if isinstance(piece, str) else span_texts[piece] for piece in pieces)
+
+
+def paraphrase_chunks(
+    texts: List[str],
+    mode: str,
+    tokenizer,
+    model,
+    device,
+    num_variants: int = 1,
+    cancel_token: Optional[CancellationToken] = None,
+    tier: int = 0,
+) -> List[str]:
+    # All chunks share the mode's prompt and generate args, so they can be
+    # decoded as one padded batch. With num_variants > 1 the result holds
+    # num_variants consecutive outputs per text, best first; the encoder still
+    # runs once per text and its output is shared by every returned sequence.
     if mode not in MODE_CONFIG:
         raise ValueError(f"Invalid mode '{mode}'")
 
     config = MODE_CONFIG[mode]
-    prompt = f"{config['prompt']} {text} </s>"
+    extra_args = {k: v for k, v in config["generate_args"].items() if k != "max_new_tokens"}
+    max_new_tokens = config["generate_args"].get("max_new_tokens", DEFAULT_MAX_NEW_TOKENS)
 
-    inputs = tokenizer(
-        prompt,
-        return_tensors="pt",
-        truncation=True,
-        max_length=MAX_MODEL_TOKENS,
-    )
+    # Cheaper decoding under load (see QualityController)
+    tier_config = DECODING_TIERS[tier]
+    if "num_beams" in tier_config and "num_beams" in extra_args:
+        extra_args["num_beams"] = min(extra_args["num_beams"], tier_config["num_beams"])
+    max_new_tokens = max(1, int(max_new_tokens * tier_config.get("max_new_tokens_scale", 1.0)))
 
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+    if num_variants > 1:
+        extra_args["num_return_sequences"] = num_variants
+        # Beam search can only return as many sequences as it keeps beams
+        if not extra_args.get("do_sample"):
+            extra_args["num_beams"] = max(extra_args.get("num_beams", 1), num_variants)
 
-    extra_args = {k: v for k, v in config["generate_args"].items() if k != "max_new_tokens"}
-    max_new_tokens = config["generate_args"].get("max_new_tokens", DEFAULT_MAX_NEW_TOKENS)
+    if cancel_token is not None:
+        extra_args["stopping_criteria"] = StoppingCriteriaList([CancelOnToken(cancel_token)])
+
+    # Texts of similar length share a generate call, so little of it is padding
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
 
-    with torch.no_grad():
-        outputs = model.generate(
-            input_ids=inputs["input_ids"],
-            attention_mask=inputs["attention_mask"],
-            max_new_tokens=max_new_tokens,
-            **extra_args,
+    results: List[Optional[str]] = [None] * (len(texts) * num_variants)
+    for start in range(0, len(order), MAX_GENERATE_BATCH):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+        batch = order[start: start + MAX_GENERATE_BATCH]
+        prompts = [f"{config['prompt']} {texts[i]} </s>" for i in batch]
+
+        inputs = tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=MAX_MODEL_TOKENS,
         )
 
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+        inputs = {k: v.to(device) for k, v in inputs.items()}
+
+        with torch.no_grad():
+            outputs = model.generate(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                max_new_tokens=max_new_tokens,
+                **extra_args,
+            )
+
+        # A stopped generate returns cut-off text; don't let it through
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+        decoded = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        # Back to the caller's order, each text's variants kept together
+        for position, i in enumerate(batch):
+            results[i * num_variants: (i + 1) * num_variants] = decoded[position * num_variants: (position + 1) * num_variants]
+
+    return results
+
+
+def paraphrase_chunk(text: str, mode: str, tokenizer, model, device) -> str:
+    return paraphrase_chunks([text], mode, tokenizer, model, device)[0]
+
 
+def _generate_items(
+    items: List[Tuple[str, str]],
+    loaded: LoadedModel,
+    cancel_token: Optional[CancellationToken],
+    stats: Optional[GenerationStats] = None,
+    max_chunks: Optional[int] = MAX_CHUNKS,
+    tier: int = 0,
+) -> List[str]:
+    # Prose of every item is generated together, grouped by mode; identical
+    # spans (within and across items) are generated once per mode
+    segmenters: Dict[str, _Segmenter] = {}
+    item_pieces = []
 
-def generate_paraphrase(text: str, mode: str = "standard") -> str:
+    for text, mode in items:
+        if mode not in segmenters:
+            segmenters[mode] = _Segmenter(loaded.tokenizer, stats, max_chunks)
+        segmenter = segmenters[mode]
+        item_pieces.append(segmenter.segment(text))
+
+    span_texts: Dict[str, List[str]] = {}
+    for mode, segmenter in segmenters.items():
+        outputs = paraphrase_chunks(
+            segmenter.chunks(),
+            mode,
+            loaded.tokenizer,
+            loaded.model,
+            loaded.device,
+            cancel_token=cancel_token,
+            tier=tier,
+        )
+        span_texts[mode] = segmenter.span_texts(outputs)
+
+    return [_assemble(pieces, span_texts[mode]) for pieces, (_, mode) in zip(item_pieces, items)]
+
+
+def generate_paraphrase_batch(
+    items: List[Tuple[str, str]],
+    plan: Optional[str] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    stats: Optional[GenerationStats] = None,
+    max_input_chars: Optional[int] = MAX_INPUT_CHARS,
+    max_chunks: Optional[int] = MAX_CHUNKS,
+    tier: int = 0,
+) -> List[Union[str, Exception]]:
+    # items are (text, mode), each generated by the model routed for the
+    # plan and its mode; a bad item gets its error back instead of failing the rest.
+    # Document mode lifts the per-text limits (None) and relies on plan limits.
+    results: List[Union[str, Exception, None]] = [None] * len(items)
+    # model name -> indexes of the items it generates
+    by_model: Dict[str, List[int]] = {}
+
+    for i, (text, mode) in enumerate(items):
+        if max_input_chars is not None and len(text) > max_input_chars:
+            results[i] = ValueError("Input too long")
+            continue
+        if mode not in MODE_CONFIG:
+            results[i] = ValueError(f"Invalid mode '{mode}'")
+            continue
+        by_model.setdefault(_route(plan, mode, tier), []).append(i)
+
+    for name, indexes in by_model.items():
+        with registry.use(name) as loaded:
+            outputs = _generate_items([items[i] for i in indexes], loaded, cancel_token, stats, max_chunks, tier)
+        for i, output in zip(indexes, outputs):
+            results[i] = output
+
+    return results
+
+
+def generate_paraphrase_variants(
+    text: str,
+    modes: List[str],
+    num_variants: int = 1,
+    plan: Optional[str] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    tier: int = 0,
+) -> List[Tuple[str, str]]:
+    # Returns (mode, text) candidates: up to num_variants per mode, best first.
+    # The text is chunked once per model; each mode decodes all of its chunks
+    # and variants in one batched pass (modes differ in prompt, so each needs
+    # its own encoder pass).
     if len(text) > MAX_INPUT_CHARS:
         raise ValueError("Input too long")
+    for mode in modes:
+        if mode not in MODE_CONFIG:
+            raise ValueError(f"Invalid mode '{mode}'")
+
+    # model name -> (segmenter, pieces), as chunking depends on the model's tokenizer
+    segments_by_model: Dict[str, Tuple[_Segmenter, List[Union[str, int]]]] = {}
+
+    candidates = []
+    for mode in modes:
+        name = _route(plan, mode, tier)
+        with registry.use(name) as loaded:
+            if name not in segments_by_model:
+                segmenter = _Segmenter(loaded.tokenizer)
+                segments_by_model[name] = segmenter, segmenter.segment(text)
+            segmenter, pieces = segments_by_model[name]
+            chunks = segmenter.chunks()
+
+            outputs = paraphrase_chunks(
+                chunks,
+                mode,
+                loaded.tokenizer,
+                loaded.model,
+                loaded.device,
+                num_variants=num_variants,
+                cancel_token=cancel_token,
+                tier=tier,
+            )
 
-    tokenizer, model, device = load_model()
+        seen = set()
+        for v in range(num_variants):
+            # Output v of every chunk, in chunk order
+            chunk_outputs = [outputs[j * num_variants + v] for j in range(len(chunks))]
+            variant = _assemble(pieces, segmenter.span_texts(chunk_outputs))
+            # Distinct beams can still decode to the same text
+            if variant not in seen:
+                seen.add(variant)
+                candidates.append((mode, variant))
 
-    chunks = chunk_text_by_tokens(text, tokenizer)
+    return candidates
 
-    results = []
-    for chunk in chunks:
-        results.append(paraphrase_chunk(chunk, mode, tokenizer, model, device))
 
-    return "\n\n".join(results)
\ No newline at end of file
+def generate_paraphrase(
+    text: str,
+    mode: str = "standard",
+    plan: Optional[str] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    stats: Optional[GenerationStats] = None,
+    max_input_chars: Optional[int] = MAX_INPUT_CHARS,
+    max_chunks: Optional[int] = MAX_CHUNKS,
+    tier: int = 0,
+) -> str:
+    result = generate_paraphrase_batch(
+        [(text, mode)],
+        plan=plan,
+        cancel_token=cancel_token,
+        stats=stats,
+        max_input_chars=max_input_chars,
+        max_chunks=max_chunks,
+        tier=tier,
+    )[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
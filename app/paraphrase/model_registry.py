@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModel:
+    __slots__ = ("name", "tokenizer", "model", "device", "memory_bytes", "load_seconds", "in_use")
+
+    def __init__(self, name: str, tokenizer, model, device, memory_bytes: int, load_seconds: float):
+        self.name = name
+        self.tokenizer = tokenizer
+        self.model = model
+        self.device = device
+        self.memory_bytes = memory_bytes
+        self.load_seconds = load_seconds
+        self.in_use = 0
+
+
+class ModelRegistry:
+    # Seq2seq models by name, loaded on first use and kept resident within a
+    # memory budget; the least recently used idle model is evicted first.
+    #
+    # `loader(path)` returns (tokenizer, model, device, memory_bytes) and
+    # `unloader(loaded)` releases what the loader allocated, so the registry
+    # itself never touches torch.
+
+    def __init__(
+        self,
+        models: Dict[str, str],
+        routes: Dict[str, str],
+        memory_budget_bytes: int,
+        loader: Callable[[str], Tuple[Any, Any, Any, int]],
+        unloader: Optional[Callable[[LoadedModel], None]] = None,
+    ):
+        if "default" not in routes:
+            raise ValueError("Model routes need a 'default' entry")
+        for key, name in routes.items():
+            if name not in models:
+                raise ValueError(f"Route '{key}' points at unknown model '{name}'")
+
+        self._models = models
+        self._routes = routes
+        self._budget = memory_budget_bytes
+        self._loader = loader
+        self._unloader = unloader
+
+        # name -> LoadedModel, least recently used first
+        self._loaded: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per model, so two threads never load the same weights twice
+        self._load_locks = {name: threading.Lock() for name in models}
+
+    def route(self, plan: Optional[str], mode: str) -> str:
+        # Most specific first: "plan:mode", then plan, then mode
+        for key in (f"{plan}:{mode}", plan, mode):
+            if key in self._routes:
+                return self._routes[key]
+        return self._routes["default"]
+
+    @contextmanager
+    def use(self, name: str):
+        # Pinned while in use, so it can't be evicted under a running generate
+        loaded = self._acquire(name)
+        try:
+            yield loaded
+        finally:
+            with self._lock:
+                loaded.in_use -= 1
+
+    def loaded(self) -> list:
+        with self._lock:
+            return list(self._loaded)
+
+    def _acquire(self, name: str) -> LoadedModel:
+        if name not in self._models:
+            raise ValueError(f"Unknown model '{name}'")
+
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded is not None:
+                self._loaded.move_to_end(name)
+                loaded.in_use += 1
+                return loaded
+
+        with self._load_locks[name]:
+            with self._lock:
+                loaded = self._loaded.get(name)
+                if loaded is not None:
+                    self._loaded.move_to_end(name)
+                    loaded.in_use += 1
+                    return loaded
+
+            started = time.perf_counter()
+            tokenizer, model, device, memory_bytes = self._loader(self._models[name])
+            loaded = LoadedModel(name, tokenizer, model, device, memory_bytes, time.perf_counter() - started)
+            logger.info(
+                "Loaded model %s in %.1fs (%.0f MB)",
+                name,
+                loaded.load_seconds,
+                memory_bytes / 1024 / 1024,
+            )
+            metrics.gauge(f"model.{name}.load_seconds").set(loaded.load_seconds)
+            metrics.gauge(f"model.{name}.memory_bytes").set(memory_bytes)
+
+            with self._lock:
+                loaded.in_use += 1
+                self._loaded[name] = loaded
+                evicted = self._evict_over_budget()
+
+        for victim in evicted:
+            if self._unloader:
+                self._unloader(victim)
+        return loaded
+
+    def _evict_over_budget(self) -> list:
+        # Called with self._lock held
+        evicted = []
+        resident = sum(m.memory_bytes for m in self._loaded.values())
+
+        for name in list(self._loaded):
+            if resident <= self._budget:
+                break
+            candidate = self._loaded[name]
+            if candidate.in_use:
+                continue
+            del self._loaded[name]
+            resident -= candidate.memory_bytes
+            evicted.append(candidate)
+            logger.info("Evicted model %s to stay within the memory budget", name)
+            metrics.counter("model.evictions").inc()
+            metrics.gauge(f"model.{name}.memory_bytes").set(0)
+
+        if resident > self._budget:
+            # Everything else is busy; run over budget rather than fail requests
+            logger.warning("Resident models use %d bytes, over the %d byte budget", resident, self._budget)
+        metrics.gauge("model.resident_bytes").set(resident)
+        return evicted
@@ -1,5 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import Literal
+from typing import List, Literal, Optional
+import uuid
+
+from app.paraphrase.limits import MAX_BATCH_ITEMS, MAX_VARIANTS
 
 AllowedModes = Literal[
     "standard",
@@ -17,8 +20,55 @@ AllowedModes = Literal[
 class ParaphraseRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=50000)
     mode: AllowedModes = "standard"
+    # Alternatives: the top num_variants outputs of each mode in `modes`
+    # (defaults to just `mode`)
+    num_variants: int = Field(1, ge=1, le=MAX_VARIANTS)
+    modes: Optional[List[AllowedModes]] = Field(None, min_length=1, max_length=MAX_VARIANTS)
+
+class ParaphraseVariant(BaseModel):
+    mode: str
+    paraphrased_text: str
 
 class ParaphraseResponse(BaseModel):
     paraphrased_text: str
     original_length: int
-    paraphrased_length: int
\ No newline at end of file
+    paraphrased_length: int
+    # Set for signed-in users; the entry shows up in /v1/history shortly after
+    history_id: Optional[uuid.UUID] = None
+    # Only when variants were requested; paraphrased_text is the first of them
+    variants: Optional[List[ParaphraseVariant]] = None
+
+
+class ParaphraseBatchRequest(BaseModel):
+    items: List[ParaphraseRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+class ParaphraseBatchItemResult(BaseModel):
+    # Position in the request; results are always in request order
+    index: int
+    original_length: int
+    paraphrased_text: Optional[str] = None
+    paraphrased_length: int = 0
+    history_id: Optional[uuid.UUID] = None
+    error: Optional[str] = None
+
+class ParaphraseBatchResponse(BaseModel):
+    results: List[ParaphraseBatchItemResult]
+    characters_charged: int
+
+
+class IncrementalParaphraseRequest(BaseModel):
+    text: str = Field(..., min_length=1, max_length=50000)
+    mode: AllowedModes = "standard"
+    # history_id of an earlier /incremental result for the same text
+    previous_id: Optional[uuid.UUID] = None
+
+class IncrementalParaphraseResponse(ParaphraseResponse):
+    segments_total: int
+    segments_reused: int
+
+
+class LiveParaphraseMessage(BaseModel):
+    # One revision of the text being typed; empty text is allowed
+    text: str = Field(..., max_length=50000)
+    mode: AllowedModes = "standard"
+    revision: Optional[int] = None
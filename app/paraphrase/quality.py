@@ -0,0 +1,100 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.core.metrics import metrics
+
+# Decoding tiers, best first. Each one overrides the mode's generate args:
+# beams capped at `num_beams`, the token budget scaled by
+# `max_new_tokens_scale`; `degraded_model` switches to the "degraded"
+# route of MODEL_ROUTES (e.g. {"degraded": "small"}) where one exists.
+DECODING_TIERS = [
+    {"name": "full"},
+    {"name": "greedy", "num_beams": 1},
+    {"name": "short", "num_beams": 1, "max_new_tokens_scale": 0.5},
+    {"name": "degraded", "num_beams": 1, "max_new_tokens_scale": 0.5, "degraded_model": True},
+]
+
+# Name of the tier the current request was generated with, for its response headers
+decoding_tier: ContextVar[str | None] = ContextVar("decoding_tier", default=None)
+
+# Samples needed at a tier before its latency counts, either way: one slow
+# call is not overload
+_MIN_SAMPLES = 5
+
+
+class QualityController:
+    # Chooses the decoding tier for each call from the latency of recent
+    # calls and the number in flight. One tier down when the p95 is over
+    # the SLO or more than `max_queue_depth` calls are in flight; one tier
+    # back up once both are under half of that. At most one step per
+    # `step_interval`, and the latency window restarts at every step, as
+    # samples from another tier say nothing about this one. Latencies are
+    # in whatever unit the caller observes (the gateway uses seconds per
+    # 1000 input characters), the SLO in the same one.
+
+    def __init__(self, slo: float, max_queue_depth: int, window: int, step_interval: float, clock=time.monotonic):
+        self._slo = slo
+        self._max_queue_depth = max_queue_depth
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._step_interval = step_interval
+        self._clock = clock
+        self._stepped_at = float("-inf")
+        self._in_flight = 0
+        self.tier = 0
+
+    @property
+    def tier_name(self) -> str:
+        return DECODING_TIERS[self.tier]["name"]
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @contextmanager
+    def track(self):
+        # Yields the tier to generate with
+        self._in_flight += 1
+        self._adjust()
+        try:
+            yield self.tier
+        finally:
+            self._in_flight -= 1
+
+    def observe(self, latency: float):
+        self._latencies.append(latency)
+        self._adjust()
+
+    def _p95(self) -> float:
+        if not self._latencies:
+            return 0.0
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+
+    def _adjust(self):
+        now = self._clock()
+        if now - self._stepped_at < self._step_interval:
+            return
+
+        # The queue is known right away; latency only once there are samples
+        sampled = len(self._latencies) >= _MIN_SAMPLES
+        p95 = self._p95()
+        if (sampled and p95 > self._slo) or self._in_flight > self._max_queue_depth:
+            if self.tier < len(DECODING_TIERS) - 1:
+                self._step(self.tier + 1, now)
+                metrics.counter("quality.step_down").inc()
+        elif (
+            self.tier > 0
+            and sampled
+            and p95 < self._slo / 2
+            and self._in_flight <= self._max_queue_depth // 2
+        ):
+            self._step(self.tier - 1, now)
+            metrics.counter("quality.step_up").inc()
+
+    def _step(self, tier: int, now: float):
+        self.tier = tier
+        self._stepped_at = now
+        self._latencies.clear()
+        metrics.gauge("quality.tier").set(tier)
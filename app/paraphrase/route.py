@@ -1,21 +1,67 @@
 # fixed the dict vs int problem in this file
 
+import asyncio
 import logging
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+import re
+import time
+from io import BytesIO
+from contextlib import nullcontext
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, status
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
-from app.paraphrase.ml_model import generate_paraphrase
-from app.paraphrase.paraphrase_schema import ParaphraseRequest, ParaphraseResponse
+from app.paraphrase.inference import inference
+from app.paraphrase.inference_protocol import InferenceUnavailable
+from app.paraphrase.quality import decoding_tier
+from app.paraphrase.paraphrase_schema import (
+    ParaphraseRequest,
+    ParaphraseResponse,
+    ParaphraseBatchRequest,
+    ParaphraseBatchItemResult,
+    ParaphraseBatchResponse,
+    ParaphraseVariant,
+    IncrementalParaphraseRequest,
+    IncrementalParaphraseResponse,
+    LiveParaphraseMessage,
+)
+from app.paraphrase.live import LiveSession
+from app.paraphrase.cancellation import GenerationCancelled
+from app.paraphrase.dedup import GenerationStats
+from app.core.config import settings
+from app.paraphrase.segmentation import join_sentences, reuse_outputs, split_sentences
 
 logger = logging.getLogger(__name__)
 from app.paraphrase.doc_paraphraser import extract_text_from_file
+from app.paraphrase.docx_document import DOCX_CONTENT_TYPE, DocxDocument
 from app.auth.guard import paid_user
-from app.billing.usage_guard import usage_guard
+from app.auth.dependencies import get_current_user, get_optional_user, load_principal
+from app.db.connection import RequestConnection, get_pool, get_request_db
+from app.billing.usage_guard import metered_usage
+from app.billing.usage_ledger import usage_ledger
+from app.history.service import history_recorder, load_segments
+from app.core.metrics import metrics
+from app.core.memory_watchdog import MemoryLimitExceeded, memory_watchdog
 from app.billing.plans import PLAN_LIMITS
 from app.paraphrase.limits import MAX_FILE_SIZE_BYTES, MAX_CHARACTERS
 
 router = APIRouter(prefix="/v1/paraphrase", tags=["Paraphrase"])
 
+# nginx's code for a client that went away before the response; never seen
+# by the client, but shows up in access logs
+CLIENT_CLOSED_REQUEST = 499
+
+# Decoding tier the paraphrases were generated at ("full" unless under load)
+QUALITY_TIER_HEADER = "X-Quality-Tier"
+
+
+def _report_quality_tier(headers):
+    # Only set when this request generated anything
+    tier = decoding_tier.get()
+    if tier is not None:
+        headers[QUALITY_TIER_HEADER] = tier
+
+
 allowed_content_types = {
     "application/pdf",
     "text/plain",
@@ -24,7 +70,12 @@ allowed_content_types = {
 }
 
 @router.post("", response_model=ParaphraseResponse)
-async def paraphrase_text(request: ParaphraseRequest):
+async def paraphrase_text(
+    request: ParaphraseRequest,
+    http_request: Request,
+    response: Response,
+    user=Depends(get_optional_user),
+):
     text = request.text.strip()
 
     if not text:
@@ -39,12 +90,53 @@ async def paraphrase_text(request: ParaphraseRequest):
             detail=f"Text exceeds maximum allowed length of {MAX_CHARACTERS} characters",
         )
 
+    modes = list(dict.fromkeys(request.modes or [request.mode]))
+    wants_variants = request.num_variants > 1 or len(modes) > 1
+    # Variants cost a pass per mode and aren't metered without an account
+    if wants_variants and not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sign in to request variants or several modes",
+        )
+    variants = None
+    mode = modes[0]
+    # Anonymous requests get the free tier's model
+    plan = user.plan if user else "free"
+
+    # Each extra mode is a separate rewrite; extra variants of a mode come
+    # from the same pass and are not charged
+    characters = len(text) * len(modes)
+
     try:
-        paraphrased_text = await run_in_threadpool(
-            generate_paraphrase,
-            text,
-            request.mode
+        with metered_usage(user, characters, request_characters=len(text)) if user else nullcontext():
+            started = time.perf_counter()
+            if wants_variants:
+                candidates = await inference.generate_paraphrase_variants(
+                    text,
+                    modes,
+                    request.num_variants,
+                    plan=plan,
+                    request=http_request,
+                )
+                variants = [ParaphraseVariant(mode=m, paraphrased_text=t) for m, t in candidates]
+                paraphrased_text = candidates[0][1]
+            else:
+                paraphrased_text = await inference.generate_paraphrase(
+                    text,
+                    mode,
+                    plan=plan,
+                    request=http_request,
+                )
+            inference_ms = int((time.perf_counter() - started) * 1000)
+    except GenerationCancelled:
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    except InferenceUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Paraphrasing is temporarily unavailable",
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(
             f"Paraphrasing failed for text length {len(text)}: "
@@ -55,15 +147,279 @@ async def paraphrase_text(request: ParaphraseRequest):
             detail="Paraphrasing failed",
         )
 
+    history_id = None
+    if user:
+        history_id = history_recorder.record(user.id, mode, text, paraphrased_text, inference_ms)
+
+    _report_quality_tier(response.headers)
     return ParaphraseResponse(
         paraphrased_text=paraphrased_text,
         original_length=len(text),
         paraphrased_length=len(paraphrased_text),
+        history_id=history_id,
+        variants=variants,
+    )
+
+
+@router.post("/batch", response_model=ParaphraseBatchResponse)
+async def paraphrase_batch(
+    request: ParaphraseBatchRequest,
+    http_request: Request,
+    response: Response,
+    user=Depends(get_current_user),
+):
+    results = []
+    # (index in request, text, mode) of items that go to the model
+    pending = []
+
+    for i, item in enumerate(request.items):
+        text = item.text.strip()
+        result = ParaphraseBatchItemResult(index=i, original_length=len(text))
+        results.append(result)
+
+        if not text:
+            result.error = "Text cannot be empty"
+        elif item.num_variants > 1 or item.modes:
+            result.error = "Variants are not supported in batch requests"
+        elif len(text) > MAX_CHARACTERS:
+            result.error = f"Text exceeds maximum allowed length of {MAX_CHARACTERS} characters"
+        else:
+            pending.append((i, text, item.mode))
+
+    if not pending:
+        return ParaphraseBatchResponse(results=results, characters_charged=0)
+
+    # The whole batch is reserved up front; only items that succeed are charged
+    total = sum(len(text) for _, text, _ in pending)
+    largest = max(len(text) for _, text, _ in pending)
+    charged = 0
+
+    try:
+        with metered_usage(user, total, request_characters=largest) as reservation:
+            started = time.perf_counter()
+            outputs = await inference.generate_paraphrase_batch(
+                [(text, mode) for _, text, mode in pending],
+                plan=user.plan,
+                request=http_request,
+            )
+            # Items share one generate pass, so each is recorded with the batch time
+            inference_ms = int((time.perf_counter() - started) * 1000)
+
+            for (i, text, mode), output in zip(pending, outputs):
+                result = results[i]
+                if isinstance(output, Exception):
+                    result.error = str(output)
+                    continue
+
+                result.paraphrased_text = output
+                result.paraphrased_length = len(output)
+                result.history_id = history_recorder.record(user.id, mode, text, output, inference_ms)
+                charged += len(text)
+
+            usage_ledger.commit(reservation, characters=charged)
+    except GenerationCancelled:
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    except InferenceUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Paraphrasing is temporarily unavailable",
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(
+            f"Batch paraphrasing failed for {len(pending)} items: "
+            f"{type(e).__name__}: {str(e)}"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Paraphrasing failed",
+        )
+
+    _report_quality_tier(response.headers)
+    return ParaphraseBatchResponse(results=results, characters_charged=charged)
+
+
+@router.post("/incremental", response_model=IncrementalParaphraseResponse)
+async def paraphrase_incremental(
+    request: IncrementalParaphraseRequest,
+    http_request: Request,
+    response: Response,
+    user=Depends(get_current_user),
+    db: RequestConnection = Depends(get_request_db),
+):
+    # Paraphrases sentence by sentence. Given the previous result, only
+    # sentences that changed since then are generated (and charged).
+    text = request.text.strip()
+
+    if not text:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Text cannot be empty",
+        )
+
+    if len(text) > MAX_CHARACTERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Text exceeds maximum allowed length of {MAX_CHARACTERS} characters",
+        )
+
+    sentences, separators = split_sentences(text)
+    outputs = [None] * len(sentences)
+
+    if request.previous_id:
+        # Primary, not replica: the previous entry was written moments ago
+        async with db.acquire() as conn:
+            previous = await load_segments(conn, user.id, request.previous_id)
+
+        # Buffered in another worker and not flushed yet, or dropped (history
+        # is best effort): everything is generated, as without previous_id
+        if previous is None:
+            metrics.counter("paraphrase.incremental_previous_missing").inc()
+            previous = None, None, None
+
+        previous_mode, previous_text, previous_outputs = previous
+        if previous_mode == request.mode and previous_outputs:
+            previous_sentences, _ = split_sentences(previous_text)
+            outputs = reuse_outputs(sentences, previous_sentences, previous_outputs)
+
+    await db.release()
+
+    # Repeated new sentences are generated once
+    to_generate = list(dict.fromkeys(s for s, output in zip(sentences, outputs) if output is None))
+    reused = len(sentences) - sum(1 for output in outputs if output is None)
+    metrics.counter("paraphrase.incremental_segments_reused").inc(reused)
+    metrics.counter("paraphrase.incremental_segments_generated").inc(len(to_generate))
+
+    inference_ms = 0
+    if to_generate:
+        try:
+            with metered_usage(user, sum(len(s) for s in to_generate), request_characters=len(text)):
+                started = time.perf_counter()
+                generated = await inference.generate_paraphrase_batch(
+                    [(s, request.mode) for s in to_generate],
+                    plan=user.plan,
+                    request=http_request,
+                )
+                inference_ms = int((time.perf_counter() - started) * 1000)
+
+                for output in generated:
+                    if isinstance(output, Exception):
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=str(output),
+                        )
+        except GenerationCancelled:
+            raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+        except InferenceUnavailable:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Paraphrasing is temporarily unavailable",
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.exception(
+                f"Incremental paraphrasing failed for {len(to_generate)} sentences: "
+                f"{type(e).__name__}: {str(e)}"
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Paraphrasing failed",
+            )
+
+        fresh = dict(zip(to_generate, generated))
+        outputs = [fresh[s] if output is None else output for s, output in zip(sentences, outputs)]
+
+    paraphrased_text = join_sentences(outputs, separators)
+    history_id = history_recorder.record(
+        user.id,
+        request.mode,
+        text,
+        paraphrased_text,
+        inference_ms,
+        segment_outputs=outputs,
+    )
+
+    _report_quality_tier(response.headers)
+    return IncrementalParaphraseResponse(
+        paraphrased_text=paraphrased_text,
+        original_length=len(text),
+        paraphrased_length=len(paraphrased_text),
+        history_id=history_id,
+        segments_total=len(sentences),
+        segments_reused=reused,
     )
 
 
+@router.websocket("/live")
+async def paraphrase_live(websocket: WebSocket, pool=Depends(get_pool)):
+    # Protocol: first message {"type": "auth", "token": ...}, then any number
+    # of {"text", "mode", "revision"}; the server answers with "result" or
+    # "error" messages for the latest revision only.
+    await websocket.accept()
+
+    try:
+        message = await asyncio.wait_for(
+            websocket.receive_json(),
+            timeout=settings.LIVE_AUTH_TIMEOUT_SECONDS,
+        )
+        token = message.get("token") if message.get("type") == "auth" else None
+        if not token:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required")
+        user = await get_current_user(websocket, token=token, pool=pool)
+    # KeyError: receive_json() on a binary frame
+    except (asyncio.TimeoutError, HTTPException, ValueError, AttributeError, KeyError):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    except WebSocketDisconnect:
+        return
+
+    replica_pool = getattr(websocket.app.state, "db_replica_pool", None)
+
+    async def generate(text: str, mode: str) -> str:
+        text = text.strip()
+        if not text:
+            return ""
+        if len(text) > MAX_CHARACTERS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Text exceeds maximum allowed length of {MAX_CHARACTERS} characters",
+            )
+        # The handshake's user goes stale as the ledger flushes (and plans
+        # change); the cache is invalidated on both, so re-resolve each time
+        current = await load_principal(pool, replica_pool, user.id)
+        if current is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        with metered_usage(current, len(text)):
+            return await inference.generate_paraphrase(text, mode, plan=current.plan)
+
+    session = LiveSession(generate, websocket.send_json, debounce=settings.LIVE_DEBOUNCE_SECONDS)
+    session_task = asyncio.create_task(session.run())
+    await websocket.send_json({"type": "ready"})
+
+    try:
+        while True:
+            try:
+                message = LiveParaphraseMessage.model_validate(await websocket.receive_json())
+            except (ValidationError, ValueError):
+                await websocket.send_json({"type": "error", "revision": None, "detail": "Invalid message"})
+                continue
+            except KeyError:
+                # A binary frame; the protocol is JSON text only
+                await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+                break
+            session.submit(message.revision, message.text, message.mode)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session_task.cancel()
+
+
 @router.post("/document")
 async def paraphrase_doc(
+    http_request: Request,
+    response: Response,
     file: UploadFile = File(...),
     user=Depends(paid_user),
 ):
@@ -82,6 +438,12 @@ async def paraphrase_doc(
             detail="File is too large",
         )
 
+    # Parsing expands a document many times over; refuse it before it starts
+    try:
+        memory_watchdog.admit(len(file_bytes) * settings.MEMORY_BYTES_PER_UPLOAD_BYTE)
+    except MemoryLimitExceeded as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
     # Check content type
     if file.content_type not in allowed_content_types:
         raise HTTPException(
@@ -125,16 +487,32 @@ async def paraphrase_doc(
             detail="The provided document exceeds your plan limits",
         )
 
-    # Usage guard AFTER knowing how many characters we need
-    # This is where the dict vs int problem is fixed
-    await usage_guard(len(extracted_text))(user)
+    # Reserve usage AFTER knowing how many characters we need; it is only
+    # charged if paraphrasing succeeds
+    # Repeated headers, footers and boilerplate are generated once
+    stats = GenerationStats()
 
-    # Paraphrase text
     try:
-        paraphrased_text = await run_in_threadpool(
-            generate_paraphrase,
-            extracted_text,
+        with metered_usage(user, len(extracted_text)):
+            started = time.perf_counter()
+            paraphrased_text = await inference.generate_paraphrase(
+                extracted_text,
+                plan=user.plan,
+                stats=stats,
+                max_input_chars=None,
+                max_chunks=None,
+                request=http_request,
+            )
+            inference_ms = int((time.perf_counter() - started) * 1000)
+    except GenerationCancelled:
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    except InferenceUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Paraphrasing is temporarily unavailable",
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Document paraphrasing failed: {type(e).__name__}: {str(e)}")
         raise HTTPException(
@@ -142,8 +520,129 @@ async def paraphrase_doc(
             detail=f"Paraphrasing failed: {type(e).__name__}: {str(e)}",
         )
 
+    history_id = history_recorder.record(user.id, "standard", extracted_text, paraphrased_text, inference_ms)
+
+    _report_quality_tier(response.headers)
     return {
         "original_length": len(extracted_text),
         "paraphrased_length": len(paraphrased_text),
         "paraphrased_text": paraphrased_text,
+        "history_id": history_id,
+        "segments_total": stats.segments_total,
+        "segments_deduplicated": stats.segments_deduplicated,
     }
+
+
+@router.post("/document/docx")
+async def paraphrase_docx(
+    http_request: Request,
+    file: UploadFile = File(...),
+    user=Depends(paid_user),
+):
+    file_bytes = await file.read()
+    if not file_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="An empty file was uploaded",
+        )
+
+    if len(file_bytes) > MAX_FILE_SIZE_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail="File is too large",
+        )
+
+    try:
+        memory_watchdog.admit(len(file_bytes) * settings.MEMORY_BYTES_PER_UPLOAD_BYTE)
+    except MemoryLimitExceeded as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    if file.content_type != DOCX_CONTENT_TYPE:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Only .docx files are supported",
+        )
+
+    try:
+        document = await run_in_threadpool(DocxDocument, file_bytes)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Failed to read the document",
+        )
+
+    texts = document.texts
+    if not texts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The uploaded document has no readable text",
+        )
+
+    plan_config = PLAN_LIMITS.get(getattr(user, "plan", "free"))
+    if not plan_config:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Unknown subscription plan",
+        )
+
+    total_characters = sum(len(text) for text in texts)
+    if total_characters > plan_config["max_characters"]:
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail="The provided document exceeds your plan limits",
+        )
+
+    # Every formatted piece of text is one item of a single batch, so the
+    # paragraphs are generated together and the layout is rebuilt around them
+    stats = GenerationStats()
+
+    try:
+        with metered_usage(user, total_characters):
+            started = time.perf_counter()
+            outputs = await inference.generate_paraphrase_batch(
+                [(text, "standard") for text in texts],
+                plan=user.plan,
+                stats=stats,
+                max_input_chars=None,
+                max_chunks=None,
+                request=http_request,
+            )
+            inference_ms = int((time.perf_counter() - started) * 1000)
+
+            failed = next((output for output in outputs if isinstance(output, Exception)), None)
+            if failed is not None:
+                raise failed
+
+            document.apply(outputs)
+            paraphrased_bytes = await run_in_threadpool(document.to_bytes)
+    except GenerationCancelled:
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    except InferenceUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Paraphrasing is temporarily unavailable",
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"DOCX paraphrasing failed: {type(e).__name__}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Paraphrasing failed: {type(e).__name__}: {str(e)}",
+        )
+
+    history_id = history_recorder.record(user.id, "standard", "\n".join(texts), "\n".join(outputs), inference_ms)
+
+    stem = (file.filename or "document").rsplit(".", 1)[0]
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "_", stem).strip("._") or "document"
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{stem}-paraphrased.docx"',
+        "X-Segments-Total": str(stats.segments_total),
+        "X-Segments-Deduplicated": str(stats.segments_deduplicated),
+    }
+    if history_id is not None:
+        headers["X-History-Id"] = str(history_id)
+    _report_quality_tier(headers)
+
+    return StreamingResponse(BytesIO(paraphrased_bytes), media_type=DOCX_CONTENT_TYPE, headers=headers)
@@ -0,0 +1,45 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Sentence ends (., ! or ? followed by whitespace) and line breaks. The
+# separators are kept so reassembly restores the original layout.
+_BOUNDARY = re.compile(r"((?<=[.!?])\s+|\s*\n\s*)")
+
+
+def split_sentences(text: str) -> Tuple[List[str], List[str]]:
+    # Returns (sentences, separators); separators[i] follows sentences[i]
+    parts = _BOUNDARY.split(text)
+    sentences = parts[0::2]
+    separators = parts[1::2] + [""]
+    return sentences, separators
+
+
+def join_sentences(sentences: List[str], separators: List[str]) -> str:
+    return "".join(s + sep for s, sep in zip(sentences, separators))
+
+
+def normalize(sentence: str) -> str:
+    # Whitespace-only edits don't count as changes
+    return " ".join(sentence.split())
+
+
+def reuse_outputs(
+    sentences: List[str],
+    previous_sentences: List[str],
+    previous_outputs: List[str],
+) -> List[Optional[str]]:
+    # For each sentence, the output already generated for the same sentence in
+    # the previous revision, or None if it has to be generated. Matching by
+    # content rather than position keeps inserted, deleted and moved
+    # sentences from invalidating everything after them.
+    known: Dict[str, str] = {}
+    if len(previous_sentences) == len(previous_outputs):
+        for source, output in zip(previous_sentences, previous_outputs):
+            known.setdefault(normalize(source), output)
+
+    reused = []
+    for sentence in sentences:
+        key = normalize(sentence)
+        # Blank pieces are passed through as they are
+        reused.append(sentence if not key else known.get(key))
+    return reused
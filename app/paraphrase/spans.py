@@ -0,0 +1,118 @@
+import re
+from typing import List, Tuple
+
+# Inline spans that must survive verbatim: URLs, DOIs and emails. They stay
+# in their sentence, masked by a placeholder while it is generated.
+_INLINE = re.compile(r"(?:https?://|www\.)\S+[\w/]|\bdoi:\S+[\w/]|[\w.+-]+@[\w-]+\.[\w.-]*\w")
+PLACEHOLDER = "[[{}]]"
+# Models sometimes space out the brackets
+_PLACEHOLDER = re.compile(r"\[\[\s*(\d+)\s*\]\]")
+
+# Whole lines that aren't prose
+_REFERENCE = re.compile(r"^(\[\d+\]|\d+\.\s+[A-Z][\w'-]+,\s+[A-Z]\.)")
+_TABLE_ROW = re.compile(r"\t|\|.*\||\S {3,}\S.* {3,}\S")
+# Code needs a keyword *and* code punctuation after it: "let me know" and
+# "class imbalance" are English, "let x =" and "class A(B):" are not
+_CODE = re.compile(
+    r"^def\s+\w+\s*\("
+    r"|^class\s+\w+\s*(\([^)]*\))?\s*:\s*$|^class\s+\w+(\s+extends\s+[\w.]+)?\s*\{"
+    r"|^(const|let|var)\s+\w+\s*="
+    r"|^function\b\s*\w*\s*\("
+    r"|^return\b.*[()\[\]=+*/]"
+    r"|^import\s+[\w.]+(\s+as\s+\w+)?\s*;?\s*$|^from\s+[\w.]+\s+import\s+[\w*]|^import\s.*\sfrom\s+['\"]"
+    r"|^#include\s*[<\"]"
+    r"|[{}]\s*$|[(=].*;\s*$|=>|==|!=|::"
+)
+
+# Below this share of letters (ignoring spaces) a line is numbers,
+# equations or page furniture rather than text
+MIN_LETTER_RATIO = 0.6
+MIN_LETTERS = 3
+
+# Short lines without closing punctuation are headings: kept on their own
+# line instead of being joined into the paragraph below
+HEADING_MAX_WORDS = 5
+
+
+def is_prose_line(line: str) -> bool:
+    # Judged on the text around any inline spans
+    stripped = _INLINE.sub("", line).strip()
+    if not stripped:
+        return False
+    if _REFERENCE.match(stripped) or _TABLE_ROW.search(stripped) or _CODE.search(stripped):
+        return False
+
+    compact = stripped.replace(" ", "")
+    letters = sum(c.isalpha() for c in compact)
+    return letters >= MIN_LETTERS and letters / len(compact) >= MIN_LETTER_RATIO
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    return len(stripped.split()) <= HEADING_MAX_WORDS and stripped[-1] not in ".!?:;,"
+
+
+def split_spans(text: str) -> List[Tuple[str, bool]]:
+    # Splits text into (span, is_prose) pieces that concatenate back to the
+    # original. Consecutive prose lines form one span (a wrapped paragraph);
+    # everything else is passed through untouched.
+    spans: List[Tuple[str, bool]] = []
+
+    def add(piece: str, prose: bool, join: bool = True):
+        if not piece:
+            return
+        # Whitespace between two pieces of the same kind joins them
+        if spans and join and (spans[-1][1] == prose or not piece.strip()):
+            spans[-1] = (spans[-1][0] + piece, spans[-1][1])
+        else:
+            spans.append((piece, prose))
+
+    after_heading = False
+    for line in text.splitlines(keepends=True):
+        if not is_prose_line(line):
+            add(line, False)
+            after_heading = False
+            continue
+
+        heading = _is_heading(line)
+        add(line, True, not (heading or after_heading))
+        after_heading = heading
+
+    return spans
+
+
+def mask_inline(text: str) -> Tuple[str, List[str]]:
+    # (text with placeholders, the spans they stand for)
+    originals: List[str] = []
+
+    def mask(match):
+        originals.append(match.group())
+        return PLACEHOLDER.format(len(originals) - 1)
+
+    return _INLINE.sub(mask, text), originals
+
+
+def unmask_inline(text: str, originals: List[str]) -> str:
+    restored = set()
+
+    def unmask(match):
+        index = int(match.group(1))
+        if index >= len(originals):
+            return match.group()
+        restored.add(index)
+        return originals[index]
+
+    text = _PLACEHOLDER.sub(unmask, text)
+    # A placeholder the model dropped still has its span appended, not lost
+    missing = [span for index, span in enumerate(originals) if index not in restored]
+    return " ".join([text, *missing]) if missing else text
+
+
+def split_padding(span: str) -> Tuple[str, str, str]:
+    # (leading whitespace, text, trailing whitespace), so the generated text
+    # can be put back into the original layout
+    stripped = span.strip()
+    if not stripped:
+        return span, "", ""
+    start = span.index(stripped)
+    return span[:start], stripped, span[start + len(stripped):]
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
-from fastapi import APIRouter, HTTPException
-from app.payments.service import create_checkout_session
-from app.db.connection import get_pool
+from fastapi import APIRouter, HTTPException, Depends
+from app.payments.service import create_checkout_session, create_customer
+from app.db.connection import RequestConnection, get_request_db
 import stripe
 
 
@@ -16,9 +16,9 @@ class CreatePaymentRequest(BaseModel):
     email: str | None = None
 
 @router.post("/create")
-def create_payment(req: CreatePaymentRequest):
+async def create_payment(req: CreatePaymentRequest):
     try:
-        intent = create_payment_intent(
+        intent = await create_payment_intent(
             amount=req.amount,
             currency=req.currency,
             order_id=req.order_id,
@@ -34,10 +34,9 @@ def create_payment(req: CreatePaymentRequest):
 FRONTEND_URL = "https://paraphraze.tech"
 
 @router.post("/stripe/checkout-session")
-async def checkout_session_router(user_id: str, plan: str):
-    pool = await get_pool()
-
-    async with pool.acquire() as conn:
+async def checkout_session_router(user_id: str, plan: str, db: RequestConnection = Depends(get_request_db)):
+    # The connection is only held for the queries, never across a Stripe call
+    async with db.acquire() as conn:
         user = await conn.fetchrow(
             """
             SELECT id, email, stripe_customer_id
@@ -47,32 +46,33 @@ async def checkout_session_router(user_id: str, plan: str):
             user_id,
         )
 
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+    await db.release()
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
-        stripe_customer_id = user["stripe_customer_id"]
+    stripe_customer_id = user["stripe_customer_id"]
 
+    try:
         # Create Stripe customer if missing
         if not stripe_customer_id:
-            customer = stripe.Customer.create(
-                email=user["email"],
-                metadata={"user_id": user_id},
-            )
-
+            customer = await create_customer(email=user["email"], user_id=user_id)
             stripe_customer_id = customer.id
 
-            await conn.execute(
-                """
-                UPDATE users
-                SET stripe_customer_id = $1
-                WHERE id = $2
-                """,
-                stripe_customer_id,
-                user_id,
-            )
-
-    try:
-        session = create_checkout_session(
+            async with db.acquire() as conn:
+                await conn.execute(
+                    """
+                    UPDATE users
+                    SET stripe_customer_id = $1
+                    WHERE id = $2
+                      AND stripe_customer_id IS NULL
+                    """,
+                    stripe_customer_id,
+                    user_id,
+                )
+            await db.release()
+
+        session = await create_checkout_session(
             customer_id=stripe_customer_id,
             user_id=user_id,
             plan=plan,
@@ -1,46 +1,71 @@
+import uuid
+
 import stripe
 from app.config import STRIPE_SECRET_KEY
+from app.payments.stripe_client import payments_client
 
 stripe.api_key = STRIPE_SECRET_KEY
 
 FRONTEND_URL = f"http://localhost:8000"
 
-def create_payment_intent(*, amount: int, currency: str, order_id: str, customer_email: str | None = None):
-    intent = stripe.PaymentIntent.create(
-        amount=amount,
-        currency=currency,
-        automatic_payment_methods={"enabled": True},
-        metadata={
+async def create_payment_intent(*, amount: int, currency: str, order_id: str, customer_email: str | None = None):
+    params = {
+        "amount": amount,
+        "currency": currency,
+        "automatic_payment_methods": {"enabled": True},
+        "metadata": {
             "order_id": order_id
         },
-        receipt_email=customer_email,
+    }
+    if customer_email:
+        params["receipt_email"] = customer_email
+
+    # One intent per order, however many times the client retries
+    intent = await payments_client.create_payment_intent(
+        params=params,
+        idempotency_key=f"payment-intent-{order_id}",
     )
 
     return intent
+
+
+async def create_customer(*, email: str, user_id: str):
+    customer = await payments_client.create_customer(
+        params={
+            "email": email,
+            "metadata": {"user_id": user_id},
+        },
+        idempotency_key=f"customer-{user_id}",
+    )
+    return customer
+
 STRIPE_PRICE_PLAN = {
     "basic": "",
     "pro": ""
 }
 
-def create_checkout_session(*, amount: int, user_id: str, plan: str, customer_id: str | None = None):
+async def create_checkout_session(*, user_id: str, plan: str, customer_id: str | None = None, frontend_url: str = FRONTEND_URL):
     if plan not in STRIPE_PRICE_PLAN:
         raise ValueError(f"Invalid plan {plan}")
 
-    session = stripe.checkout.Session.create(
-        mode="Subscription",
-        customer_id=customer_id,
-        payment_method_types=["card"],
-        line_items=[
-            {
-                "price": STRIPE_PRICE_PLAN[plan],
-                "quantity": 1,
-            }
-        ],
-        metadata={
-            "user_id": user_id,
-            "plan": plan,
+    session = await payments_client.create_checkout_session(
+        params={
+            "mode": "subscription",
+            "customer": customer_id,
+            "payment_method_types": ["card"],
+            "line_items": [
+                {
+                    "price": STRIPE_PRICE_PLAN[plan],
+                    "quantity": 1,
+                }
+            ],
+            "metadata": {
+                "user_id": user_id,
+                "plan": plan,
+            },
+            "success_url": f"{frontend_url}/billing/success?session_id={{CHECKOUT_SESSION_ID}}",
+            "cancel_url": f"{frontend_url}/billing/cancel",
         },
-        success_url=f"{FRONTEND_URL}/billing/success?session_id={{CHECKOUT_SESSION_ID}}",
-        cancel_url=f"{FRONTEND_URL}/billing/cancel"
+        idempotency_key=f"checkout-{user_id}-{uuid.uuid4()}",
     )
-    return session
\ No newline at end of file
+    return session
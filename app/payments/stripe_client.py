@@ -0,0 +1,60 @@
+import stripe
+
+from app.config import STRIPE_SECRET_KEY, STRIPE_API_BASE, STRIPE_MAX_NETWORK_RETRIES
+
+
+class PaymentsClient:
+    # Async Stripe calls over one shared, pooled httpx client, so checkout
+    # never blocks the event loop. The SDK retries network errors and
+    # 409/429/5xx responses; every call carries an idempotency key, so a
+    # retry never creates a second customer, session or intent.
+
+    def __init__(self, api_key: str, api_base: str | None = None, max_network_retries: int = 2, timeout: float = 20):
+        self._api_key = api_key
+        self._api_base = api_base
+        self._max_network_retries = max_network_retries
+        self._timeout = timeout
+        self._http_client: stripe.HTTPXClient | None = None
+        self._client: stripe.StripeClient | None = None
+
+    def _get_client(self) -> stripe.StripeClient:
+        if self._client is None:
+            self._http_client = stripe.HTTPXClient(timeout=self._timeout)
+            self._client = stripe.StripeClient(
+                self._api_key,
+                http_client=self._http_client,
+                max_network_retries=self._max_network_retries,
+                base_addresses={"api": self._api_base} if self._api_base else None,
+            )
+        return self._client
+
+    async def close(self):
+        if self._http_client is not None:
+            await self._http_client.close_async()
+            self._http_client = None
+            self._client = None
+
+    async def create_customer(self, *, params: dict, idempotency_key: str):
+        return await self._get_client().v1.customers.create_async(
+            params=params,
+            options={"idempotency_key": idempotency_key},
+        )
+
+    async def create_checkout_session(self, *, params: dict, idempotency_key: str):
+        return await self._get_client().v1.checkout.sessions.create_async(
+            params=params,
+            options={"idempotency_key": idempotency_key},
+        )
+
+    async def create_payment_intent(self, *, params: dict, idempotency_key: str):
+        return await self._get_client().v1.payment_intents.create_async(
+            params=params,
+            options={"idempotency_key": idempotency_key},
+        )
+
+
+payments_client = PaymentsClient(
+    api_key=STRIPE_SECRET_KEY,
+    api_base=STRIPE_API_BASE,
+    max_network_retries=STRIPE_MAX_NETWORK_RETRIES,
+)
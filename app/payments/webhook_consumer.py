@@ -0,0 +1,179 @@
+import asyncio
+import logging
+
+from app.auth.principal_cache import principal_cache
+
+logger = logging.getLogger(__name__)
+
+ENQUEUE_EVENT = """
+INSERT INTO stripe_events (event_id, type, payload)
+VALUES ($1, $2, $3::jsonb)
+ON CONFLICT (event_id) DO NOTHING
+RETURNING event_id
+"""
+
+FETCH_PENDING_EVENTS = """
+SELECT event_id, type, payload
+FROM stripe_events
+WHERE processed_at IS NULL
+  AND attempts < $2
+ORDER BY received_at
+LIMIT $1
+FOR UPDATE SKIP LOCKED
+"""
+
+MARK_EVENT_PROCESSED = """
+UPDATE stripe_events
+SET processed_at = now(),
+    outcome = $2
+WHERE event_id = $1
+"""
+
+MARK_EVENT_FAILED = """
+UPDATE stripe_events
+SET attempts = attempts + 1,
+    last_error = $2
+WHERE event_id = $1
+"""
+
+UPGRADE_USER = """
+UPDATE users
+SET plan = $1,
+    subscription_status = 'active'
+WHERE id = $2
+"""
+
+DOWNGRADE_USER = """
+UPDATE users
+SET plan = 'free',
+    subscription_status = 'inactive'
+WHERE id = $1
+"""
+
+USER_ID_BY_STRIPE_CUSTOMER = """
+SELECT id
+FROM users
+WHERE stripe_customer_id = $1
+"""
+
+UPGRADE_EVENTS = {
+    "checkout.session.completed",
+    "payment_intent.succeeded",
+}
+
+DOWNGRADE_EVENTS = {
+    "payment_intent.payment_failed",
+    "invoice.payment_failed",
+    "customer.subscription.deleted",
+}
+
+
+async def apply_event(conn, event: dict) -> tuple[str, str | None]:
+    # Returns the outcome and the id of the user whose plan changed, if any
+    event_type = event["type"]
+    data = event["data"]["object"]
+
+    # Successful checkout or payment
+    if event_type in UPGRADE_EVENTS:
+        metadata = data.get("metadata") or {}
+        user_id = metadata.get("user_id")
+        plan = metadata.get("plan")
+
+        if not user_id or not plan:
+            return "missing_metadata", None
+
+        await conn.execute(UPGRADE_USER, plan, user_id)
+        return "upgraded", user_id
+
+    # Downgrade User's Accounts on Failure
+    if event_type in DOWNGRADE_EVENTS:
+        metadata = data.get("metadata") or {}
+        user_id = metadata.get("user_id")
+
+        # Fallback via Stripe customer ID
+        if not user_id and data.get("customer"):
+            user_id = await conn.fetchval(USER_ID_BY_STRIPE_CUSTOMER, data["customer"])
+
+        if not user_id:
+            return "user_not_found", None
+
+        await conn.execute(DOWNGRADE_USER, user_id)
+        return "downgraded", str(user_id)
+
+    logger.info("Stripe event %s (%s) needs no action", event_type, event.get("id"))
+    return "ignored", None
+
+
+class WebhookConsumer:
+    # Processes queued Stripe events in batches, off the request path.
+    # FOR UPDATE SKIP LOCKED lets every API worker run a consumer safely.
+
+    def __init__(self, batch_size: int = 50, poll_interval: float = 5.0, max_attempts: int = 5):
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._max_attempts = max_attempts
+        self._pool = None
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    def start(self, pool):
+        self._pool = pool
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                # Keep going while there is a backlog, e.g. a month-start burst
+                while await self.process_batch() == self._batch_size:
+                    pass
+            except Exception:
+                logger.exception("Stripe event processing failed")
+
+    async def process_batch(self) -> int:
+        changed_users = set()
+
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(FETCH_PENDING_EVENTS, self._batch_size, self._max_attempts)
+
+                processed = []
+                for row in rows:
+                    try:
+                        # Savepoint, so one bad event doesn't roll back the batch
+                        async with conn.transaction():
+                            outcome, user_id = await apply_event(conn, row["payload"])
+                    except Exception as e:
+                        logger.exception("Stripe event %s failed", row["event_id"])
+                        await conn.execute(MARK_EVENT_FAILED, row["event_id"], str(e))
+                        continue
+
+                    processed.append((row["event_id"], outcome))
+                    if user_id:
+                        changed_users.add(user_id)
+
+                if processed:
+                    await conn.executemany(MARK_EVENT_PROCESSED, processed)
+
+        principal_cache.invalidate_many(changed_users)
+        return len(rows)
+
+
+webhook_consumer = WebhookConsumer()
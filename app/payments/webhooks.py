@@ -1,10 +1,11 @@
 import json
-from fastapi import APIRouter, Request, Header, HTTPException
+
+from fastapi import APIRouter, Request, Header, HTTPException, Depends
 import stripe
-from fastapi.responses import JSONResponse
 
 from app.config import STRIPE_SECRET_KEY, STRIPE_WEBHOOK_SECRET
-from app.db.connection import get_pool
+from app.db.connection import RequestConnection, get_request_db
+from app.payments.webhook_consumer import ENQUEUE_EVENT, webhook_consumer
 
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
 
@@ -12,186 +13,41 @@ stripe.api_key = STRIPE_SECRET_KEY
 webhook_secret = STRIPE_WEBHOOK_SECRET
 
 
+# Verifies and queues the event, then acks right away. Plan changes are applied
+# by webhook_consumer; Stripe retries of an already queued event are dropped.
 @router.post("/stripe/webhook")
-async def stripe_webhook(request: Request, stripe_signature: str = Header(None)):
+async def stripe_webhook(
+    request: Request,
+    stripe_signature: str | None = Header(default=None, alias="Stripe-Signature"),
+    db: RequestConnection = Depends(get_request_db),
+):
     payload = await request.body()
 
+    if not stripe_signature:
+        raise HTTPException(status_code=400, detail="Missing Stripe-Signature")
+
     try:
-        event = stripe.Webhook.construct_event(payload=payload, sig_header=stripe_signature, secret=STRIPE_WEBHOOK_SECRET)
+        event = stripe.Webhook.construct_event(
+            payload=payload,
+            sig_header=stripe_signature,
+            secret=webhook_secret,
+        )
     except stripe.error.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature")
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid payload")
 
-    pool = await get_pool()
-    event_type = event["type"]
-    data = event["data"]["object"]
-
-    # Successful Payments
-    if event_type == "payment_intent.succeeded":
-        metadata = data.get("metadata", {})
-        user_id = metadata.get("user_id")
-        plan = metadata.get("plan")
-
-        if not user_id or not plan:
-            return {"status": "missing_metadata"}
-
-        async with pool.acquire() as conn:
-            await conn.execute(
-                """
-                UPDATE users
-                SET plan = $1,
-                    subscription_status = 'active'
-                WHERE id = $2
-                """,
-                plan,
-                user_id,
-            )
-
-        return {"status": "upgraded"}
-
-    # Downgrade User's Accounts on Failure
-    if event_type in {
-        "payment_intent.payment_failed",
-        "invoice.payment_failed",
-        "customer.subscription.deleted",
-    }:
-        user_id = None
-
-        metadata = data.get("metadata")
-        if metadata:
-            user_id = metadata.get("user_id")
-
-        async with pool.acquire() as conn:
-            # Fallback via Stripe customer ID
-            if not user_id and data.get("customer"):
-                row = await conn.fetchrow(
-                    """
-                    SELECT id
-                    FROM users
-                    WHERE stripe_customer_id = $1
-                    """,
-                    data["customer"],
-                )
-                if row:
-                    user_id = row["id"]
-
-            if not user_id:
-                return {"status": "user_not_found"}
-
-            await conn.execute(
-                """
-                UPDATE users
-                SET plan = 'free',
-                    subscription_status = 'inactive'
-                WHERE id = $1
-                """,
-                user_id,
-            )
-
-        return {"status": "downgraded"}
-
-    return {"status": "ignored"}
-
-# Add a Subscription Web-Hook
-@router.post("/stripe/webhook")
-async def webhook_received(request: Request, stripe_signature: str | None = Header(default=None, alias="Stripe-Signature")):
-    payload = await request.body()
-
-    try:
-        if webhook_secret:
-            if not stripe_signature:
-                raise HTTPException(status_code=400, detail="Missing Stripe-Signature")
-
-            event = stripe.Webhook.construct_event(
-                payload=payload,
-                sig_header=stripe_signature,
-                secret=webhook_secret,
-            )
-        else:
-            event = json.loads(payload.decode("utf-8"))
-    except stripe.error.SignatureVerificationError:
-        raise HTTPException(status_code=400, detail="Invalid Signature")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-    pool = await get_pool()
-    event_type = event["type"]
-    data = event["data"]["object"]
-
-    print(f"event {event_type}")
-
-    # Successful checkout
-    if event_type == "checkout.session.completed":
-        metadata = data.get("metadata") or {}
-        user_id = metadata.get("user_id")
-        plan = metadata.get("plan")
-
-        if not user_id or not plan:
-            return {"status": "missing_metadata"}
-
-        async with pool.acquire() as conn:
-            await conn.execute(
-                """
-                UPDATE users
-                SET plan = $1,
-                    subscription_status = 'active'
-                WHERE id = $2
-                """,
-                plan,
-                user_id,
-            )
-
-        return {"status": "upgraded"}
-
-    # For failed payments: subscription removal
-    if event_type in {
-        "payment_intent.payment_failed",
-        "invoice.payment_failed",
-        "customer.subscription.deleted",
-    }:
-        metadata = data.get("metadata") or {}
-        user_id = metadata.get("user_id")
-
-        async with pool.acquire() as conn:
-            # Fallback via Stripe customer ID
-            if not user_id and data.get("customer"):
-                row = await conn.fetchrow(
-                    """
-                    SELECT id
-                    FROM users
-                    WHERE stripe_customer_id = $1
-                    """,
-                    data["customer"],
-                )
-                if row:
-                    user_id = row["id"]
-
-            if not user_id:
-                return {"status": "user_not_found"}
-
-            await conn.execute(
-                """
-                UPDATE users
-                SET plan = 'free',
-                    subscription_status = 'inactive'
-                WHERE id = $1
-                """,
-                user_id,
-            )
-
-        return {"status": "downgraded"}
+    async with db.acquire() as conn:
+        queued = await conn.fetchval(
+            ENQUEUE_EVENT,
+            event["id"],
+            event["type"],
+            # Encoded by the connection's jsonb codec
+            json.loads(payload),
+        )
 
-    # Informational events
-    if event_type == "customer.subscription.trial_will_end":
-        print("Subscription trial will end")
-    elif event_type == "customer.subscription.created":
-        print(f"Subscription Created: {event['id']}")
-    elif event_type == "customer.subscription.updated":
-        print(f"Subscription Updated: {event['id']}")
-    elif event_type == "customer.subscription.deleted":
-        print(f"Subscription Deleted: {event['id']}")
-    elif event_type == "entitlements.active_entitlement_summary.updated":
-        print(f"Active entitlement summary updated {event['id']}")
+    if not queued:
+        return {"status": "duplicate"}
 
-    return JSONResponse({"status": "success"})
\ No newline at end of file
+    webhook_consumer.notify()
+    return {"status": "queued"}
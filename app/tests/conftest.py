@@ -0,0 +1,23 @@
+import pytest
+
+from app.billing.usage_ledger import UsageLedger
+from app.tests.fakes import FakePool
+
+
+@pytest.fixture
+def make_pool():
+    return FakePool
+
+
+@pytest.fixture
+def fake_pool():
+    return FakePool()
+
+
+@pytest.fixture
+def usage_ledger(monkeypatch, tmp_path):
+    # A fresh, unstarted ledger in place of the app's: nothing is flushed
+    ledger = UsageLedger(journal_dir=str(tmp_path), flush_interval=60, flush_batch_size=1000)
+    monkeypatch.setattr("app.billing.usage_guard.usage_ledger", ledger)
+    monkeypatch.setattr("app.paraphrase.route.usage_ledger", ledger)
+    return ledger
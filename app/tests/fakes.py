@@ -0,0 +1,50 @@
+import asyncpg
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class FakeConnection:
+    # Tests subclass this with the queries they need; the fake tables live
+    # on the pool (None for a standalone connection)
+    def __init__(self, pool=None):
+        self.pool = pool
+
+    def transaction(self):
+        return FakeTransaction()
+
+
+class FakeAcquire:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        self.pool.acquired += 1
+        return self.pool.connection_class(self.pool)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.pool.released += 1
+
+
+class FakePool(asyncpg.Pool):
+    # Lends a new `connection_class(pool)` per acquire and counts them. An
+    # asyncpg.Pool, so the query helpers borrow from it as from a real one.
+    # Keyword arguments become attributes, e.g. the rows a test reads.
+
+    def __init__(self, connection_class=FakeConnection, **state):
+        self.connection_class = connection_class
+        self.acquired = 0
+        self.released = 0
+        self.__dict__.update(state)
+
+    @property
+    def in_use(self) -> int:
+        return self.acquired - self.released
+
+    def acquire(self):
+        return FakeAcquire(self)
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.auth import dependencies
+from app.auth.principal_cache import principal_cache
+
+
+class FakeUserDAO:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def get_by_id(self, user_id):
+        await asyncio.sleep(0.01)
+        return self.conn.pool.users.get(user_id)
+
+
+@pytest.fixture(autouse=True)
+def fake_dao(monkeypatch):
+    monkeypatch.setattr(dependencies, "UserDAO", FakeUserDAO)
+    principal_cache.clear()
+    yield
+    principal_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_shared_load_uses_a_connection_of_its_own(make_pool):
+    pool = make_pool(users={"u1": "alice"})
+
+    users = await asyncio.gather(*(dependencies.load_principal(pool, None, "u1") for _ in range(3)))
+
+    assert users == ["alice"] * 3
+    # One load for all three callers, on a connection it gave back
+    assert pool.acquired == 1
+    assert pool.released == 1
+
+
+@pytest.mark.asyncio
+async def test_user_missing_from_replica_is_read_from_primary(make_pool):
+    primary = make_pool(users={"u1": "alice"})
+    replica = make_pool(users={})
+
+    assert await dependencies.load_principal(primary, replica, "u1") == "alice"
+    assert replica.acquired == 1
+    assert primary.acquired == 1
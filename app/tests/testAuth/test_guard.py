@@ -0,0 +1,31 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth.dependencies import get_current_user
+from app.main import app
+from app.users.model import UserDB
+
+
+@pytest.fixture
+def client_as():
+    def make(role):
+        user = UserDB(id=uuid.uuid4(), username="dev", email="dev@example.com", role=role)
+        app.dependency_overrides[get_current_user] = lambda: user
+        return TestClient(app)
+
+    yield make
+    app.dependency_overrides.clear()
+
+
+def test_metrics_need_a_signed_in_user():
+    assert TestClient(app).get("/metrics").status_code == 401
+
+
+def test_metrics_are_for_admins_only(client_as):
+    assert client_as("user").get("/metrics").status_code == 403
+
+    response = client_as("admin").get("/metrics")
+    assert response.status_code == 200
+    assert isinstance(response.json(), dict)
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+
+from app.auth.principal_cache import PrincipalCache
+
+
+class CountingLoader:
+    def __init__(self, value="user", delay=0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    cache = PrincipalCache(ttl=60, max_size=10)
+    loader = CountingLoader(delay=0.01)
+
+    results = await asyncio.gather(*(cache.get("u1", loader) for _ in range(20)))
+
+    assert results == ["user"] * 20
+    assert loader.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_reloaded():
+    cache = PrincipalCache(ttl=0, max_size=10)
+    loader = CountingLoader()
+
+    await cache.get("u1", loader)
+    await cache.get("u1", loader)
+
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_entry_and_inflight_load():
+    cache = PrincipalCache(ttl=60, max_size=10)
+    stale = CountingLoader(value="free", delay=0.01)
+
+    pending = asyncio.ensure_future(cache.get("u1", stale))
+    await asyncio.sleep(0)
+    cache.invalidate("u1")
+    assert await pending == "free"
+
+    fresh = CountingLoader(value="pro")
+    assert await cache.get("u1", fresh) == "pro"
+    assert fresh.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entry_is_evicted():
+    cache = PrincipalCache(ttl=60, max_size=2)
+    loader = CountingLoader()
+
+    await cache.get("u1", loader)
+    await cache.get("u2", loader)
+    await cache.get("u1", loader)
+    await cache.get("u3", loader)
+    assert loader.calls == 3
+
+    await cache.get("u1", loader)
+    assert loader.calls == 3
+    await cache.get("u2", loader)
+    assert loader.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_missing_users_are_not_cached():
+    cache = PrincipalCache(ttl=60, max_size=10)
+    loader = CountingLoader(value=None)
+
+    assert await cache.get("u1", loader) is None
+    assert await cache.get("u1", loader) is None
+    assert loader.calls == 2
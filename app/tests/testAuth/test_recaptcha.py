@@ -0,0 +1,74 @@
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.auth.recaptcha import RecaptchaVerifier
+from app.core.circuit_breaker import CircuitBreaker
+
+
+class StandInSiteverify:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self.body = body or {"success": True, "action": "login", "score": 0.9}
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        return httpx.Response(self.status_code, json=self.body)
+
+
+def make_verifier(server, failure_threshold=5):
+    return RecaptchaVerifier(
+        verify_url="http://recaptcha.test/siteverify",
+        timeout=1.0,
+        cache_ttl=60,
+        cache_size=100,
+        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=60),
+        transport=httpx.MockTransport(server),
+    )
+
+
+@pytest.mark.asyncio
+async def test_verdict_serves_one_retry_of_the_same_request():
+    server = StandInSiteverify()
+    verifier = make_verifier(server)
+
+    first = await verifier.verify("secret", "token-1", "10.0.0.1", "login")
+    retry = await verifier.verify("secret", "token-1", "10.0.0.1", "login")
+    await verifier.close()
+
+    assert first == retry
+    assert server.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_a_used_token_is_not_accepted_from_the_cache_again():
+    server = StandInSiteverify()
+    verifier = make_verifier(server)
+
+    await verifier.verify("secret", "token-1", "10.0.0.1", "login")
+    await verifier.verify("secret", "token-1", "10.0.0.1", "login")
+    # The retry consumed the kept verdict; from elsewhere there never was one
+    server.body = {"success": False, "error-codes": ["timeout-or-duplicate"]}
+    again = await verifier.verify("secret", "token-1", "10.0.0.1", "login")
+    elsewhere = await verifier.verify("secret", "token-1", "10.0.0.2", "register")
+    await verifier.close()
+
+    assert not again["success"]
+    assert not elsewhere["success"]
+    assert server.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_during_outage():
+    server = StandInSiteverify(status_code=500)
+    verifier = make_verifier(server, failure_threshold=2)
+
+    for token in ("a", "b", "c", "d"):
+        with pytest.raises(HTTPException) as exc:
+            await verifier.verify("secret", token)
+        assert exc.value.status_code == 503
+    await verifier.close()
+
+    # Once open, the provider is no longer called
+    assert server.calls == 2
@@ -0,0 +1,125 @@
+import os
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.auth import dependencies
+from app.auth.principal_cache import principal_cache
+from app.billing.usage_ledger import UsageLedger
+from app.tests.fakes import FakeConnection
+
+
+class LedgerConn(FakeConnection):
+    async def fetchval(self, query, batch_id):
+        if batch_id in self.pool.batches:
+            return None
+        self.pool.batches.add(batch_id)
+        return batch_id
+
+    async def executemany(self, query, args):
+        self.pool.executemany_calls += 1
+        for user_id, delta in args:
+            self.pool.usage[user_id] = self.pool.usage.get(user_id, 0) + delta
+
+
+@pytest.fixture
+def ledger_pool(make_pool):
+    # A users table (usage) and usage_flush_batches (batches)
+    def make():
+        return make_pool(LedgerConn, batches=set(), usage={}, executemany_calls=0)
+    return make
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return UsageLedger(journal_dir=str(tmp_path), flush_interval=60, flush_batch_size=100)
+
+
+def test_reserve_rejects_over_limit(ledger):
+    first = ledger.reserve("u1", 600, used=300, limit=1000)
+    assert first is not None
+
+    # The in-flight reservation counts against the limit
+    assert ledger.reserve("u1", 200, used=300, limit=1000) is None
+    assert ledger.outstanding("u1") == 600
+
+
+def test_release_returns_characters(ledger):
+    reservation = ledger.reserve("u1", 500, used=0, limit=1000)
+    ledger.release(reservation)
+    ledger.commit(reservation)  # settled reservations are ignored
+
+    assert ledger.outstanding("u1") == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_aggregates_per_user(ledger, ledger_pool):
+    pool = ledger_pool()
+    await ledger.start(pool)
+
+    for _ in range(3):
+        ledger.commit(ledger.reserve("u1", 100, used=0, limit=1000))
+    ledger.commit(ledger.reserve("u2", 50, used=0, limit=1000))
+
+    await ledger.stop()
+
+    assert pool.usage == {"u1": 300, "u2": 50}
+    assert pool.executemany_calls == 1
+    assert ledger.outstanding("u1") == 0
+
+
+@pytest.mark.asyncio
+async def test_recover_replays_journal_once(tmp_path, ledger_pool):
+    pool = ledger_pool()
+    batch_id = str(uuid.uuid4())
+    dead_pid = os.getpid()  # a previous incarnation of this worker
+
+    (tmp_path / f"{dead_pid}.log").write_text("u1 100\nu1 50\nu2 7\nu3 1")
+    (tmp_path / f"{dead_pid}.{batch_id}.seg").write_text("u2 10\n")
+    pool.batches.add(batch_id)  # this segment was applied before the crash
+
+    ledger = UsageLedger(journal_dir=str(tmp_path), flush_interval=60, flush_batch_size=100)
+    await ledger.start(pool)
+    await ledger.stop()
+
+    assert pool.usage == {"u1": 150, "u2": 7, "u3": 1}
+    assert not list(tmp_path.glob("*.seg"))
+
+
+def test_partial_commit_charges_only_what_succeeded(ledger):
+    reservation = ledger.reserve("u1", 500, used=0, limit=1000)
+
+    ledger.commit(reservation, characters=200)
+
+    assert ledger.outstanding("u1") == 200
+    # The unused 300 are available again
+    assert ledger.reserve("u1", 800, used=0, limit=1000) is not None
+
+
+class FakeUserDAO:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def get_by_id(self, user_id):
+        return SimpleNamespace(id=user_id, monthly_characters_used=self.conn.pool.usage.get(user_id, 0))
+
+
+@pytest.mark.asyncio
+async def test_flushed_usage_still_counts_while_the_replica_lags(ledger, ledger_pool, monkeypatch):
+    monkeypatch.setattr(dependencies, "UserDAO", FakeUserDAO)
+    principal_cache.clear()
+    primary, replica = ledger_pool(), ledger_pool()
+    await ledger.start(primary)
+
+    user = await dependencies.load_principal(primary, replica, "u1")
+    ledger.commit(ledger.reserve("u1", 900, used=user.monthly_characters_used, limit=1000))
+    await ledger.flush()
+
+    # The replica still says 0; the reload must see the 900 just flushed
+    user = await dependencies.load_principal(primary, replica, "u1")
+    assert user.monthly_characters_used == 900
+    assert ledger.reserve("u1", 200, used=user.monthly_characters_used, limit=1000) is None
+
+    await ledger.stop()
+    principal_cache.clear()
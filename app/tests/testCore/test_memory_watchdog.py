@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app.core.memory_watchdog import MemoryLimitExceeded, MemoryWatchdog, current_rss_bytes
+
+MB = 1024 * 1024
+
+
+class FakeSampler:
+    def __init__(self, rss: int):
+        self.rss = rss
+
+    def __call__(self) -> int:
+        return self.rss
+
+
+def make_watchdog(sampler, soft=100 * MB, hard=200 * MB):
+    return MemoryWatchdog(soft, hard, interval=0.01, drain_timeout=1.0, sample=sampler)
+
+
+def test_reads_this_process_rss():
+    assert current_rss_bytes() > 0
+
+
+def test_hard_limit_refuses_work_that_would_not_fit():
+    watchdog = make_watchdog(FakeSampler(150 * MB))
+    watchdog.sample()
+
+    watchdog.admit(10 * MB)
+    with pytest.raises(MemoryLimitExceeded):
+        watchdog.admit(60 * MB)
+
+
+@pytest.mark.asyncio
+async def test_soft_limit_drains_then_recycles():
+    sampler = FakeSampler(50 * MB)
+    recycled = asyncio.Event()
+    watchdog = make_watchdog(sampler)
+    watchdog.start(on_recycle=recycled.set)
+
+    with watchdog.track():
+        sampler.rss = 120 * MB
+        await asyncio.sleep(0.05)
+
+        # Over the soft limit: new work is refused, in-flight work finishes
+        assert watchdog.recycling
+        with pytest.raises(MemoryLimitExceeded):
+            watchdog.admit()
+        assert not recycled.is_set()
+
+    await asyncio.wait_for(recycled.wait(), 1.0)
+    await watchdog.stop()
+
+
+@pytest.mark.asyncio
+async def test_zero_limits_only_sample():
+    recycled = asyncio.Event()
+    watchdog = make_watchdog(FakeSampler(10_000 * MB), soft=0, hard=0)
+    watchdog.start(on_recycle=recycled.set)
+    await asyncio.sleep(0.05)
+
+    watchdog.admit(10_000 * MB)
+    assert watchdog.rss == 10_000 * MB
+    assert not recycled.is_set()
+    await watchdog.stop()
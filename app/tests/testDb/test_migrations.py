@@ -0,0 +1,72 @@
+import asyncpg
+import pytest
+
+from app.db import connection
+from app.db.migrations import MIGRATION_LOCK_ID, MIGRATIONS
+from app.tests.fakes import FakeConnection
+
+
+class MigrationConn(FakeConnection):
+    # A standalone connection, as asyncpg.connect() returns
+    def __init__(self, applied=None):
+        super().__init__()
+        self.applied = applied
+        self.executed = []
+        self.closed = False
+
+    async def fetch(self, query):
+        if self.applied is None:
+            raise asyncpg.exceptions.UndefinedTableError("schema_migrations")
+        return [{"version": version} for version in self.applied]
+
+    async def close(self):
+        self.closed = True
+
+    async def execute(self, query, *args):
+        self.executed.append((query, *args))
+        if "CREATE TABLE IF NOT EXISTS schema_migrations" in query and self.applied is None:
+            self.applied = []
+        if query.startswith("INSERT INTO schema_migrations"):
+            self.applied.append(args[0])
+
+
+async def migrate_at_startup(monkeypatch, conn) -> list[int]:
+    # What init_db_pool runs, on its own connection, before the pool exists
+    async def connect(**kwargs):
+        return conn
+
+    monkeypatch.setattr(connection.asyncpg, "connect", connect)
+    await connection._migrate("postgresql://test")
+    assert conn.closed
+    return [args[0] for query, *args in conn.executed if query.startswith("INSERT INTO schema_migrations")]
+
+
+@pytest.mark.asyncio
+async def test_fresh_database_applies_every_migration_under_the_lock(monkeypatch):
+    conn = MigrationConn()
+
+    applied = await migrate_at_startup(monkeypatch, conn)
+
+    assert applied == [version for version, _, _ in MIGRATIONS]
+    assert ("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID) in conn.executed
+    assert conn.executed[-1] == ("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+
+
+@pytest.mark.asyncio
+async def test_up_to_date_database_only_reads_versions(monkeypatch):
+    conn = MigrationConn(applied=[version for version, _, _ in MIGRATIONS])
+
+    applied = await migrate_at_startup(monkeypatch, conn)
+
+    # The fast path: no lock and no DDL
+    assert applied == []
+    assert conn.executed == []
+
+
+@pytest.mark.asyncio
+async def test_only_pending_migrations_are_applied(monkeypatch):
+    conn = MigrationConn(applied=[version for version, _, _ in MIGRATIONS[:-1]])
+
+    applied = await migrate_at_startup(monkeypatch, conn)
+
+    assert applied == [MIGRATIONS[-1][0]]
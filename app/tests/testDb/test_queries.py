@@ -0,0 +1,20 @@
+import asyncpg
+import pytest
+
+from app.db.queries import QUERIES, prepare_queries
+
+
+class OldSchemaConn:
+    # A database one migration behind: every statement fails to prepare
+    async def prepare(self, sql):
+        raise asyncpg.exceptions.UndefinedColumnError("column \"segment_outputs\" does not exist")
+
+
+@pytest.mark.asyncio
+async def test_statements_the_schema_cant_run_yet_are_left_unprepared(monkeypatch):
+    monkeypatch.setitem(QUERIES, "test_old_schema", "SELECT segment_outputs FROM paraphrase_history")
+    conn = OldSchemaConn()
+
+    await prepare_queries(conn)
+
+    assert conn.prepared_statements == {}
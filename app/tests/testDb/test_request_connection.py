@@ -0,0 +1,31 @@
+import pytest
+
+from app.db.connection import RequestConnection
+
+
+@pytest.mark.asyncio
+async def test_connection_is_shared_until_released(fake_pool):
+    db = RequestConnection(fake_pool)
+
+    async with db.acquire() as first:
+        pass
+    async with db.acquire() as second:
+        pass
+
+    assert first is second
+    assert fake_pool.acquired == 1
+    assert fake_pool.released == 0
+
+    await db.release()
+    await db.release()
+    assert fake_pool.released == 1
+
+
+@pytest.mark.asyncio
+async def test_no_connection_is_taken_unless_used(fake_pool):
+    db = RequestConnection(fake_pool)
+
+    await db.release()
+
+    assert fake_pool.acquired == 0
+    assert fake_pool.released == 0
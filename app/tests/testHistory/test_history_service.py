@@ -0,0 +1,151 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+import asyncpg
+import pytest
+
+from app.history.service import (
+    HistoryRecorder,
+    decode_cursor,
+    encode_cursor,
+    fetch_history_page,
+    search_history,
+)
+from app.tests.fakes import FakeConnection
+
+
+class HistoryConn(FakeConnection):
+    async def copy_records_to_table(self, table, records, columns):
+        if self.pool.fail:
+            raise ConnectionError("db down")
+        if any(record[1] == "deleted-user" for record in records):
+            raise asyncpg.ForeignKeyViolationError("user_id not in users")
+        self.pool.copies.append((table, list(records), columns))
+
+
+@pytest.fixture
+def recorder(make_pool):
+    recorder = HistoryRecorder(flush_interval=60, flush_batch_size=2, max_buffered=3)
+    recorder._pool = make_pool(HistoryConn, copies=[], fail=False)
+    return recorder
+
+
+@pytest.mark.asyncio
+async def test_flush_copies_buffer_in_batches(recorder):
+    ids = [recorder.record("u1", "standard", f"in {i}", f"out {i}", 10) for i in range(3)]
+
+    await recorder.flush()
+
+    copies = recorder._pool.copies
+    assert [len(records) for _, records, _ in copies] == [2, 1]
+    assert [record[0] for _, records, _ in copies for record in records] == ids
+    assert copies[0][0] == "paraphrase_history"
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_entries_for_retry(recorder):
+    recorder.record("u1", "standard", "in", "out", 10)
+    recorder._pool.fail = True
+
+    with pytest.raises(ConnectionError):
+        await recorder.flush()
+
+    recorder._pool.fail = False
+    await recorder.flush()
+    assert len(recorder._pool.copies) == 1
+
+
+@pytest.mark.asyncio
+async def test_rejected_rows_are_dropped_and_the_rest_written(make_pool):
+    recorder = HistoryRecorder(flush_interval=60, flush_batch_size=10, max_buffered=10)
+    recorder._pool = make_pool(HistoryConn, copies=[], fail=False)
+    ids = [recorder.record("u1", "standard", "in", "out", 10) for _ in range(2)]
+    recorder.record("deleted-user", "standard", "in", "out", 10)
+    ids.append(recorder.record("u1", "standard", "in", "out", 10))
+
+    await recorder.flush()
+    await recorder.flush()
+
+    written = [record[0] for _, records, _ in recorder._pool.copies for record in records]
+    assert sorted(written) == sorted(ids)
+    assert recorder.find_buffered(ids[0], "u1") is None
+
+
+def test_nul_bytes_are_stripped(recorder):
+    entry_id = recorder.record("u1", "standard", "a\x00b", "c\x00", 10, segment_outputs=["\x00d"])
+
+    entry = recorder.find_buffered(entry_id, "u1")
+    assert (entry["input_text"], entry["output_text"], entry["segment_outputs"]) == ("ab", "c", ["d"])
+    assert entry["input_length"] == 2
+
+
+def test_full_buffer_drops_new_entries(recorder):
+    for i in range(3):
+        assert recorder.record("u1", "standard", "in", "out", 10) is not None
+
+    assert recorder.record("u1", "standard", "in", "out", 10) is None
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 1, 12, 30, tzinfo=timezone.utc)
+    entry_id = uuid.uuid4()
+
+    assert decode_cursor(encode_cursor(created_at, entry_id)) == (created_at, entry_id)
+
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+class PageConn:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def fetch(self, query, *args):
+        self.calls.append(args)
+        limit = args[-1]
+        return self.rows[:limit]
+
+
+@pytest.mark.asyncio
+async def test_fetch_history_page_returns_cursor_only_when_more_rows():
+    now = datetime.now(timezone.utc)
+    rows = [{"id": uuid.uuid4(), "created_at": now - timedelta(seconds=i)} for i in range(3)]
+
+    page, next_cursor = await fetch_history_page(PageConn(rows), "u1", limit=2)
+    assert page == rows[:2]
+    assert decode_cursor(next_cursor) == (rows[1]["created_at"], rows[1]["id"])
+
+    conn = PageConn(rows[2:])
+    page, next_cursor = await fetch_history_page(conn, "u1", limit=2, cursor=next_cursor)
+    assert page == rows[2:]
+    assert next_cursor is None
+    assert conn.calls[0][1:3] == (rows[1]["created_at"], rows[1]["id"])
+
+
+@pytest.mark.asyncio
+async def test_search_history_pages_by_rank_then_recency():
+    now = datetime.now(timezone.utc)
+    rows = [
+        {"id": uuid.uuid4(), "created_at": now, "rank": 0.5},
+        {"id": uuid.uuid4(), "created_at": now, "rank": 0.1},
+        {"id": uuid.uuid4(), "created_at": now, "rank": 0.1},
+    ]
+
+    conn = PageConn(rows)
+    page, next_cursor = await search_history(conn, "u1", "refund policy", limit=2)
+    assert page == rows[:2]
+    # First page passes no keyset bound
+    assert conn.calls[0][1:5] == ("refund policy", None, None, None)
+
+    conn = PageConn(rows[2:])
+    page, next_cursor = await search_history(conn, "u1", "refund policy", limit=2, cursor=next_cursor)
+    assert next_cursor is None
+    assert conn.calls[0][2:5] == (0.1, now, rows[1]["id"])
+
+
+def test_find_buffered_only_returns_the_owners_entry(recorder):
+    entry_id = recorder.record("u1", "formal", "in", "out", 10, segment_outputs=["out"])
+
+    assert recorder.find_buffered(entry_id, "u2") is None
+    entry = recorder.find_buffered(entry_id, "u1")
+    assert (entry["mode"], entry["segment_outputs"]) == ("formal", ["out"])
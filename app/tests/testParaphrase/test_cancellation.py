@@ -0,0 +1,60 @@
+import asyncio
+import time
+import pytest
+
+from app.paraphrase.cancellation import GenerationCancelled, run_cancellable
+
+
+class FakeGenerate:
+    # Stands in for the decoding loop: checks the token once per "step"
+    def __init__(self, steps: int = 200):
+        self.steps = steps
+        self.finished = False
+
+    def __call__(self, text, cancel_token=None):
+        try:
+            for _ in range(self.steps):
+                cancel_token.raise_if_cancelled()
+                time.sleep(0.005)
+            return text
+        finally:
+            self.finished = True
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after: float):
+        self.disconnect_at = time.monotonic() + disconnect_after
+
+    async def is_disconnected(self):
+        return time.monotonic() >= self.disconnect_at
+
+
+@pytest.mark.asyncio
+async def test_completes_normally():
+    assert await run_cancellable(FakeGenerate(steps=2), "hello", request=FakeRequest(10)) == "hello"
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_stops_generation():
+    generate = FakeGenerate()
+    started = time.monotonic()
+
+    with pytest.raises(GenerationCancelled):
+        await run_cancellable(generate, "hello", request=FakeRequest(0.05))
+
+    assert generate.finished
+    assert time.monotonic() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_waits_for_the_model_to_stop():
+    generate = FakeGenerate()
+    task = asyncio.create_task(run_cancellable(generate, "hello"))
+    await asyncio.sleep(0.05)
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # The thread has already let go of the model
+    assert generate.finished
@@ -0,0 +1,20 @@
+from app.paraphrase.dedup import Deduplicator
+
+
+def test_repeated_segments_are_kept_once():
+    dedup = Deduplicator()
+
+    indexes = [
+        dedup.add(segment)
+        for segment in [
+            "Confidential - ACME Corp",
+            "The quarterly results were strong.",
+            "Confidential -  ACME Corp",
+            "Page footer\n",
+            "Confidential - ACME Corp",
+        ]
+    ]
+
+    assert indexes == [0, 1, 0, 2, 0]
+    assert dedup.unique == ["Confidential - ACME Corp", "The quarterly results were strong.", "Page footer\n"]
+    assert (dedup.total, dedup.duplicates) == (5, 2)
@@ -0,0 +1,49 @@
+from io import BytesIO
+
+import docx
+
+from app.paraphrase.docx_document import DocxDocument
+
+
+def make_docx() -> bytes:
+    document = docx.Document()
+    document.add_heading("Quarterly report", level=1)
+
+    paragraph = document.add_paragraph("Revenue grew ")
+    paragraph.add_run("sharply").bold = True
+    paragraph.add_run(" in the third quarter.")
+
+    table = document.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Region"
+    table.cell(0, 1).text = "Sales were flat across the region."
+
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def test_units_follow_paragraphs_runs_and_tables():
+    document = DocxDocument(make_docx())
+
+    assert document.texts == [
+        "Quarterly report",
+        "Revenue grew ",
+        "sharply",
+        " in the third quarter.",
+        "Region",
+        "Sales were flat across the region.",
+    ]
+
+
+def test_apply_keeps_structure_and_formatting():
+    document = DocxDocument(make_docx())
+    document.apply([text.upper() for text in document.texts])
+
+    result = docx.Document(BytesIO(document.to_bytes()))
+
+    assert result.paragraphs[0].style.name == "Heading 1"
+    assert result.paragraphs[0].text == "QUARTERLY REPORT"
+    runs = result.paragraphs[1].runs
+    assert [run.text for run in runs] == ["REVENUE GREW ", "SHARPLY", " IN THE THIRD QUARTER."]
+    assert runs[1].bold
+    assert result.tables[0].cell(0, 1).text == "SALES WERE FLAT ACROSS THE REGION."
@@ -0,0 +1,62 @@
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.dependencies import get_current_user
+from app.db.connection import get_pool
+from app.paraphrase import route
+from app.paraphrase.docx_document import DOCX_CONTENT_TYPE, DocxDocument
+from app.tests.testParaphrase.test_docx_document import make_docx
+from app.users.model import UserDB
+
+
+class FakeInference:
+    async def generate_paraphrase_batch(self, items, **kwargs):
+        return [text.upper() for text, _ in items]
+
+
+class FakeHistoryRecorder:
+    def record(self, *args):
+        return None
+
+
+@pytest.fixture
+def make_client(monkeypatch, usage_ledger, fake_pool):
+    monkeypatch.setattr(route, "inference", FakeInference())
+    monkeypatch.setattr(route, "history_recorder", FakeHistoryRecorder())
+
+    def make(**user_fields):
+        user = UserDB(id=uuid.uuid4(), username="dev", email="dev@example.com", **user_fields)
+        app = FastAPI()
+        app.include_router(route.router)
+        app.dependency_overrides[get_pool] = lambda: fake_pool
+        app.dependency_overrides[get_current_user] = lambda: user
+        return TestClient(app)
+
+    return make
+
+
+def upload(client):
+    return client.post(
+        "/v1/paraphrase/document/docx",
+        files={"file": ("report.docx", make_docx(), DOCX_CONTENT_TYPE)},
+    )
+
+
+@pytest.mark.parametrize("fields", [{}, {"plan": "pro", "subscription_status": "inactive"}])
+def test_unpaid_users_are_refused(make_client, fields):
+    response = upload(make_client(**fields))
+
+    assert response.status_code == 402
+
+
+def test_paid_user_gets_the_paraphrased_document(make_client):
+    client = make_client(plan="pro", subscription_status="active")
+
+    response = upload(client)
+
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="report-paraphrased.docx"'
+    assert "REVENUE GREW " in DocxDocument(response.content).texts
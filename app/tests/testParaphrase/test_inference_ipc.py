@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+
+from app.paraphrase.cancellation import GenerationCancelled, run_cancellable_async
+from app.paraphrase.dedup import GenerationStats
+from app.paraphrase.inference_client import InferenceClient, InferenceUnavailable
+from app.paraphrase.inference_server import InferenceServer
+
+
+def generate_paraphrase(text, mode="standard", cancel_token=None, stats=None):
+    if stats is not None:
+        stats.segments_total = 3
+        stats.segments_deduplicated = 1
+    return f"{mode}:{text}"
+
+
+def generate_paraphrase_batch(items, cancel_token=None):
+    return [ValueError("Input too long") if len(text) > 5 else text.upper() for text, _ in items]
+
+
+def slow_generate(text, cancel_token=None):
+    for _ in range(400):
+        cancel_token.raise_if_cancelled()
+        time.sleep(0.005)
+    return text
+
+
+@pytest_asyncio.fixture
+async def client(tmp_path):
+    server = InferenceServer(str(tmp_path / "inference.sock"), {
+        "generate_paraphrase": generate_paraphrase,
+        "generate_paraphrase_batch": generate_paraphrase_batch,
+        "slow_generate": slow_generate,
+    })
+    await server.start()
+    client = InferenceClient(str(tmp_path / "inference.sock"))
+    yield client
+    await client.close()
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_calls_round_trip_with_stats(client):
+    stats = GenerationStats()
+
+    results = await asyncio.gather(
+        client.call("generate_paraphrase", "hello", "formal", stats=stats),
+        client.call("generate_paraphrase", "world"),
+    )
+
+    assert results == ["formal:hello", "standard:world"]
+    assert (stats.segments_total, stats.segments_deduplicated) == (3, 1)
+
+
+@pytest.mark.asyncio
+async def test_batch_item_errors_come_back_as_exceptions(client):
+    results = await client.call("generate_paraphrase_batch", [("abc", "standard"), ("abcdefgh", "standard")])
+
+    assert results[0] == "ABC"
+    assert isinstance(results[1], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_unknown_method_raises(client):
+    with pytest.raises(ValueError):
+        await client.call("load_model")
+
+
+@pytest.mark.asyncio
+async def test_cancellation_reaches_the_service(client):
+    task = asyncio.create_task(run_cancellable_async(client.call, "slow_generate", "hello"))
+    await asyncio.sleep(0.05)
+
+    started = time.monotonic()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # The remote generation stopped instead of running its full two seconds
+    assert time.monotonic() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_cancelled_generation_raises_generation_cancelled(client):
+    class DisconnectedRequest:
+        async def is_disconnected(self):
+            return True
+
+    with pytest.raises(GenerationCancelled):
+        await run_cancellable_async(client.call, "slow_generate", "hello", request=DisconnectedRequest())
+
+
+@pytest.mark.asyncio
+async def test_unreachable_service(tmp_path):
+    client = InferenceClient(str(tmp_path / "missing.sock"))
+
+    with pytest.raises(InferenceUnavailable):
+        await client.call("generate_paraphrase", "hello")
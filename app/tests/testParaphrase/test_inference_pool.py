@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+
+from app.paraphrase.inference_pool import InferencePool
+from app.paraphrase.inference_protocol import InferenceUnavailable
+from app.paraphrase.inference_server import InferenceServer
+
+
+def make_server(address, name):
+    def generate_paraphrase(text, cancel_token=None, delay=0.0):
+        time.sleep(delay)
+        return f"{name}:{text}"
+
+    return InferenceServer(address, {"generate_paraphrase": generate_paraphrase})
+
+
+@pytest_asyncio.fixture
+async def nodes(tmp_path):
+    # Stand-in inference services, one per socket
+    servers = {}
+    for name in ("a", "b", "c"):
+        servers[name] = make_server(str(tmp_path / f"{name}.sock"), name)
+        await servers[name].start()
+    yield servers
+    for server in servers.values():
+        await server.stop()
+
+
+def make_pool(tmp_path, names=("a", "b", "c")):
+    return InferencePool(
+        [str(tmp_path / f"{name}.sock") for name in names],
+        connect_timeout=1.0,
+        health_interval=60.0,
+        health_timeout=1.0,
+        eject_after_failures=1,
+        max_attempts=3,
+    )
+
+
+def served_by(result: str) -> str:
+    return result.split(":", 1)[0]
+
+
+@pytest.mark.asyncio
+async def test_calls_go_to_the_least_loaded_node(tmp_path, nodes):
+    pool = make_pool(tmp_path)
+    await pool.connect()
+
+    results = await asyncio.gather(*(pool.call("generate_paraphrase", str(i), delay=0.1) for i in range(3)))
+
+    # Three concurrent calls over three idle nodes: one each
+    assert sorted(served_by(r) for r in results) == ["a", "b", "c"]
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_unreachable_node_is_retried_elsewhere_and_ejected(tmp_path, nodes):
+    pool = make_pool(tmp_path)
+    await pool.connect()
+    await nodes["a"].stop()
+    await pool.nodes[0].client.close()
+
+    # With three calls in flight each node gets one, so "a" is tried
+    results = await asyncio.gather(*(pool.call("generate_paraphrase", str(i), delay=0.05) for i in range(3)))
+
+    assert all(served_by(r) in ("b", "c") for r in results)
+    assert not pool.nodes[0].available
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_health_check_brings_a_node_back(tmp_path, nodes):
+    await nodes["a"].stop()
+    pool = make_pool(tmp_path)
+    await pool.connect()
+    assert not pool.nodes[0].available
+
+    await nodes["a"].start()
+    await pool.check_health()
+
+    assert pool.nodes[0].available
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_draining_node_gets_no_new_calls(tmp_path, nodes):
+    pool = make_pool(tmp_path)
+    await pool.connect()
+    await nodes["b"].drain()
+
+    results = [await pool.call("generate_paraphrase", "x") for _ in range(6)]
+    await pool.check_health()
+
+    assert all(served_by(r) in ("a", "c") for r in results)
+    assert not pool.nodes[1].available
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_no_available_node(tmp_path):
+    pool = make_pool(tmp_path, names=("missing",))
+    await pool.connect()
+
+    with pytest.raises(InferenceUnavailable):
+        await pool.call("generate_paraphrase", "x")
+    await pool.close()
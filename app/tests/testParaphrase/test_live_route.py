@@ -0,0 +1,87 @@
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth import dependencies
+from app.auth.jwt import create_access_token
+from app.auth.principal_cache import principal_cache
+from app.core.config import settings
+from app.db.connection import get_pool
+from app.paraphrase import route
+from app.users.model import UserDB
+
+USER_ID = uuid.uuid4()
+
+
+class FakeInference:
+    async def generate_paraphrase(self, text, mode, plan=None, **kwargs):
+        return text.upper()
+
+
+@pytest.fixture
+def users(monkeypatch, usage_ledger):
+    # The users table, as the DAO sees it
+    rows = {str(USER_ID): UserDB(id=USER_ID, username="dev", email="dev@example.com")}
+
+    class FakeUserDAO:
+        def __init__(self, conn):
+            pass
+
+        async def get_by_id(self, user_id):
+            return rows.get(str(user_id))
+
+    monkeypatch.setattr(dependencies, "UserDAO", FakeUserDAO)
+    monkeypatch.setattr(route, "inference", FakeInference())
+    monkeypatch.setattr(settings, "LIVE_DEBOUNCE_SECONDS", 0.0)
+    principal_cache.clear()
+    yield rows
+    principal_cache.clear()
+
+
+@pytest.fixture
+def client(fake_pool):
+    app = FastAPI()
+    app.include_router(route.router)
+    app.dependency_overrides[get_pool] = lambda: fake_pool
+    return TestClient(app)
+
+
+def test_usage_flushed_during_the_session_counts(users, client):
+    with client.websocket_connect("/v1/paraphrase/live") as ws:
+        ws.send_json({"type": "auth", "token": create_access_token(str(USER_ID))})
+        assert ws.receive_json()["type"] == "ready"
+
+        ws.send_json({"text": "hello", "revision": 1})
+        assert ws.receive_json() == {"type": "result", "revision": 1, "paraphrased_text": "HELLO"}
+
+        # Another worker's usage reaches the row, and the flush invalidates the cache
+        users[str(USER_ID)] = users[str(USER_ID)].model_copy(update={"monthly_characters_used": 19_995})
+        principal_cache.invalidate(USER_ID)
+
+        ws.send_json({"text": "again", "revision": 2})
+        message = ws.receive_json()
+        assert message["type"] == "error"
+        assert message["detail"] == "Monthly usage limit exceeded"
+
+
+def test_binary_frame_before_auth_closes_with_policy_violation(users, client):
+    with client.websocket_connect("/v1/paraphrase/live") as ws:
+        ws.send_bytes(b"\x00\x01")
+        message = ws.receive()
+
+    assert message["type"] == "websocket.close"
+    assert message["code"] == 1008
+
+
+def test_binary_frame_after_auth_closes_with_unsupported_data(users, client):
+    with client.websocket_connect("/v1/paraphrase/live") as ws:
+        ws.send_json({"type": "auth", "token": create_access_token(str(USER_ID))})
+        assert ws.receive_json()["type"] == "ready"
+
+        ws.send_bytes(b"\x00\x01")
+        message = ws.receive()
+
+    assert message["type"] == "websocket.close"
+    assert message["code"] == 1003
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+
+from app.paraphrase.live import LiveSession
+
+
+class Recorder:
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.generated = []
+        self.sent = []
+
+    async def generate(self, text, mode):
+        self.generated.append(text)
+        await asyncio.sleep(self.delay)
+        return text.upper()
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+@pytest.mark.asyncio
+async def test_burst_of_revisions_generates_only_the_last():
+    recorder = Recorder()
+    session = LiveSession(recorder.generate, recorder.send, debounce=0.05)
+    task = asyncio.create_task(session.run())
+
+    for revision, text in enumerate(["h", "he", "hel", "hello"], start=1):
+        session.submit(revision, text, "standard")
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.1)
+    task.cancel()
+
+    assert recorder.generated == ["hello"]
+    assert recorder.sent == [{"type": "result", "revision": 4, "paraphrased_text": "HELLO"}]
+
+
+@pytest.mark.asyncio
+async def test_result_superseded_during_generation_is_not_sent():
+    recorder = Recorder(delay=0.05)
+    session = LiveSession(recorder.generate, recorder.send, debounce=0.01)
+    task = asyncio.create_task(session.run())
+
+    session.submit(1, "first", "standard")
+    await asyncio.sleep(0.03)  # generating "first"
+    session.submit(2, "second", "standard")
+    await asyncio.sleep(0.15)
+    task.cancel()
+
+    assert recorder.generated == ["first", "second"]
+    assert [m["revision"] for m in recorder.sent] == [2]
@@ -0,0 +1,126 @@
+import pytest
+
+# Runs where the model dependencies are installed; the model itself is a fake
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from app.paraphrase import ml_model  # noqa: E402
+from app.paraphrase.model_registry import ModelRegistry  # noqa: E402
+
+
+class FakeBatch(list):
+    def to(self, device):
+        return self
+
+
+class FakeTokenizer:
+    # One token per word
+    def __call__(self, text, return_tensors=None, truncation=False, padding=False, max_length=None):
+        if isinstance(text, list):
+            return {"input_ids": FakeBatch(text), "attention_mask": FakeBatch(text)}
+        return {"input_ids": [text.split()]}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(ids)
+
+    def batch_decode(self, outputs, skip_special_tokens=True):
+        return outputs
+
+
+class FakeModel:
+    # "<text>", or "<text>#v" for each of num_return_sequences
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, input_ids, attention_mask, max_new_tokens, **kwargs):
+        self.calls.append({"prompts": list(input_ids), **kwargs})
+        variants = kwargs.get("num_return_sequences", 1)
+        outputs = []
+        for prompt in input_ids:
+            text = prompt.split(":", 1)[1].replace("</s>", "").strip()
+            outputs += [f"<{text}>#{v}" if variants > 1 else f"<{text}>" for v in range(variants)]
+        return outputs
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeModel()
+    registry = ModelRegistry(
+        models={"fake": "/models/fake"},
+        routes={"default": "fake"},
+        memory_budget_bytes=0,
+        loader=lambda path: (FakeTokenizer(), fake, ml_model.torch.device("cpu"), 0),
+    )
+    monkeypatch.setattr(ml_model, "registry", registry)
+    return fake
+
+
+def test_batch_groups_chunks_by_mode_and_keeps_item_order(model):
+    results = ml_model.generate_paraphrase_batch([
+        ("First item.", "standard"),
+        ("x" * (ml_model.MAX_INPUT_CHARS + 1), "standard"),
+        ("Second item.", "formal"),
+        ("Third item.", "standard"),
+        ("Fourth item.", "no-such-mode"),
+    ])
+
+    assert results[0] == "<First item.>"
+    assert isinstance(results[1], ValueError)
+    assert results[2] == "<Second item.>"
+    assert results[3] == "<Third item.>"
+    assert isinstance(results[4], ValueError)
+    # One generate call per mode, each with all of that mode's chunks
+    assert sorted(call["prompts"][0].split(":")[0] for call in model.calls) == [
+        "paraphrase",
+        "rewrite in a formal tone",
+    ]
+    assert len(model.calls[0]["prompts"]) == 2
+
+
+def test_chunks_of_similar_length_are_generated_together(model, monkeypatch):
+    monkeypatch.setattr(ml_model, "MAX_GENERATE_BATCH", 2)
+    texts = ["a b c d e f", "a", "a b c d e", "a b"]
+
+    outputs = ml_model.paraphrase_chunks(texts, "standard", FakeTokenizer(), model, "cpu")
+
+    assert outputs == [f"<{text}>" for text in texts]
+    assert [[prompt.split(":")[1].split("</s>")[0].strip() for prompt in call["prompts"]] for call in model.calls] == [
+        ["a", "a b"],
+        ["a b c d e", "a b c d e f"],
+    ]
+
+
+def test_variants_take_output_v_of_every_chunk(model):
+    # Two prose spans, longest first, so the generate batch is reordered too
+    text = "The first paragraph is the longer one.\n\n12\n\nSecond one."
+
+    candidates = ml_model.generate_paraphrase_variants(text, ["standard"], num_variants=2)
+
+    assert candidates == [
+        ("standard", "<The first paragraph is the longer one.>#0\n\n12\n\n<Second one.>#0"),
+        ("standard", "<The first paragraph is the longer one.>#1\n\n12\n\n<Second one.>#1"),
+    ]
+
+
+def test_beam_search_keeps_at_least_as_many_beams_as_variants(model):
+    ml_model.generate_paraphrase_variants("Some text here.", ["standard", "creative"], num_variants=3)
+
+    standard, creative = model.calls
+    assert standard["num_return_sequences"] == 3
+    assert standard["num_beams"] >= 3
+    # Sampling draws each sequence independently; it needs no beams
+    assert creative["num_return_sequences"] == 3
+    assert "num_beams" not in creative
+
+
+def test_identical_variants_are_returned_once(model, monkeypatch):
+    generate = model.generate
+
+    def same_for_every_beam(input_ids, attention_mask, max_new_tokens, **kwargs):
+        return [output.split("#")[0] for output in generate(input_ids, attention_mask, max_new_tokens, **kwargs)]
+
+    monkeypatch.setattr(model, "generate", same_for_every_beam)
+
+    candidates = ml_model.generate_paraphrase_variants("Some text here.", ["standard", "formal"], num_variants=3)
+
+    assert candidates == [("standard", "<Some text here.>"), ("formal", "<Some text here.>")]
@@ -0,0 +1,86 @@
+import pytest
+
+from app.paraphrase.model_registry import ModelRegistry
+
+MB = 1024 * 1024
+
+
+class FakeLoader:
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.loads = []
+        self.unloads = []
+
+    def load(self, path):
+        self.loads.append(path)
+        return f"tok:{path}", f"model:{path}", "cpu", self.sizes[path]
+
+    def unload(self, loaded):
+        self.unloads.append(loaded.name)
+
+
+def make_registry(loader, budget_mb=100, routes=None):
+    return ModelRegistry(
+        models={"small": "/models/small", "pegasus": "/models/pegasus", "other": "/models/other"},
+        routes=routes or {"default": "pegasus", "free": "small", "shorten": "small", "pro:shorten": "pegasus"},
+        memory_budget_bytes=budget_mb * MB,
+        loader=loader.load,
+        unloader=loader.unload,
+    )
+
+
+def test_routes_most_specific_first():
+    registry = make_registry(FakeLoader({}))
+
+    assert registry.route("pro", "shorten") == "pegasus"
+    assert registry.route("basic", "shorten") == "small"
+    assert registry.route("free", "formal") == "small"
+    assert registry.route("pro", "formal") == "pegasus"
+    assert registry.route(None, "standard") == "pegasus"
+
+
+def test_unknown_route_target_is_rejected():
+    with pytest.raises(ValueError):
+        make_registry(FakeLoader({}), routes={"default": "missing"})
+
+
+def test_loads_lazily_once():
+    loader = FakeLoader({"/models/small": 10 * MB})
+    registry = make_registry(loader)
+
+    with registry.use("small") as first:
+        pass
+    with registry.use("small") as second:
+        pass
+
+    assert first is second
+    assert loader.loads == ["/models/small"]
+    assert first.memory_bytes == 10 * MB
+
+
+def test_least_recently_used_idle_model_is_evicted():
+    loader = FakeLoader({"/models/small": 40 * MB, "/models/pegasus": 50 * MB, "/models/other": 30 * MB})
+    registry = make_registry(loader)
+
+    with registry.use("small"):
+        pass
+    with registry.use("pegasus"):
+        pass
+    with registry.use("small"):
+        pass
+    with registry.use("other"):
+        pass
+
+    assert loader.unloads == ["pegasus"]
+    assert registry.loaded() == ["small", "other"]
+
+
+def test_model_in_use_is_not_evicted():
+    loader = FakeLoader({"/models/small": 60 * MB, "/models/pegasus": 60 * MB})
+    registry = make_registry(loader)
+
+    with registry.use("small"):
+        with registry.use("pegasus"):
+            assert registry.loaded() == ["small", "pegasus"]
+
+    assert loader.unloads == []
@@ -0,0 +1,107 @@
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.dependencies import get_current_user
+from app.db.connection import get_pool
+from app.paraphrase import route
+from app.tests.fakes import FakeConnection
+from app.users.model import UserDB
+
+USER = UserDB(id=uuid.uuid4(), username="dev", email="dev@example.com", plan="pro", subscription_status="active")
+
+
+class HistoryConn(FakeConnection):
+    async def fetchrow(self, sql, *args):
+        # No history entry has been flushed
+        return None
+
+
+class FakeInference:
+    def __init__(self):
+        self.calls = []
+
+    async def generate_paraphrase_batch(self, items, **kwargs):
+        self.calls.append(items)
+        return [ValueError("Input too long") if "fail" in text else f"<{text}>" for text, _ in items]
+
+
+class FakeHistoryRecorder:
+    def record(self, *args, **kwargs):
+        return uuid.uuid4()
+
+
+@pytest.fixture
+def inference(monkeypatch, usage_ledger):
+    fake = FakeInference()
+    monkeypatch.setattr(route, "inference", fake)
+    monkeypatch.setattr(route, "history_recorder", FakeHistoryRecorder())
+    return fake
+
+
+@pytest.fixture
+def client(inference, make_pool):
+    app = FastAPI()
+    app.include_router(route.router)
+    pool = make_pool(HistoryConn)
+    app.dependency_overrides[get_pool] = lambda: pool
+    app.dependency_overrides[get_current_user] = lambda: USER
+    return TestClient(app)
+
+
+def test_incremental_with_an_unknown_previous_id_regenerates_everything(client, inference):
+    response = client.post(
+        "/v1/paraphrase/incremental",
+        json={"text": "First one. Second one.", "previous_id": str(uuid.uuid4())},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["segments_total"] == 2
+    assert body["segments_reused"] == 0
+    assert [text for text, _ in inference.calls[0]] == ["First one.", "Second one."]
+
+
+def test_batch_results_in_order_with_per_item_errors(client, inference):
+    response = client.post(
+        "/v1/paraphrase/batch",
+        json={"items": [
+            {"text": "one"},
+            {"text": "   "},
+            {"text": "this will fail", "mode": "formal"},
+            {"text": "two", "num_variants": 2},
+            {"text": "three"},
+        ]},
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+    assert [r["paraphrased_text"] for r in results] == ["<one>", None, None, None, "<three>"]
+    assert results[1]["error"] == "Text cannot be empty"
+    assert results[2]["error"] == "Input too long"
+    assert results[3]["error"] == "Variants are not supported in batch requests"
+    # Invalid items never reach the model
+    assert inference.calls == [[("one", "standard"), ("this will fail", "formal"), ("three", "standard")]]
+
+
+def test_batch_charges_only_successful_items(client, inference):
+    response = client.post(
+        "/v1/paraphrase/batch",
+        json={"items": [{"text": "one"}, {"text": "this will fail"}, {"text": "three"}]},
+    )
+
+    assert response.json()["characters_charged"] == len("one") + len("three")
+    assert route.usage_ledger.outstanding(USER.id) == len("one") + len("three")
+
+
+@pytest.mark.parametrize("extra", [{"num_variants": 2}, {"modes": ["standard", "formal"]}])
+def test_anonymous_callers_cannot_request_variants(client, inference, extra):
+    client.app.dependency_overrides.pop(get_current_user)
+
+    response = client.post("/v1/paraphrase", json={"text": "Some text here.", **extra})
+
+    assert response.status_code == 401
+    assert inference.calls == []
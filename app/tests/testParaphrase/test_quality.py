@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from app.paraphrase.inference import InferenceGateway
+from app.paraphrase.quality import _MIN_SAMPLES, DECODING_TIERS, QualityController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_controller(clock, max_queue_depth=4):
+    return QualityController(slo=1.0, max_queue_depth=max_queue_depth, window=20, step_interval=5.0, clock=clock)
+
+
+def observe(controller, latency, times=_MIN_SAMPLES):
+    for _ in range(times):
+        controller.observe(latency)
+
+
+def test_one_slow_call_is_not_enough_to_step_down():
+    clock = FakeClock()
+    controller = make_controller(clock)
+
+    observe(controller, 3.0, times=_MIN_SAMPLES - 1)
+    assert controller.tier_name == "full"
+
+    controller.observe(3.0)
+    assert controller.tier_name == "greedy"
+
+
+def test_slow_calls_step_down_one_tier_per_interval():
+    clock = FakeClock()
+    controller = make_controller(clock)
+
+    observe(controller, 3.0)
+    assert controller.tier_name == "greedy"
+
+    # Too soon for another step
+    observe(controller, 3.0)
+    assert controller.tier_name == "greedy"
+
+    clock.now += 5
+    controller.observe(3.0)
+    assert controller.tier_name == "short"
+
+
+def test_bottoms_out_at_the_last_tier():
+    clock = FakeClock()
+    controller = make_controller(clock)
+
+    for _ in range(10):
+        observe(controller, 3.0)
+        clock.now += 5
+
+    assert controller.tier == len(DECODING_TIERS) - 1
+
+
+def test_queue_depth_steps_down_before_latency_shows_it():
+    clock = FakeClock()
+    controller = make_controller(clock, max_queue_depth=2)
+
+    with controller.track() as first, controller.track(), controller.track() as third:
+        assert first == 0
+        assert third == 1
+
+
+def test_steps_back_up_once_fast_again():
+    clock = FakeClock()
+    controller = make_controller(clock)
+    observe(controller, 3.0)
+    assert controller.tier == 1
+
+    clock.now += 5
+    # A handful of fast calls at the new tier are needed first
+    for _ in range(4):
+        controller.observe(0.1)
+    assert controller.tier == 1
+
+    controller.observe(0.1)
+    assert controller.tier == 0
+
+
+def test_stays_down_while_latency_is_near_the_slo():
+    clock = FakeClock()
+    controller = make_controller(clock)
+    observe(controller, 3.0)
+
+    for _ in range(10):
+        clock.now += 5
+        controller.observe(0.8)
+
+    assert controller.tier == 1
+
+
+class RecordingController(QualityController):
+    def __init__(self):
+        super().__init__(slo=1.0, max_queue_depth=4, window=20, step_interval=5.0)
+        self.observed = []
+
+    def observe(self, latency: float):
+        self.observed.append(latency)
+        super().observe(latency)
+
+
+class SlowClient:
+    async def call(self, method, *args, **kwargs):
+        await asyncio.sleep(0.05)
+        return "done"
+
+
+@pytest.mark.asyncio
+async def test_gateway_observes_latency_per_thousand_characters():
+    controller = RecordingController()
+    gateway = InferenceGateway(controller, SlowClient())
+
+    await gateway.generate_paraphrase("x" * 5000, "standard")
+    await gateway.generate_paraphrase("short", "standard")
+
+    long_call, short_call = controller.observed
+    # 5000 characters count five times; a short call counts as a whole 1000
+    assert long_call < short_call / 2
+    assert short_call >= 0.05
@@ -0,0 +1,30 @@
+from app.paraphrase.segmentation import join_sentences, reuse_outputs, split_sentences
+
+
+def test_split_and_join_round_trip():
+    text = "First sentence. Second one!  Third?\n\nNew paragraph here"
+
+    sentences, separators = split_sentences(text)
+
+    assert sentences == ["First sentence.", "Second one!", "Third?", "New paragraph here"]
+    assert join_sentences(sentences, separators) == text
+
+
+def test_only_changed_sentences_need_generation():
+    previous, _ = split_sentences("The cat sat. It was warm. Then it left.")
+    outputs = ["A cat was sitting.", "The weather was warm.", "Afterwards it went away."]
+
+    sentences, _ = split_sentences("A new opening. The cat sat.  It was   warm. Then it ran.")
+
+    assert reuse_outputs(sentences, previous, outputs) == [
+        None,
+        "A cat was sitting.",
+        "The weather was warm.",
+        None,
+    ]
+
+
+def test_mismatched_previous_segmentation_reuses_nothing():
+    sentences, _ = split_sentences("The cat sat. It was warm.")
+
+    assert reuse_outputs(sentences, ["The cat sat."], []) == [None, None]
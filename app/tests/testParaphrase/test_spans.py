@@ -0,0 +1,56 @@
+from app.paraphrase.spans import is_prose_line, mask_inline, split_padding, split_spans, unmask_inline
+
+
+def test_spans_round_trip_and_classify():
+    text = (
+        "Results\n"
+        "The model was trained on a large corpus and evaluated carefully.\n"
+        "See https://example.com/paper for the full data set.\n"
+        "\n"
+        "Table 2   0.91   0.87\n"
+        "12\n"
+        "[3] Smith, J. Deep paraphrasing. 2020.\n"
+        "result = run(model);\n"
+    )
+
+    spans = split_spans(text)
+
+    assert "".join(span for span, _ in spans) == text
+    assert [span.strip() for span, prose in spans if prose] == [
+        "Results",
+        "The model was trained on a large corpus and evaluated carefully.\n"
+        "See https://example.com/paper for the full data set.",
+    ]
+
+
+def test_non_prose_lines():
+    assert not is_prose_line("  42  ")
+    assert not is_prose_line("x^2 + 3y = 7 - 2 * (4 / 9)")
+    assert not is_prose_line("| name | value |")
+    assert not is_prose_line("import numpy as np")
+    assert not is_prose_line("https://example.com/paper")
+    assert is_prose_line("This is an ordinary sentence.")
+
+
+def test_code_needs_code_syntax():
+    for line in ("def f(x):", "let total = items.length;", "class Model(nn.Module):", "from app.core import settings"):
+        assert not is_prose_line(line)
+    for line in (
+        "let me know if you need anything else.",
+        "public transport is cheaper (and faster) than driving.",
+        "class imbalance is a common problem in practice.",
+    ):
+        assert is_prose_line(line)
+
+
+def test_inline_spans_are_masked_and_restored():
+    masked, inline = mask_inline("Mail bob@example.com or see https://example.com/a.")
+
+    assert masked == "Mail [[0]] or see [[1]]."
+    # Spacing the model added is tolerated; a dropped placeholder is appended
+    assert unmask_inline("Write to [[ 0 ]].", inline) == "Write to bob@example.com. https://example.com/a"
+
+
+def test_split_padding():
+    assert split_padding("\n  Some text. \n") == ("\n  ", "Some text.", " \n")
+    assert split_padding("   ") == ("   ", "", "")
@@ -0,0 +1,55 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from app.payments.stripe_client import PaymentsClient
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        FakeStripeHandler.requests.append(
+            (self.path, self.headers.get("Idempotency-Key"), parse_qs(body))
+        )
+
+        payload = json.dumps({"id": "cus_fake", "object": "customer"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_stripe():
+    FakeStripeHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeStripeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_create_customer_sends_idempotency_key(fake_stripe):
+    client = PaymentsClient(api_key="sk_test_fake", api_base=fake_stripe, max_network_retries=0)
+
+    customer = await client.create_customer(
+        params={"email": "dev@example.com", "metadata": {"user_id": "u1"}},
+        idempotency_key="customer-u1",
+    )
+    await client.close()
+
+    assert customer.id == "cus_fake"
+    path, idempotency_key, form = FakeStripeHandler.requests[0]
+    assert path == "/v1/customers"
+    assert idempotency_key == "customer-u1"
+    assert form["email"] == ["dev@example.com"]
@@ -0,0 +1,84 @@
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from app.db.connection import get_pool
+from app.payments.webhooks import router, webhook_secret
+from app.payments.webhook_consumer import apply_event
+from app.tests.fakes import FakeConnection
+
+
+class WebhookConn(FakeConnection):
+    async def fetchval(self, query, event_id, event_type, payload):
+        if event_id in self.pool.queued_ids:
+            return None
+        self.pool.queued_ids.add(event_id)
+        return event_id
+
+
+def signed(payload: bytes) -> str:
+    timestamp = int(time.time())
+    signature = hmac.new(
+        webhook_secret.encode(),
+        f"{timestamp}.".encode() + payload,
+        hashlib.sha256,
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+@pytest.fixture
+def client(make_pool):
+    app = FastAPI()
+    app.include_router(router)
+
+    pool = make_pool(WebhookConn, queued_ids=set())
+    app.dependency_overrides[get_pool] = lambda: pool
+    return TestClient(app)
+
+
+@patch("app.payments.webhooks.webhook_consumer")
+def test_stripe_retries_are_queued_once(_, client):
+    payload = json.dumps({
+        "id": "evt_1",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {"metadata": {"user_id": "u1", "plan": "pro"}}},
+    }).encode()
+    headers = {"Stripe-Signature": signed(payload)}
+
+    first = client.post("/webhooks/stripe/webhook", content=payload, headers=headers)
+    second = client.post("/webhooks/stripe/webhook", content=payload, headers=headers)
+
+    assert first.json() == {"status": "queued"}
+    assert second.json() == {"status": "duplicate"}
+
+
+def test_invalid_signature_is_rejected(client):
+    response = client.post(
+        "/webhooks/stripe/webhook",
+        content=b"{}",
+        headers={"Stripe-Signature": "t=1,v1=bad"},
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_downgrade_falls_back_to_stripe_customer():
+    conn = AsyncMock()
+    conn.fetchval.return_value = "u1"
+
+    outcome, user_id = await apply_event(conn, {
+        "type": "invoice.payment_failed",
+        "data": {"object": {"customer": "cus_123"}},
+    })
+
+    assert outcome == "downgraded"
+    assert user_id == "u1"
+    conn.execute.assert_awaited_once()
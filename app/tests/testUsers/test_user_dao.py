@@ -125,3 +125,55 @@ async def test_get_by_email_and_username_not_found(user_dao, mock_conn):
     )
 
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_create_user_conflict_returns_none(user_dao, mock_conn):
+    mock_conn.fetchrow.return_value = None
+
+    user_id = await user_dao.create_user(
+        user_id="userX24",
+        username="developer",
+        email="developer@example.com",
+        hashed_password="hashed",
+        phone_number="0783434834",
+    )
+
+    assert user_id is None
+
+
+@pytest.mark.asyncio
+async def test_prepared_statement_is_used_when_available():
+    statement = AsyncMock()
+    statement.fetchrow.return_value = {
+        "id": uuid.uuid4(),
+        "username": "dev",
+        "email": "dev@example.com",
+        "plan": "pro",
+    }
+
+    class PreparedConn:
+        prepared_statements = {"user_by_id": statement}
+
+    result = await UserDAO(PreparedConn()).get_by_id(uuid.uuid4())
+
+    statement.fetchrow.assert_awaited_once()
+    assert result.plan == "pro"
+    assert result.monthly_characters_used == 0
+
+
+@pytest.mark.asyncio
+async def test_reads_fall_back_to_primary_when_replica_lags():
+    primary, replica = AsyncMock(), AsyncMock()
+    replica.fetchrow.return_value = None
+    primary.fetchrow.return_value = {
+        "id": uuid.uuid4(),
+        "username": "newdev",
+        "email": "newdev@example.com",
+    }
+
+    result = await UserDAO(primary, reader=replica).get_by_email("newdev@example.com")
+
+    replica.fetchrow.assert_awaited_once()
+    primary.fetchrow.assert_awaited_once()
+    assert result.username == "newdev"
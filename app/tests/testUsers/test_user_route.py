@@ -9,25 +9,12 @@ from app.users.model import UserRegisterResponse, TokenResponse
 from app.db.connection import get_pool
 
 
-class FakeConn:
-    async def __aenter__(self):
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb):
-        pass
-
-
-class FakePool:
-    def acquire(self):
-        return FakeConn()
-
-
 @pytest.fixture
-def client():
+def client(fake_pool):
     app = FastAPI()
     app.include_router(router)
 
-    app.dependency_overrides[get_pool] = lambda: FakePool()
+    app.dependency_overrides[get_pool] = lambda: fake_pool
     return TestClient(app)
 
 
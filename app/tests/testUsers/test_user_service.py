@@ -3,8 +3,10 @@ from uuid import uuid4
 from unittest.mock import AsyncMock, patch
 from fastapi import HTTPException
 
+from app.users.dao import UserDAO
 from app.users.service import UserService
 from app.users.model import UserRegisterResponse, TokenResponse
+from app.tests.fakes import FakeConnection
 
 
 @pytest.fixture
@@ -39,8 +41,10 @@ async def test_register_user_with_weak_password_deny(_, user_service):
 
 
 @pytest.mark.asyncio
-async def test_register_existing_user(user_service):
-    user_service.dao.get_by_email_and_username.return_value = object()
+@patch("app.users.service.hash_password", return_value="hashed")
+async def test_register_existing_user(_, user_service):
+    # The insert hits ON CONFLICT DO NOTHING and returns no id
+    user_service.dao.create_user.return_value = None
 
     with pytest.raises(HTTPException) as exc:
         await user_service.register_user(
@@ -105,3 +109,50 @@ async def test_login_success(_, __, user_service):
 
     assert isinstance(result, TokenResponse)
     assert result.access_token == "jwt-token"
+
+
+@pytest.mark.asyncio
+@patch("app.users.service.verify_password", return_value=True)
+@patch("app.users.service.needs_rehash", return_value=True)
+@patch("app.users.service.rehash_password", return_value="rehashed")
+@patch("app.users.service.create_access_token", return_value="jwt-token")
+async def test_login_rehashes_outdated_hash(_, __, ___, ____, user_service):
+    user_id = uuid4()
+    user_service.dao.get_by_email.return_value = type(
+        "User", (), {"id": user_id, "password": "old-hash"}
+    )()
+
+    await user_service.user_login(
+        email="dev@example.com",
+        password="correctpassword",
+    )
+
+    user_service.dao.update_password.assert_awaited_once_with(user_id, "rehashed")
+
+
+class LoginConn(FakeConnection):
+    async def fetchrow(self, sql, *args):
+        return {"id": uuid4(), "username": "dev", "email": args[0], "password": "old-hash"}
+
+    async def execute(self, sql, *args):
+        self.pool.executed.append(args)
+
+
+@pytest.mark.asyncio
+@patch("app.users.service.needs_rehash", return_value=True)
+@patch("app.users.service.create_access_token", return_value="jwt-token")
+async def test_login_holds_no_connection_while_hashing(_, __, make_pool):
+    pool = make_pool(LoginConn, executed=[])
+    held_while_hashing = []
+
+    async def hashing(*args):
+        held_while_hashing.append(pool.in_use)
+        return "rehashed" if len(args) == 1 else True
+
+    with patch("app.users.service.verify_password", side_effect=hashing), \
+            patch("app.users.service.rehash_password", side_effect=hashing):
+        await UserService(UserDAO(pool)).user_login(email="dev@example.com", password="correctpassword")
+
+    assert held_while_hashing == [0, 0]
+    assert pool.executed == [("rehashed", pool.executed[0][1])]
+    assert pool.in_use == 0
@@ -1,54 +1,95 @@
 from typing import Optional
 import asyncpg
 import uuid
+from app.db import queries
+from app.db.queries import register_query
 from app.users.model import UserDB
 
+USER_BY_EMAIL = register_query(
+    "user_by_email",
+    """
+    SELECT id, username, email, password, phone_number, role
+    FROM users
+    WHERE email = $1
+    """,
+)
+
+USER_BY_ID = register_query(
+    "user_by_id",
+    """
+    SELECT id, username, email, phone_number, role,
+           plan, subscription_status, monthly_characters_used
+    FROM users
+    WHERE id = $1
+    """,
+)
+
+USER_BY_EMAIL_OR_USERNAME = register_query(
+    "user_by_email_or_username",
+    """
+    SELECT id, username, email, phone_number, role
+    FROM users
+    WHERE email = $1 OR username = $2
+    """,
+)
+
+# A duplicate email or username (both unique) inserts nothing and returns no row
+CREATE_USER = register_query(
+    "create_user",
+    """
+    INSERT INTO users (id, username, email, password, phone_number, role)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT DO NOTHING
+    RETURNING id
+    """,
+)
+
+UPDATE_PASSWORD = register_query(
+    "update_password",
+    """
+    UPDATE users
+    SET password = $1
+    WHERE id = $2
+    """,
+)
+
+
+def _to_user(row) -> Optional[UserDB]:
+    # Rows come from our own schema, so skip pydantic validation
+    return UserDB.model_construct(**row) if row else None
+
 
 class UserDAO:
-    def __init__(self, conn: asyncpg.Connection):
+    # `reader` (e.g. a replica connection) serves the read-only lookups;
+    # writes always go to `conn`
+    def __init__(self, conn: asyncpg.Connection, reader: asyncpg.Connection | None = None):
         self.conn = conn
+        self.reader = reader if reader is not None else conn
+
+    async def _read(self, name: str, *args):
+        row = await queries.fetchrow(self.reader, name, *args)
+        # A row written moments ago may not have reached the replica yet
+        if row is None and self.reader is not self.conn:
+            row = await queries.fetchrow(self.conn, name, *args)
+        return row
 
     async def get_by_email(self, email: str) -> Optional[UserDB]:
-        row = await self.conn.fetchrow(
-            """
-            SELECT id, username, email, password, phone_number, role
-            FROM users
-            WHERE email = $1
-            """,
-            email,
-        )
-        return UserDB(**dict(row)) if row else None
+        row = await self._read(USER_BY_EMAIL, email)
+        return _to_user(row)
 
     async def get_by_id(self, user_id: uuid.UUID) -> Optional[UserDB]:
-        row = await self.conn.fetchrow(
-            """
-            SELECT id, username, email, phone_number, role
-            FROM users
-            WHERE id = $1
-            """,
-            user_id,
-        )
-        return UserDB(**dict(row)) if row else None
+        row = await self._read(USER_BY_ID, user_id)
+        return _to_user(row)
 
     async def get_by_email_and_username(self, email: str, username: str) -> Optional[UserDB]:
-        row = await self.conn.fetchrow(
-            """
-            SELECT id, username, email, phone_number, role
-            FROM users
-            WHERE email = $1 OR username = $2
-            """,
-            email,
-            username,
-        )
-        return UserDB(**dict(row)) if row else None
-
-    async def create_user(self, user_id: str, username: str, email: str, hashed_password: str, phone_number: str, role: str = "user") -> str:
-        row = await self.conn.fetchrow(
-            """
-            INSERT INTO users (id, username, email, password, phone_number, role)
-            VALUES ($1, $2, $3, $4, $5, $6)
-            RETURNING id
-            """,
+        row = await queries.fetchrow(self.conn, USER_BY_EMAIL_OR_USERNAME, email, username)
+        return _to_user(row)
+
+    async def create_user(self, user_id: str, username: str, email: str, hashed_password: str, phone_number: str, role: str = "user") -> Optional[str]:
+        # Returns None if the email or username is already taken
+        row = await queries.fetchrow(
+            self.conn,
+            CREATE_USER,
             user_id,
             username,
             email,
@@ -56,4 +97,7 @@ class UserDAO:
             phone_number,
             role,
         )
-        return row["id"]
\ No newline at end of file
+        return row["id"] if row else None
+
+    async def update_password(self, user_id: uuid.UUID, hashed_password: str) -> None:
+        await queries.execute(self.conn, UPDATE_PASSWORD, hashed_password, user_id)
@@ -18,6 +18,11 @@ class UserDB(BaseModel):
     role: Optional[str] = None
     created_at: Optional[datetime] = None
 
+    # Billing
+    plan: str = "free"
+    subscription_status: Optional[str] = None
+    monthly_characters_used: int = 0
+
     # Removed the class Config, this will be deprecated
     #class Config:
     #    from_attributes = True
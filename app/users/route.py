@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends, Request
 from app.users.service import UserService
 from app.users.dao import UserDAO
-import asyncpg
 from app.users.model import UserRegisterRequest, UserRegisterResponse, UserLoginRequest, TokenResponse
 from app.db.connection import get_pool
 from app.core.rate_limit import rate_limit
@@ -11,26 +10,40 @@ router = APIRouter(prefix="/v1/users", tags=["Users"])
 
 @router.post("/register", response_model=UserRegisterResponse, status_code=201)
 @rate_limit()
-async def register_user(request: Request, payload: UserRegisterRequest, db_pool: asyncpg.pool.Pool = Depends(get_pool)):
-    guard_captcha(token=payload.recaptcha_token, expected_action="register", min_score=0.5)
-    async with db_pool.acquire() as conn:
-        user_dao = UserDAO(conn)
-        service = UserService(user_dao)
-        return await service.register_user(
-            email=payload.email,
-            username=payload.username,
-            password=payload.password,
-            phone_number=payload.phone_number,
-        )
+async def register_user(request: Request, payload: UserRegisterRequest, pool=Depends(get_pool)):
+    await guard_captcha(
+        token=payload.recaptcha_token,
+        expected_action="register",
+        min_score=0.5,
+        remote_ip=request.client.host if request.client else None,
+    )
+    # Over the pool, each query takes a connection just for itself: none is
+    # held while argon2 hashes the password
+    service = UserService(UserDAO(pool))
+    return await service.register_user(
+        email=payload.email,
+        username=payload.username,
+        password=payload.password,
+        phone_number=payload.phone_number,
+    )
 
 @router.post("/login", response_model=TokenResponse)
 @rate_limit(limit=5, window=60)
-async def user_login(request: Request, payload: UserLoginRequest, db_pool: asyncpg.pool.Pool = Depends(get_pool)):
-    guard_captcha(token=payload.recaptcha_token, expected_action="login", min_score=0.5)
-    async with db_pool.acquire() as conn:
-        user_dao = UserDAO(conn)
-        service = UserService(user_dao)
-        return await service.user_login(
-            email=payload.email,
-            password=payload.password
-        )
+async def user_login(
+    request: Request,
+    payload: UserLoginRequest,
+    pool=Depends(get_pool),
+):
+    await guard_captcha(
+        token=payload.recaptcha_token,
+        expected_action="login",
+        min_score=0.5,
+        remote_ip=request.client.host if request.client else None,
+    )
+    # As in register: no connection is held while the password is verified
+    replica_pool = getattr(request.app.state, "db_replica_pool", None)
+    service = UserService(UserDAO(pool, reader=replica_pool))
+    return await service.user_login(
+        email=payload.email,
+        password=payload.password
+    )
@@ -2,7 +2,8 @@ import uuid
 from fastapi import HTTPException, status
 
 from app.users.dao import UserDAO
-from app.auth.password_handler import hash_password, verify_password, DUMMY_PASSWORD_HASH
+from app.auth.password_handler import needs_rehash
+from app.auth.password_service import hash_password, verify_password, rehash_password, get_dummy_password_hash
 from app.auth.jwt import create_access_token
 from app.users.model import UserRegisterResponse, TokenResponse
 
@@ -22,27 +23,17 @@ class UserService:
         email = email.strip().lower()
         username = username.strip()
 
-        # 1. Check if user already exists
-        existing = await self.dao.get_by_email_and_username(
-            email=email,
-            username=username,
-        )
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User already exists",
-            )
-
-        # 2. Hash password (includes validation)
+        # 1. Hash password (includes validation)
         try:
-            hashed_password = hash_password(password)
+            hashed_password = await hash_password(password)
         except ValueError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=str(e),
             )
 
-        # 3. Create user
+        # 2. Create user; an existing email or username makes the insert a no-op,
+        # so there is no separate existence check and no race window
         user_id = str(uuid.uuid4())
 
         created_user_id = await self.dao.create_user(
@@ -55,8 +46,8 @@ class UserService:
 
         if not created_user_id:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="User creation failed",
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="User already exists",
             )
 
         return UserRegisterResponse(
@@ -69,21 +60,24 @@ class UserService:
 
         user = await self.dao.get_by_email(email)
 
-        # Fake hash to normalize timing if user does not exist
-        fake_hash = (
-            "$argon2id$v=19$m=65536,t=3,p=4$"
-            "c29tZXNhbHQ$"
-            "c29tZWhhc2g"
-        )
+        # Verify against a dummy hash to normalize timing if user does not exist
+        if user and user.password:
+            password_hash = user.password
+        else:
+            password_hash = await get_dummy_password_hash()
 
-        password_hash = user.password if user and user.password else DUMMY_PASSWORD_HASH
+        password_ok = await verify_password(password, password_hash)
 
-        if not user or not verify_password(password, password_hash):
+        if not user or not password_ok:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid credentials",
             )
 
+        # Upgrade hashes made with older argon2 parameters
+        if needs_rehash(password_hash):
+            await self.dao.update_password(user.id, await rehash_password(password))
+
         access_token = create_access_token(
             subject=str(user.id)  # sub is now correctly a string
         )